@@ -11,20 +11,29 @@ DATA: Dezembro/2025
 """
 
 import streamlit as st
-import matplotlib.pyplot as plt
 import numpy as np
-import requests
-from PIL import Image
-from io import BytesIO
-import base64
-import yfinance as yf
 import pandas as pd
-from datetime import datetime
 import logging
-
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
+import time
+from contextlib import closing
+
+from sioei.assets import css_base, css_modo, html_logo
+from sioei.backtest import REBALANCEAMENTOS, backtest_carteiras
+from sioei.charts import (METRICAS_SENSIBILIDADE, png_alocacao, png_composicao, png_fronteira,
+                          png_monte_carlo, png_projecao, png_sensibilidade)
+from sioei.data import MonitorMercado, carregar_historico_backtest
+from sioei.engine import (calcular_cacheado, avaliar_carteiras, grade_sensibilidade, montar_matriz_pesos,
+                          normalizar_pesos, resolver_fire, simular_monte_carlo)
+from sioei.metricas import (PORTA_METRICAS, REGISTRO, Execucao, configurar_logs, instrumentar_cache,
+                            servir_metricas)
+from sioei.optimizer import montar_covariancia, fronteira_eficiente, arredondar_pesos_inteiros, carteira_para_risco
+from sioei.planos import carregar_planos, conectar_planos, excluir_plano, projetar_pendentes, salvar_planos
+from sioei.universe import construir_universo, PERFIS, DESCRICOES_PERFIS, TESES
+
+# Configurar logging (JSON com SIOEI_LOG_JSON=1) e cronômetro deste rerun
+configurar_logs()
 logger = logging.getLogger(__name__)
+EXECUCAO = Execucao('rerun')
 
 # ==============================================================================
 # 1. CONFIGURAÇÃO DA PÁGINA
@@ -38,481 +47,155 @@ st.set_page_config(
 # ==============================================================================
 # 2. ESTILIZAÇÃO (DESIGN SYSTEM MICHELANGELO 🎨)
 # ==============================================================================
-st.markdown("""
-<style>
-    /* RESET BÁSICO E TRANSIÇÃO SUAVE DE FUNDO */
-    .stApp { 
-        transition: background 0.5s ease; 
-        background-color: #0E1117; /* Fallback */
-    }
-    
-    /* CARDS DE MÉTRICAS */
-    .metric-card {
-        background-color: rgba(38, 39, 48, 0.7);
-        backdrop-filter: blur(10px);
-        border: 1px solid rgba(255,255,255,0.1); 
-        padding: 12px;
-        border-radius: 10px; 
-        text-align: center; 
-        margin-bottom: 10px;
-        box-shadow: 0 4px 6px rgba(0,0,0,0.3);
-        height: 100%;
-        min-height: 140px;
-        display: flex;
-        flex-direction: column;
-        justify-content: center;
-        align-items: center;
-        transition: transform 0.2s;
-    }
-    .metric-card:hover { transform: translateY(-2px); border-color: rgba(255,255,255,0.3); }
-
-    .metric-main { font-size: 24px; font-weight: bold; color: white; margin: 5px 0; text-shadow: 0 2px 4px rgba(0,0,0,0.5); }
-    .metric-detail { font-size: 11px; margin-top: 8px; opacity: 0.8; font-family: monospace; color: #E0E0E0; border-top: 1px solid rgba(255,255,255,0.1); padding-top: 4px; width: 100%; line-height: 1.2; white-space: normal; }
-    .metric-label { font-size: 11px; text-transform: uppercase; letter-spacing: 1px; margin-bottom: 5px; font-weight: 700; }
-    
-    /* BADGES DE STATUS */
-    .status-badge { font-size: 12px; padding: 4px 8px; border-radius: 4px; font-weight: bold; display: inline-block; margin-right: 10px; }
-    .status-live { background-color: #1B5E20; color: #A5D6A7; border: 1px solid #2E7D32; }
-    .status-warning { background-color: #F57F17; color: #FFF9C4; border: 1px solid #FBC02D; }
-    .status-static { background-color: #B71C1C; color: #FFCDD2; border: 1px solid #C62828; }
-    
-    div.stButton > button { width: 100%; }
-
-    /* --- ESTILIZAÇÃO AVANÇADA DOS BOTÕES DE MODO (RADIO) --- */
-    
-    div.row-widget.stRadio > div[role="radiogroup"] > label > div:first-child {
-        display: none !important;
-    }
-    
-    div.row-widget.stRadio > div[role="radiogroup"] {
-        background-color: rgba(0,0,0,0.2);
-        padding: 10px;
-        border-radius: 15px;
-        display: flex;
-        justify-content: center;
-        gap: 15px;
-        border: 1px solid rgba(255,255,255,0.05);
-    }
-
-    div.row-widget.stRadio > div[role="radiogroup"] > label {
-        background: rgba(255, 255, 255, 0.05) !important;
-        border: 1px solid rgba(255, 255, 255, 0.1) !important;
-        padding: 20px 10px !important;
-        border-radius: 10px !important;
-        cursor: pointer !important;
-        transition: all 0.3s cubic-bezier(0.25, 0.8, 0.25, 1) !important;
-        text-align: center !important;
-        flex: 1 !important;
-        margin: 0 !important;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        min-width: 120px;
-    }
-
-    div.row-widget.stRadio > div[role="radiogroup"] > label p {
-        font-size: 16px !important;
-        font-weight: 700 !important;
-        margin: 0 !important;
-        color: #B0B0B0 !important;
-        text-transform: uppercase;
-        letter-spacing: 1px;
-    }
-
-    div.row-widget.stRadio > div[role="radiogroup"] > label:hover {
-        background: rgba(255, 255, 255, 0.1) !important;
-        transform: translateY(-3px) !important;
-        box-shadow: 0 5px 15px rgba(0,0,0,0.3) !important;
-        border-color: rgba(255,255,255,0.3) !important;
-    }
-    div.row-widget.stRadio > div[role="radiogroup"] > label:hover p {
-        color: white !important;
-    }
-
-    div.row-widget.stRadio > div[role="radiogroup"] > label[aria-checked="true"] {
-        background: linear-gradient(135deg, rgba(255,255,255,0.1), rgba(255,255,255,0.05)) !important;
-        border: 2px solid !important;
-        box-shadow: 0 0 20px rgba(0,0,0,0.4), inset 0 0 10px rgba(255,255,255,0.05) !important;
-        transform: scale(1.02) !important;
-    }
-    
-    div.row-widget.stRadio > div[role="radiogroup"] > label[aria-checked="true"] p {
-        color: white !important;
-        text-shadow: 0 0 10px rgba(255,255,255,0.5);
-    }
-
-    .logo-container { position: absolute; top: -45px; right: 0px; z-index: 1000; }
-    @media (max-width: 1024px) {
-        .logo-container img { width: 90px !important; }
-        .logo-container { top: -35px; }
-    }
-</style>
-""", unsafe_allow_html=True)
+st.markdown(css_base(), unsafe_allow_html=True)
+EXECUCAO.marcar('estilo')
 
 # ==============================================================================
 # 3. CONEXÕES DE DADOS & LÓGICA HÍBRIDA
 # ==============================================================================
-plt.style.use('dark_background')
-
-# --- 3.1 CONEXÃO BANCO CENTRAL (SGS API) ---
-@st.cache_data(ttl=86400, show_spinner=False)
-def obter_dados_bcb():
-    """Obtém dados macroeconômicos do Banco Central do Brasil"""
-    macro = {'selic': 10.75, 'ipca': 4.50, 'status': False}
+# --- 3.1 SNAPSHOT DE MERCADO (BCB + YAHOO, PRÉ-CARGA EM SEGUNDO PLANO) ---
+@st.cache_resource(show_spinner=False)
+def obter_monitor_mercado():
+    """Monitor único por processo, compartilhado por todas as sessões"""
+    return MonitorMercado()
+
+@st.cache_resource(show_spinner=False)
+def iniciar_endpoint_metricas():
+    """GET /metrics (Prometheus) do processo, só com SIOEI_METRICAS_PORTA definida (padrão: desligado)"""
+    if not PORTA_METRICAS:
+        return None
     try:
-        url_selic = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.432/dados/ultimos/1?formato=json"
-        r_selic = requests.get(url_selic, timeout=10)
-        r_selic.raise_for_status()
-        macro['selic'] = float(r_selic.json()[0]['valor'])
-        
-        url_ipca = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.13522/dados/ultimos/1?formato=json"
-        r_ipca = requests.get(url_ipca, timeout=10)
-        r_ipca.raise_for_status()
-        macro['ipca'] = float(r_ipca.json()[0]['valor'])
-        
-        macro['status'] = True
-        logger.info("Dados do BCB obtidos com sucesso")
-    except Exception as e:
-        logger.warning(f"Erro BCB: {e}")
-    
-    return macro
-
-# --- 3.2 CONEXÃO YAHOO FINANCE ---
-TICKERS_MAP = {
-    'ETF Ibovespa (BOVA11)': 'BOVA11.SA', 
-    'Ações EUA (S&P500)': 'IVVB11.SA', 
-    'Tech Stocks (Nasdaq)': 'NASD11.SA', 
-    'Bitcoin (BTC)': 'BTC-USD',
-    'Ethereum/Altcoins': 'ETH-USD', 
-    'Ouro / Dólar': 'GOLD11.SA',
-    'FIIs (Tijolo)': 'IFIX', 
-    'Ações (Dividendos)': 'IDIV' 
-}
-
-@st.cache_data(ttl=43200, show_spinner=False)
-def obter_retornos_live():
-    dados_live = {}
-    valid_tickers = [t for t in TICKERS_MAP.values() if t not in ['IFIX', 'IDIV']]
-    try:
-        data = yf.download(
-            valid_tickers, 
-            period="1y", 
-            interval="1d", 
-            progress=False,
-            show_errors=False
-        )['Adj Close']
-        
-        for nome, ticker in TICKERS_MAP.items():
-            if ticker in valid_tickers and ticker in data.columns:
-                series = data[ticker].dropna()
-                if len(series) > 30:
-                    ret = ((series.iloc[-1] / series.iloc[0]) - 1) * 100
-                    if not (np.isnan(ret) or np.isinf(ret)): dados_live[nome] = ret
-        logger.info(f"✓ Obtidos {len(dados_live)} retornos live")
-    except Exception as e:
-        logger.warning(f"Erro Yahoo: {e}")
-    return dados_live
-
-with st.spinner('🔍 Analisando mercado brasileiro (B3/ANBIMA)...'):
-    MACRO_DATA = obter_dados_bcb()
-    LIVE_RETURNS = obter_retornos_live()
+        return servir_metricas(PORTA_METRICAS)
+    except OSError as e:
+        logger.warning(f"Endpoint de métricas indisponível na porta {PORTA_METRICAS}: {e}")
+        return None
+
+ENDPOINT_METRICAS = iniciar_endpoint_metricas()
+
+MONITOR_MERCADO = obter_monitor_mercado()
+SNAPSHOT_MERCADO = MONITOR_MERCADO.snapshot_atual()
+MACRO_DATA = SNAPSHOT_MERCADO['macro']
+LIVE_RETURNS = SNAPSHOT_MERCADO['live']
+DADOS_DESATUALIZADOS = MONITOR_MERCADO.desatualizado()
+
+# --- 3.2 CONSTRUÇÃO DA BASE DE ATIVOS ---
+@instrumentar_cache('universo', st.cache_resource(show_spinner=False, max_entries=4))
+def obter_universo(versao_dados, _snapshot):
+    """Universo imutável de uma versão dos dados: construído uma vez, compartilhado por todas as sessões"""
+    return construir_universo(_snapshot)
+
+UNIVERSO = obter_universo(SNAPSHOT_MERCADO['versao'], SNAPSHOT_MERCADO)
+ATIVOS = UNIVERSO.ativos
+ESTATISTICAS_1A = UNIVERSO.estatisticas.get('1a', {})  # Métricas de 1 ano (pregões) dos ativos com histórico
+
+def resumir_estatisticas(nome):
+    """Volatilidade e drawdown máximo de 1 ano do ativo, em texto ('' sem histórico)"""
+    e = ESTATISTICAS_1A.get(nome)
+    if not e:
+        return ""
+    return f"Vol. 1a: **{e['volatilidade']:.1f}%** • Drawdown máx. 1a: **{e['drawdown_maximo']:.1f}%**"
 
 # Cálculo de Derivados
-SELIC_ATUAL = MACRO_DATA['selic']
-IPCA_ATUAL = MACRO_DATA['ipca']
-CDI_ATUAL = max(SELIC_ATUAL - 0.10, 0)
-
-if SELIC_ATUAL > 8.5:
-    POUPANCA_ATUAL = ((1 + 0.005 + 0.0015)**12 - 1) * 100 
-else:
-    POUPANCA_ATUAL = SELIC_ATUAL * 0.70
+SELIC_ATUAL = UNIVERSO.selic
+IPCA_ATUAL = UNIVERSO.ipca
+CDI_ATUAL = UNIVERSO.cdi
+POUPANCA_ATUAL = UNIVERSO.poupanca
 
 STATUS_BCB = "ONLINE ✓" if MACRO_DATA['status'] else "OFFLINE ✗"
-total_ativos_live = len(LIVE_RETURNS)
 
-if total_ativos_live > 0:
-    STATUS_MERCADO = f"ONLINE ✓ ({total_ativos_live} ativos)"
-    COR_STATUS_MERCADO = "status-live"
-else:
-    STATUS_MERCADO = "OFFLINE ✗ (0 ativos)"
-    COR_STATUS_MERCADO = "status-static"
+def status_mercado(total_ativos_live, desatualizado):
+    """Texto e classe CSS do badge de mercado"""
+    if total_ativos_live > 0 and desatualizado:
+        return f"CACHE ⏳ ({total_ativos_live} ativos)", "status-warning"
+    elif total_ativos_live > 0:
+        return f"ONLINE ✓ ({total_ativos_live} ativos)", "status-live"
+    return "OFFLINE ✗ (0 ativos)", "status-static"
+
+STATUS_MERCADO, COR_STATUS_MERCADO = status_mercado(len(LIVE_RETURNS), DADOS_DESATUALIZADOS)
     
 logger.info(f"Status BCB: {STATUS_BCB}")
 logger.info(f"Status Mercado: {STATUS_MERCADO}")
-
-def suavizar_retorno(nome_ativo, base_historica):
-    if nome_ativo in LIVE_RETURNS:
-        return (LIVE_RETURNS[nome_ativo] * 0.5) + (base_historica * 0.5)
-    return base_historica
-
-# --- 3.3 CONSTRUÇÃO DA BASE DE ATIVOS ---
-ATIVOS = {
-    'Tesouro Selic': {'retorno': SELIC_ATUAL, 'risco': 1, 'taxa': 1.65, 'tipo': 'RF', 'mercado': '🏦 Soberano', 'cor': '#4CAF50', 'desc': f'Porto seguro do brasileiro.'},
-    'CDB Liquidez Diária': {'retorno': CDI_ATUAL * 0.99, 'risco': 1, 'taxa': 1.60, 'tipo': 'RF', 'mercado': '🏦 Bancário', 'cor': '#03A9F4', 'desc': 'Reserva de emergência padrão.'},
-    'Tesouro Prefixado': {'retorno': SELIC_ATUAL + 2.0, 'risco': 4, 'taxa': 1.70, 'tipo': 'RF', 'mercado': '🏛️ Títulos Públicos', 'cor': '#CDDC39', 'desc': 'Aposta na queda dos juros.'},
-    'Tesouro IPCA+ (Curto)': {'retorno': IPCA_ATUAL + 6.0, 'risco': 2, 'taxa': 1.60, 'tipo': 'RF', 'mercado': '🏛️ Títulos Públicos', 'cor': '#FFEB3B', 'desc': 'Proteção inflacionária CP.'},
-    'Tesouro IPCA+ (Longo)': {'retorno': IPCA_ATUAL + 6.4, 'risco': 5, 'taxa': 1.65, 'tipo': 'RF', 'mercado': '🏛️ Títulos Públicos', 'cor': '#FF9800', 'desc': 'Aposentadoria clássica.'},
-    'Tesouro Renda+': {'retorno': IPCA_ATUAL + 6.5, 'risco': 3, 'taxa': 0.50, 'tipo': 'RF', 'mercado': '🏛️ Títulos Públicos', 'cor': '#FF5722', 'desc': 'Foco previdenciário.'},
-    'LCI/LCA (Isento)': {'retorno': CDI_ATUAL * 0.94, 'risco': 2, 'taxa': 0.00, 'tipo': 'RF', 'mercado': '💳 Crédito Isento', 'cor': '#0288D1', 'desc': 'Queridinho da Classe Média.'},
-    'CDB Banco Médio': {'retorno': CDI_ATUAL * 1.20, 'risco': 3, 'taxa': 1.90, 'tipo': 'RF', 'mercado': '💳 Crédito Privado', 'cor': '#01579B', 'desc': 'Caça ao rendimento (120% CDI).'},
-    'Debêntures Incent.': {'retorno': IPCA_ATUAL + 7.5, 'risco': 5, 'taxa': 0.30, 'tipo': 'RF', 'mercado': '🏗️ Infraestrutura', 'cor': '#E91E63', 'desc': 'Crédito Isento (Risco Corp).'},
-    'CRI/CRA (High Yield)': {'retorno': IPCA_ATUAL + 9.5, 'risco': 8, 'taxa': 2.00, 'tipo': 'RF', 'mercado': '🏗️ High Yield', 'cor': '#C2185B', 'desc': 'Risco alto, retorno alto.'},
-    'Fundo Multimercado': {'retorno': CDI_ATUAL * 1.15, 'risco': 5, 'taxa': 3.50, 'tipo': 'RF', 'mercado': '📊 Hedge Funds', 'cor': '#9C27B0', 'desc': 'Gestores macro.'},
-    
-    'Ações (Dividendos)': {'retorno': suavizar_retorno('Ações (Dividendos)', 14.50), 'risco': 6, 'taxa': 0.10, 'tipo': 'RV', 'mercado': '🏢 Bolsa BR', 'cor': '#00BCD4', 'desc': 'Vacas Leiteiras (BB, Taesa).'},
-    'Ações (Small Caps)': {'retorno': 18.00, 'risco': 9, 'taxa': 2.50, 'tipo': 'RV', 'mercado': '🏢 Bolsa BR', 'cor': '#0097A7', 'desc': 'Pimentinhas com potencial.'},
-    'ETF Ibovespa (BOVA11)': {'retorno': suavizar_retorno('ETF Ibovespa (BOVA11)', 14.00), 'risco': 7, 'taxa': 2.10, 'tipo': 'RV', 'mercado': '🏢 Bolsa BR', 'cor': '#006064', 'desc': 'Média do mercado.'},
-    'FIIs (Tijolo)': {'retorno': 12.50, 'risco': 4, 'taxa': 0.00, 'tipo': 'RV', 'mercado': '🧱 Imobiliário', 'cor': '#BA68C8', 'desc': 'Aluguel mensal isento.'},
-    'FIIs (Papel)': {'retorno': CDI_ATUAL * 1.05, 'risco': 5, 'taxa': 0.20, 'tipo': 'RV', 'mercado': '📜 Imobiliário', 'cor': '#8E24AA', 'desc': 'Juros compostos mensais.'},
-    'Fiagro (Agronegócio)': {'retorno': CDI_ATUAL * 1.10, 'risco': 6, 'taxa': 0.50, 'tipo': 'RV', 'mercado': '🚜 Agro', 'cor': '#4A148C', 'desc': 'Crédito Agro na Bolsa.'},
-    'Ações EUA (S&P500)': {'retorno': suavizar_retorno('Ações EUA (S&P500)', 16.00), 'risco': 6, 'taxa': 2.75, 'tipo': 'RV', 'mercado': '🌎 Exterior', 'cor': '#3F51B5', 'desc': 'Dolarização via B3.'},
-    'Tech Stocks (Nasdaq)': {'retorno': suavizar_retorno('Tech Stocks (Nasdaq)', 18.00), 'risco': 8, 'taxa': 2.80, 'tipo': 'RV', 'mercado': '🌎 Exterior', 'cor': '#304FFE', 'desc': 'Tecnologia Global.'},
-    'REITs (Imóveis EUA)': {'retorno': 15.00, 'risco': 6, 'taxa': 3.30, 'tipo': 'RV', 'mercado': '🌎 Exterior', 'cor': '#1A237E', 'desc': 'Imóveis em Dólar.'},
-    'Ouro / Dólar': {'retorno': suavizar_retorno('Ouro / Dólar', 8.50), 'risco': 4, 'taxa': 1.00, 'tipo': 'RV', 'mercado': '🛡️ Proteção', 'cor': '#FFD700', 'desc': 'Hedge cambial.'},
-    'Bitcoin (BTC)': {'retorno': suavizar_retorno('Bitcoin (BTC)', 30.00), 'risco': 9, 'taxa': 4.50, 'tipo': 'RV', 'mercado': '⚡ Cripto', 'cor': '#F44336', 'desc': 'Ouro Digital.'},
-    'Ethereum/Altcoins': {'retorno': suavizar_retorno('Ethereum/Altcoins', 35.00), 'risco': 10, 'taxa': 5.00, 'tipo': 'RV', 'mercado': '⚡ Cripto', 'cor': '#B71C1C', 'desc': 'Alto risco/recompensa.'}
-}
+EXECUCAO.marcar('mercado')
 
 # ==============================================================================
-# 4. PERFIS E ESTRATÉGIAS (EXPANDIDO - HEAVY METAL EDITION 🎸)
+# 4. PERFIS, ESTRATÉGIAS E MOTOR MATEMÁTICO (PACOTE sioei)
 # ==============================================================================
-PERFIS = {
-    'Conservador (Rentista) 🛡️': {'LCI/LCA (Isento)': 35, 'Tesouro Selic': 30, 'CDB Banco Médio': 20, 'Debêntures Incent.': 15},
-    'Moderado (Dividendeiro) ⚖️': {'FIIs (Tijolo)': 20, 'FIIs (Papel)': 15, 'Debêntures Incent.': 20, 'Tesouro IPCA+ (Longo)': 15, 'Ações (Dividendos)': 15, 'Fundo Multimercado': 15},
-    'Agressivo (Arrojado BR) 🚀': {'Ações (Small Caps)': 20, 'Bitcoin (BTC)': 20, 'FIIs (Tijolo)': 15, 'CRI/CRA (High Yield)': 20, 'ETF Ibovespa (BOVA11)': 15, 'Ações EUA (S&P500)': 10}
+# PERFIS, TESES, calcular() e o otimizador vivem em sioei.universe, sioei.engine
+# e sioei.optimizer; aqui ficam apenas os caches específicos do Streamlit.
+@instrumentar_cache('covariancia', st.cache_data(show_spinner=False, max_entries=8))
+def obter_matriz_covariancia(versao_dados, _historico, _universo):
+    """Covariância de ATIVOS a partir do histórico de preços, cacheada por versão dos dados"""
+    return montar_covariancia(_historico, universo=_universo)
+
+@instrumentar_cache('fronteira', st.cache_data(show_spinner=False, max_entries=8))
+def obter_fronteira_eficiente(versao_dados, retornos_liquidos, _cov, n_pontos=50):
+    """Fronteira eficiente cacheada por versão dos dados e vetor de retornos líquidos"""
+    return fronteira_eficiente(np.array(retornos_liquidos), _cov, n_pontos)
+
+@instrumentar_cache('historico_backtest', st.cache_data(show_spinner=False, max_entries=2))
+def obter_historico_backtest(versao_dados):
+    """Fechamentos longos do armazém (sem rede), relidos a cada versão dos dados"""
+    return carregar_historico_backtest(atualizar=False)
+
+@instrumentar_cache('backtest', st.cache_data(show_spinner=False, max_entries=16))
+def obter_backtest(versao_dados, carteiras, rebalanceamento, anos_backtest, _precos, _historico_bcb):
+    """Backtest de carteiras normalizadas (tuplas de pesos), cacheado por versão dos dados"""
+    fim = _precos.index.max() if len(_precos) else pd.Timestamp.today().normalize()
+    return backtest_carteiras([dict(c) for c in carteiras], _precos, _historico_bcb, rebalanceamento,
+                              inicio=fim - pd.DateOffset(years=anos_backtest), fim=fim)
+
+# Modo da projeção: taxa média ponderada (None) ou ativo a ativo, com rebalanceamento
+# a cada N meses (0 = nunca; a alocação deriva com o desempenho de cada ativo)
+MODOS_PROJECAO = {
+    None: 'Taxa média da carteira',
+    0: 'Por ativo • sem rebalancear',
+    6: 'Por ativo • rebalanceamento semestral',
+    12: 'Por ativo • rebalanceamento anual',
 }
 
-DESCRICOES_PERFIS = {
-    'Conservador (Rentista) 🛡️': 'Foco total em GANHO REAL acima da inflação com zero sustos. Muita LCI/LCA e Tesouro.',
-    'Moderado (Dividendeiro) ⚖️': 'Perfil "Viver de Renda". Forte exposição a Fundos Imobiliários e Ações de Dividendos.',
-    'Agressivo (Arrojado BR) 🚀': 'Apetite ao risco. Mistura Small Caps, High Yield e Cripto.'
-}
-
-# --- LISTA COMPLETA DE ESTRATÉGIAS (18 TESES) ---
-TESES = {
-    # CLÁSSICOS & ORIGINAIS
-    '👑 Rei dos Dividendos (Barsi)': {
-        'desc': 'Foco em renda passiva recorrente e isenta. (Luiz Barsi)', 
-        'pesos': {'Ações (Dividendos)': 40, 'FIIs (Tijolo)': 25, 'FIIs (Papel)': 15, 'Debêntures Incent.': 20}
-    },
-    '🌍 All Weather (Ray Dalio)': {
-        'desc': 'Blindada para qualquer cenário (Inflação, Deflação, Crescimento).', 
-        'pesos': {'Ações EUA (S&P500)': 30, 'Tesouro IPCA+ (Longo)': 40, 'Tesouro Selic': 15, 'Ouro / Dólar': 7.5, 'CDB Liquidez Diária': 7.5}
-    },
-    '🏰 Portfólio Permanente (Harry Browne)': {
-        'desc': 'Segurança simétrica: 25% Ações, 25% Ouro, 25% Renda Fixa Longa, 25% Caixa.',
-        'pesos': {'Ações (Dividendos)': 25, 'Tesouro IPCA+ (Longo)': 25, 'Ouro / Dólar': 25, 'Tesouro Selic': 25}
-    },
-    '⚖️ Barbell (Nassim Taleb)': {
-        'desc': 'Antifrágil: 90% em Segurança Extrema (Selic) + 10% em Risco Explosivo.',
-        'pesos': {'Tesouro Selic': 90, 'Bitcoin (BTC)': 5, 'Ações (Small Caps)': 5}
-    },
-    '🏙️ Império de Tijolo (Renda Passiva)': {
-        'desc': 'Foco 100% Imobiliário. Para quem ama imóveis e odeia IR.',
-        'pesos': {'FIIs (Tijolo)': 60, 'FIIs (Papel)': 20, 'LCI/LCA (Isento)': 20}
-    },
-    
-    # NOVAS POPULARES (Adicionadas a Pedido)
-    '🦋 Golden Butterfly': {
-        'desc': 'Variação do Portfólio Permanente com viés de crescimento (+Ações).',
-        'pesos': {'Ações (Dividendos)': 20, 'Ações (Small Caps)': 20, 'Tesouro IPCA+ (Longo)': 20, 'Tesouro Selic': 20, 'Ouro / Dólar': 20}
-    },
-    '👴 Warren Buffett (90/10)': {
-        'desc': 'A aposta do Oráculo: 90% S&P500 e 10% Títulos Curtos. Simples e vencedor.',
-        'pesos': {'Ações EUA (S&P500)': 90, 'Tesouro Selic': 10}
-    },
-    '🧘 Bogleheads (Lazy Portfolio)': {
-        'desc': 'Filosofia passiva: Compre o mercado inteiro e vá dormir. Baixo custo.',
-        'pesos': {'ETF Ibovespa (BOVA11)': 40, 'Ações EUA (S&P500)': 30, 'Tesouro IPCA+ (Longo)': 30}
-    },
-    '⚖️ Benjamin Graham (50/50)': {
-        'desc': 'O Pai do Value Investing. Equilíbrio perfeito entre Defensivo e Empreendedor.',
-        'pesos': {'Ações (Dividendos)': 50, 'Tesouro IPCA+ (Curto)': 50}
-    },
-    '☕ Coffee Can (Buy & Hold)': {
-        'desc': 'Comprar empresas de altíssima qualidade e esquecer por 10 anos. Sem girar carteira.',
-        'pesos': {'Ações (Dividendos)': 40, 'Ações (Small Caps)': 30, 'Ações EUA (S&P500)': 30}
-    },
-    '🪄 Magic Formula (Greenblatt)': {
-        'desc': 'Foco estatístico em empresas "boas e baratas" (ROIC alto + EV/EBIT baixo).',
-        'pesos': {'Ações (Small Caps)': 40, 'Ações (Dividendos)': 40, 'CDB Liquidez Diária': 20}
-    },
-
-    # SETORIAIS / TEMÁTICAS
-    '🤖 Futuro Tech (AI & Growth)': {
-        'desc': 'Aposta máxima em tecnologia global (Nasdaq) e inovação.',
-        'pesos': {'Tech Stocks (Nasdaq)': 50, 'Ações EUA (S&P500)': 30, 'Bitcoin (BTC)': 20}
-    },
-    '🚜 Agro é Pop (Fiagro)': {
-        'desc': 'Foco no motor do PIB brasileiro.', 
-        'pesos': {'Fiagro (Agronegócio)': 40, 'LCI/LCA (Isento)': 30, 'CRI/CRA (High Yield)': 30}
-    },
-    '🎓 Yale Model (David Swensen)': {
-        'desc': 'Diversificação global institucional.', 
-        'pesos': {'Ações EUA (S&P500)': 30, 'Ações (Dividendos)': 15, 'FIIs (Tijolo)': 20, 'Tesouro IPCA+ (Curto)': 15, 'Tesouro IPCA+ (Longo)': 20}
-    },
-    '💰 Aposentadoria Renda+': {
-        'desc': 'Acumulação longo prazo via Tesouro Direto.', 
-        'pesos': {'Tesouro Renda+': 40, 'FIIs (Tijolo)': 20, 'Ações (Dividendos)': 20, 'Tesouro IPCA+ (Longo)': 20}
-    },
-    '🔥 Pimenta Crypto': {
-        'desc': 'Alto risco em ativos digitais.', 
-        'pesos': {'Bitcoin (BTC)': 40, 'Ethereum/Altcoins': 20, 'Tech Stocks (Nasdaq)': 20, 'CDB Banco Médio': 20}
-    },
-
-    # AS DUAS MATADORAS 🔥
-    '🐉 Dragon Portfolio': {
-        'desc': 'KILLER 1: Feito para crescer e sobreviver a cisnes negros (100 anos de backtest).',
-        'pesos': {'Ações EUA (S&P500)': 24, 'Tesouro IPCA+ (Longo)': 19, 'Ouro / Dólar': 19, 'Bitcoin (BTC)': 19, 'CRI/CRA (High Yield)': 19}
-    },
-    '🚀 Momentum Quant (Trend Following)': {
-        'desc': 'KILLER 2: A estratégia dos fundos quantitativos. Segue a tendência explosiva.',
-        'pesos': {'Tech Stocks (Nasdaq)': 40, 'Bitcoin (BTC)': 30, 'Ações (Small Caps)': 30}
-    }
-}
-
-# ==============================================================================
-# 5. MOTOR MATEMÁTICO
-# ==============================================================================
-def calcular(pesos_dict, v_inicial, v_mensal, anos, renda_desejada=0, 
-             anos_inicio_retirada=99, usar_retirada=False):
-    """
-    Calcula a evolução patrimonial considerando aportes e possíveis retiradas
-    """
-    inflacao_aa = IPCA_ATUAL
-    cdi_aa = CDI_ATUAL
-    taxa_poupanca = POUPANCA_ATUAL
-    
-    total = sum(pesos_dict.values())
-    usar_poupanca = False
-    ativos_usados = [] 
-    
-    retorno_bruto_ponderado = 0
-    custo_ponderado = 0
-    risco_pond = 0
-
-    if total == 0:
-        # Modo poupança quando carteira está vazia
-        usar_poupanca = True
-        total = 1
-        retorno_bruto_ponderado = taxa_poupanca
-        custo_ponderado = 0
-        risco_pond = 0.5
-        ativos_usados = [{
-            'nome': 'Dinheiro Parado (Poupança)', 
-            'peso': 100, 
-            'cor': '#757575', 
-            'desc': 'DINHEIRO PARADO! Perdendo valor para inflação.', 
-            'mercado': '⚠️ Alerta', 
-            'retorno_real': taxa_poupanca, 
-            'tipo': 'RF'
-        }]
-    else:
-        # Cálculo da carteira real
-        for nome, peso in pesos_dict.items():
-            if peso > 0:
-                info = ATIVOS[nome]
-                peso_real = peso / total
-                retorno_bruto_ponderado += info['retorno'] * peso_real
-                custo_ponderado += info['taxa'] * peso_real
-                risco_pond += info['risco'] * peso_real
-                ativos_usados.append({
-                    'nome': nome, 
-                    'peso': peso_real * 100, 
-                    'cor': info['cor'], 
-                    'desc': info['desc'], 
-                    'mercado': info['mercado'], 
-                    'retorno_real': info['retorno'], 
-                    'tipo': info['tipo']
-                })
-    
-    retorno_liquido_aa = retorno_bruto_ponderado - custo_ponderado
-    
-    meses = anos * 12
-    mes_inicio_retirada = anos_inicio_retirada * 12
-    
-    # Taxas mensais
-    tx_cart_bruto = (1 + retorno_bruto_ponderado/100)**(1/12) - 1 
-    tx_cart = (1 + retorno_liquido_aa/100)**(1/12) - 1            
-    tx_cdi = (1 + cdi_aa/100)**(1/12) - 1
-    tx_poup = (1 + taxa_poupanca/100)**(1/12) - 1
-    tx_inf = (1 + inflacao_aa/100)**(1/12) - 1
-    
-    # Inicialização das listas
-    y_cart_nom = [v_inicial]
-    y_cart_real = [v_inicial]
-    y_cart_bruto = [v_inicial]
-    y_cdi_nom = [v_inicial]
-    y_cdi_real = [v_inicial]
-    y_poup_nom = [v_inicial]
-    y_poup_real = [v_inicial]
-    
-    investido = v_inicial
-    
-    # Simulação mês a mês
-    for m in range(meses):
-        fluxo = v_mensal
-        
-        # Aplicar retiradas se configurado
-        if usar_retirada and m >= mes_inicio_retirada:
-            fluxo = v_mensal - renda_desejada
-        
-        # Evolução da carteira
-        y_cart_nom.append(y_cart_nom[-1] * (1 + tx_cart) + fluxo)
-        y_cart_bruto.append(y_cart_bruto[-1] * (1 + tx_cart_bruto) + fluxo) 
-        
-        fator_real_cart = (1 + tx_cart) / (1 + tx_inf)
-        y_cart_real.append(y_cart_real[-1] * fator_real_cart + fluxo)
-        
-        # Evolução CDI
-        y_cdi_nom.append(y_cdi_nom[-1] * (1 + tx_cdi) + fluxo)
-        fator_real_cdi = (1 + tx_cdi) / (1 + tx_inf)
-        y_cdi_real.append(y_cdi_real[-1] * fator_real_cdi + fluxo)
-        
-        # Evolução Poupança
-        y_poup_nom.append(y_poup_nom[-1] * (1 + tx_poup) + fluxo)
-        fator_real_poup = (1 + tx_poup) / (1 + tx_inf)
-        y_poup_real.append(y_poup_real[-1] * fator_real_poup + fluxo)
-        
-        # Contabilizar apenas aportes (não retiradas)
-        if not (usar_retirada and m >= mes_inicio_retirada):
-            investido += v_mensal
-    
-    # Cálculo da renda passiva sustentável
-    taxa_real_mensal = (1 + tx_cart) / (1 + tx_inf) - 1
-    if taxa_real_mensal <= 0: 
-        taxa_real_mensal = 0.0001
-    
-    renda_passiva_possivel = y_cart_real[-1] * taxa_real_mensal
-    
-    return {
-        'x': np.arange(meses + 1),
-        'y_cart_nom': y_cart_nom, 
-        'y_cart_real': y_cart_real, 
-        'y_cart_bruto': y_cart_bruto,
-        'y_cdi_nom': y_cdi_nom, 
-        'y_cdi_real': y_cdi_real,
-        'y_poup_nom': y_poup_nom, 
-        'y_poup_real': y_poup_real,
-        'final_nom': y_cart_nom[-1], 
-        'final_real': y_cart_real[-1], 
-        'investido': investido, 
-        'retorno_aa': retorno_liquido_aa, 
-        'risco': risco_pond, 
-        'ativos': ativos_usados, 
-        'is_poup': usar_poupanca,
-        'taxa_real_mensal': taxa_real_mensal, 
-        'renda_passiva_possivel': renda_passiva_possivel
-    }
+# Debounce dos sliders do Ajuste Fino: o painel só recalcula depois de tantos
+# segundos sem nenhum slider mudar
+ATRASO_AJUSTE = 1.0
+
+# Eixos da grade "E se...?": todos os prazos do slider e aportes de 0 até um teto
+# em degraus, para que mudar prazo ou aporte reaproveite a grade já calculada
+ANOS_SENSIBILIDADE = np.arange(1, 41)
+N_APORTES_SENSIBILIDADE = 50
+TETOS_APORTE = (1_000, 2_500, 5_000, 10_000, 25_000, 50_000, 100_000)
+
+def teto_aporte_sensibilidade(v_mensal):
+    """Menor teto do eixo de aportes que deixa o aporte atual até a metade do eixo"""
+    for teto in TETOS_APORTE:
+        if 2 * v_mensal <= teto:
+            return teto
+    return int(np.ceil(2 * v_mensal / TETOS_APORTE[-1])) * TETOS_APORTE[-1]
+
+@instrumentar_cache('sensibilidade', st.cache_data(show_spinner=False, max_entries=32))
+def obter_grade_sensibilidade(versao_dados, pesos, v_inicial, teto_aporte, renda_desejada,
+                              anos_retirada, usar_retirada, _universo):
+    """Grade prazo x aporte da carteira, cacheada por carteira normalizada e versão dos dados"""
+    return grade_sensibilidade(
+        dict(pesos), v_inicial, ANOS_SENSIBILIDADE,
+        np.linspace(0, teto_aporte, N_APORTES_SENSIBILIDADE),
+        renda_desejada, anos_retirada, usar_retirada, universo=_universo
+    )
 
 # ==============================================================================
-# 6. GERENCIAMENTO DE ESTADO
+# 5. GERENCIAMENTO DE ESTADO
 # ==============================================================================
 # Inicializar sliders no session_state
 for k in ATIVOS.keys():
     if f"sl_{k}" not in st.session_state: 
         st.session_state[f"sl_{k}"] = 0
 
+# Entradas do cenário (com chave, para que um plano salvo possa ser recarregado)
+PADROES_ENTRADAS = {
+    "modo_op": "🛠️ MANUAL", "v_inicial": 10000.0, "v_mensal": 0.0, "anos": 10,
+    "check_aposentadoria": False, "renda_desejada": 100.0, "anos_retirada": 5,
+}
+for k, v in PADROES_ENTRADAS.items():
+    st.session_state.setdefault(k, v)
+
 def atualizar_reativo():
     """Atualiza os sliders baseado no modo selecionado"""
     mode_raw = st.session_state.get("modo_op")
@@ -532,15 +215,36 @@ def atualizar_reativo():
     for k in ATIVOS.keys():
         st.session_state[f"sl_{k}"] = pesos.get(k, 0)
 
+def carregar_plano(plano):
+    """Restaura pesos e parâmetros de um plano salvo (em modo Manual)"""
+    st.session_state["modo_op"] = "🛠️ MANUAL"
+    for k in ATIVOS.keys():
+        st.session_state[f"sl_{k}"] = plano['pesos'].get(k, 0)
+    st.session_state.update({
+        "v_inicial": plano['v_inicial'],
+        "v_mensal": plano['v_mensal'],
+        "anos": plano['anos'],
+        "check_aposentadoria": plano['usar_retirada'],
+        "renda_desejada": plano['renda_desejada'] or PADROES_ENTRADAS["renda_desejada"],
+        "anos_retirada": min(plano['anos_inicio_retirada'], plano['anos']),
+    })
+
+def entradas_cenario():
+    """Carteira e parâmetros do cenário atual (como em sioei.planos), lidos do session_state"""
+    aposentadoria = st.session_state["check_aposentadoria"]
+    return {
+        'pesos': {k: st.session_state[f"sl_{k}"] for k in ATIVOS.keys()},
+        'v_inicial': st.session_state["v_inicial"],
+        'v_mensal': st.session_state["v_mensal"],
+        'anos': st.session_state["anos"],
+        'renda_desejada': st.session_state["renda_desejada"] if aposentadoria else 0,
+        'anos_inicio_retirada': min(st.session_state["anos_retirada"], st.session_state["anos"]) if aposentadoria else 99,
+        'usar_retirada': aposentadoria,
+    }
+
 # ==============================================================================
-# 7. FUNÇÕES AUXILIARES
+# 6. FUNÇÕES AUXILIARES
 # ==============================================================================
-def image_to_base64(img):
-    """Converte imagem PIL para base64"""
-    buffered = BytesIO()
-    img.save(buffered, format="PNG")
-    return base64.b64encode(buffered.getvalue()).decode()
-
 def calc_percent(numer, denom):
     """Calcula percentual com proteção contra divisão por zero"""
     denom_safe = max(abs(denom), 0.01)
@@ -556,39 +260,19 @@ def fmt_currency(val):
     """Formata valor monetário"""
     return f"R$ {val:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
 
+def fmt_prazo(meses):
+    """Formata um número de meses como 'X anos e Y meses'"""
+    anos_p, meses_p = divmod(int(meses), 12)
+    partes = ([f"{anos_p} ano{'s' if anos_p != 1 else ''}"] if anos_p else []) + \
+             ([f"{meses_p} {'mês' if meses_p == 1 else 'meses'}"] if meses_p or not anos_p else [])
+    return " e ".join(partes)
+
 # ==============================================================================
-# 8. INTERFACE DE USUÁRIO (UI)
+# 7. INTERFACE DE USUÁRIO (UI)
 # ==============================================================================
 
-# --- LOGO ---
-try:
-    import os
-    if os.path.exists('SIOEI LOGO.jpg'): 
-        logo_image = Image.open('SIOEI LOGO.jpg')
-        logo_ok = True
-    else:
-        url = "https://raw.githubusercontent.com/Open0Bit/SIOEI/main/SIOEI%20LOGO.jpg"
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        logo_image = Image.open(BytesIO(response.content))
-        logo_ok = True
-except Exception as e:
-    logger.warning(f"Erro ao carregar logo: {e}")
-    logo_ok = False
-
-if logo_ok:
-    img_base64 = image_to_base64(logo_image)
-    st.markdown(
-        f"""
-        <div class="logo-container">
-            <img src="data:image/png;base64,{img_base64}" width="130" alt="SIOEI Logo">
-        </div>
-        """,
-        unsafe_allow_html=True,
-    )
-else:
-    st.markdown('<div class="logo-container" style="font-size: 50px;">🇧🇷</div>', 
-                unsafe_allow_html=True)
+# --- LOGO (PRÉ-REDIMENSIONADO, ROTA ESTÁTICA QUANDO HABILITADA) ---
+st.markdown(html_logo(st.get_option("server.enableStaticServing")), unsafe_allow_html=True)
 
 st.markdown("<br>", unsafe_allow_html=True)
 
@@ -610,8 +294,7 @@ modo_raw = st.radio(
     horizontal=True, 
     label_visibility="collapsed", 
     key="modo_op", 
-    on_change=atualizar_reativo,
-    index=2 
+    on_change=atualizar_reativo
 )
 
 # Mapear de volta para a string simples para uso no código lógico
@@ -623,45 +306,7 @@ modo_map = {
 modo = modo_map[modo_raw]
 
 # --- LÓGICA DE FUNDO DINÂMICO (AMBIENT LIGHTING) ---
-bg_css = ""
-
-if modo == "Automático":
-    bg_css = """
-    <style>
-        .stApp {
-            background: linear-gradient(180deg, #051a14 0%, #0E1117 40%, #0E1117 100%) !important;
-        }
-        div.row-widget.stRadio > div[role="radiogroup"] > label[aria-checked="true"] {
-            border-color: #00E676 !important;
-            box-shadow: 0 0 15px rgba(0, 230, 118, 0.3) !important;
-        }
-    </style>
-    """
-elif modo == "Assistido":
-    bg_css = """
-    <style>
-        .stApp {
-            background: linear-gradient(180deg, #120a2e 0%, #0E1117 40%, #0E1117 100%) !important;
-        }
-        div.row-widget.stRadio > div[role="radiogroup"] > label[aria-checked="true"] {
-            border-color: #7C4DFF !important;
-            box-shadow: 0 0 15px rgba(124, 77, 255, 0.3) !important;
-        }
-    </style>
-    """
-else: # Manual
-    bg_css = """
-    <style>
-        .stApp {
-            background: linear-gradient(180deg, #1f1505 0%, #0E1117 40%, #0E1117 100%) !important;
-        }
-        div.row-widget.stRadio > div[role="radiogroup"] > label[aria-checked="true"] {
-            border-color: #FF9800 !important;
-            box-shadow: 0 0 15px rgba(255, 152, 0, 0.3) !important;
-        }
-    </style>
-    """
-st.markdown(bg_css, unsafe_allow_html=True)
+st.markdown(css_modo(modo), unsafe_allow_html=True)
 
 st.markdown("<br>", unsafe_allow_html=True)
 
@@ -678,6 +323,54 @@ if modo == "Automático":
     
     if sum([st.session_state[f"sl_{k}"] for k in ATIVOS]) == 0: 
         atualizar_reativo()
+    
+    with st.expander("🧮 OTIMIZADOR DE CARTEIRA (Fronteira Eficiente)", expanded=False):
+        cov_ativos = obter_matriz_covariancia(UNIVERSO.versao, SNAPSHOT_MERCADO['historico'], UNIVERSO)
+        fronteira = obter_fronteira_eficiente(
+            UNIVERSO.versao,
+            tuple(UNIVERSO.tabela.retorno_liquido),
+            cov_ativos
+        )
+        vol_min = float(fronteira['volatilidades'].min())
+        vol_max = float(fronteira['volatilidades'].max())
+        
+        c_opt1, c_opt2 = st.columns([1, 1.4])
+        with c_opt1:
+            vol_alvo = st.slider(
+                "Volatilidade máxima aceitável (% a.a.)", 
+                round(vol_min, 1), 
+                round(vol_max, 1), 
+                round(min(max(10.0, vol_min), vol_max), 1), 
+                step=0.5,
+                key="vol_alvo"
+            )
+            i_otimo = carteira_para_risco(fronteira, vol_alvo)
+            pesos_otimos = arredondar_pesos_inteiros(fronteira['pesos'][i_otimo])
+            pesos_otimos_dict = {k: int(p) for k, p in zip(ATIVOS.keys(), pesos_otimos)}
+            
+            st.caption(
+                f"Retorno líquido esperado: **{fronteira['retornos'][i_otimo]:.2f}% a.a.** • "
+                f"Volatilidade: **{fronteira['volatilidades'][i_otimo]:.2f}% a.a.**"
+            )
+            for nome, peso in sorted(pesos_otimos_dict.items(), key=lambda x: -x[1]):
+                if peso > 0:
+                    st.caption(f"● {nome}: {peso}%")
+            
+            def aplicar_carteira_otima(pesos):
+                for k in ATIVOS.keys():
+                    st.session_state[f"sl_{k}"] = pesos.get(k, 0)
+            
+            st.button("✅ Aplicar Carteira Otimizada", on_click=aplicar_carteira_otima, 
+                      args=(pesos_otimos_dict,), key="aplicar_otimo")
+        
+        with c_opt2:
+            st.image(png_fronteira(
+                fronteira, 
+                np.sqrt(np.diag(cov_ativos)), 
+                UNIVERSO.tabela.retorno_liquido, 
+                [v['cor'] for v in ATIVOS.values()], 
+                i_otimo
+            ), width="stretch")
         
 elif modo == "Assistido":
     tese_sel = st.selectbox(
@@ -694,408 +387,772 @@ else:
     st.caption("💡 Modo Manual: Abra o 'Ajuste Fino' abaixo para configurar sua carteira.")
 
 st.divider()
+EXECUCAO.marcar('controles')
 
-# --- INPUTS DE INVESTIMENTO ---
-c1, c2, c3 = st.columns(3)
-v_inicial = c1.number_input(
-    "Aporte Inicial (R$)", 
-    value=10000.0, 
-    step=100.0, 
-    min_value=0.0
-)
-v_mensal = c2.number_input(
-    "Aporte Mensal (R$)", 
-    value=0.0,
-    step=100.0, 
-    min_value=0.0
-)
-anos = c3.slider("Prazo (Anos)", 1, 40, 10)
+# ==============================================================================
+# 8. PAINEL DA CARTEIRA (FRAGMENTOS)
+# ==============================================================================
+# Entradas da carteira → motor → dashboard rodam como um fragmento: mexer nelas
+# reexecuta só o painel (sem CSS, logo, fundo do modo, planos e diagnóstico).
+# Trechos com controles próprios (gráficos, "E se...?", backtest) são fragmentos
+# aninhados e reexecutam sozinhos. Modo, perfil e planos recarregam a página toda.
+
+# --- BACKTEST HISTÓRICO (FRAGMENTO ANINHADO) ---
+@st.fragment
+@REGISTRO.etapa('fragmento.backtest')
+def backtest_historico(pesos_atuais, incluir_carteira):
+    """Backtest das teses (e da carteira atual): regra e período reexecutam só este trecho"""
+    with st.expander("📜 BACKTEST HISTÓRICO (Teses em Dados Reais)", expanded=False):
+        b1, b2 = st.columns(2)
+        regra_backtest = b1.selectbox(
+            "Rebalanceamento", 
+            list(REBALANCEAMENTOS), 
+            index=1,
+            format_func=REBALANCEAMENTOS.get, 
+            key="bt_regra"
+        )
+        anos_backtest = b2.select_slider("Período (Anos)", options=[3, 5, 10, 15], value=10, key="bt_anos")
+
+        # Teses + carteira atual (se houver), todas no mesmo replay diário
+        nomes_bt = list(TESES.keys())
+        carteiras_bt = [normalizar_pesos(TESES[t]['pesos']) for t in nomes_bt]
+        if incluir_carteira:
+            nomes_bt.append("📌 Sua Carteira")
+            carteiras_bt.append(normalizar_pesos(pesos_atuais))
+
+        precos_bt = obter_historico_backtest(UNIVERSO.versao)
+        try:
+            bt = obter_backtest(UNIVERSO.versao, tuple(carteiras_bt), regra_backtest, anos_backtest,
+                                precos_bt, MACRO_DATA['historico'])
+        except ValueError as e:
+            bt = None
+            st.info(f"Backtest indisponível: {e}.")
+
+        if bt is not None:
+            df_bt = pd.DataFrame({
+                'Estratégia': nomes_bt,
+                'CAGR (% a.a.)': bt['cagr'],
+                'Volatilidade (% a.a.)': bt['volatilidade'],
+                'Drawdown Máx. (%)': bt['max_drawdown'],
+                'Giro (% a.a.)': bt['giro'],
+            }).sort_values('CAGR (% a.a.)', ascending=False, ignore_index=True)
+            df_bt.index += 1
+
+            st.caption(
+                f"Replay diário de {bt['datas'][0]:%d/%m/%Y} a {bt['datas'][-1]:%d/%m/%Y} com as taxas de cada ativo. "
+                f"Renda fixa segue a Selic e o IPCA históricos do BCB."
+            )
+            st.dataframe(
+                df_bt,
+                column_config={
+                    'CAGR (% a.a.)': st.column_config.NumberColumn(format="%.2f%%"),
+                    'Volatilidade (% a.a.)': st.column_config.NumberColumn(format="%.2f%%"),
+                    'Drawdown Máx. (%)': st.column_config.NumberColumn(format="%.2f%%"),
+                    'Giro (% a.a.)': st.column_config.NumberColumn(format="%.1f%%"),
+                }
+            )
+            sem_mercado = [n for n in bt['nomes_modelo'] if ATIVOS[n]['tipo'] == 'RV']
+            parciais = [n for n, c in bt['cobertura'].items() if 0 < c < 0.95]
+            if sem_mercado:
+                st.caption("🔧 Renda variável sem histórico de mercado (premissa fixa do modelo): " + ", ".join(sem_mercado))
+            if parciais:
+                st.caption("⏳ Histórico de mercado parcial (início pela curva do modelo): " + ", ".join(parciais))
+
+        if st.button("⬇️ Baixar Histórico Longo (15 anos)", key="bt_baixar"):
+            with st.spinner("Baixando fechamentos..."):
+                carregar_historico_backtest(atualizar=True)
+            obter_historico_backtest.clear()
+            obter_backtest.clear()
+            st.rerun()
+
+# --- GRÁFICOS DA PROJEÇÃO (FRAGMENTO ANINHADO) ---
+@st.fragment
+@REGISTRO.etapa('fragmento.graficos')
+def graficos_projecao(d, cor_geral_card, cenario, rebalancear_meses):
+    """Projeção determinística ou Monte Carlo: o toggle e o nº de cenários reexecutam só este trecho"""
+    v_inicial, v_mensal, anos, renda_desejada, anos_retirada, check_aposentadoria = cenario
+    modo_mc = st.toggle("🎲 Modo Estocástico (Monte Carlo)", key="modo_mc",
+                        help="Simula milhares de cenários de mercado usando a nota de risco da carteira.")
+
+    if modo_mc:
+        n_caminhos = st.select_slider(
+            "Cenários simulados", 
+            options=[10_000, 25_000, 50_000, 100_000], 
+            value=10_000,
+            key="mc_caminhos"
+        )
+        with REGISTRO.etapa('motor.monte_carlo'):
+            mc = simular_monte_carlo(
+                d['retorno_aa'], 
+                d['risco'], 
+                v_inicial, 
+                v_mensal, 
+                anos, 
+                renda_desejada, 
+                anos_retirada, 
+                check_aposentadoria, 
+                n_caminhos=n_caminhos, 
+                semente=42,
+                universo=UNIVERSO
+            )
+        p = mc['percentis']
 
-# --- AJUSTE FINO DA CARTEIRA ---
-with st.expander("🎛️ AJUSTE FINO DA CARTEIRA (Clique para Abrir/Fechar)", expanded=False):
-    t1, t2 = st.tabs(["🛡️ RENDA FIXA", "📈 RENDA VARIÁVEL"])
-    
+        st.image(png_monte_carlo(d, mc, cor_geral_card), width="stretch")
+
+        st.caption(
+            f"🎲 {fmt_pct(mc['n_caminhos'])} cenários • Volatilidade estimada: {mc['volatilidade_aa']:.1f}% a.a. • "
+            f"Probabilidade de superar o CDI: **{mc['prob_supera_cdi']*100:.1f}%** • "
+            f"Mediana final: {fmt_currency(p[50][-1])}"
+        )
+    else:
+        st.image(png_projecao(d, cor_geral_card), width="stretch")
+        if 'y_ativos_nom' in d:
+            st.image(png_composicao(d), width="stretch")
+            st.caption(f"🧩 Composição do patrimônio líquido por ativo • {MODOS_PROJECAO[rebalancear_meses]}")
+
+# --- E SE...? (FRAGMENTO ANINHADO) ---
+@st.fragment
+@REGISTRO.etapa('fragmento.sensibilidade')
+def sensibilidade_prazo_aporte(pesos_atuais, cenario):
+    """Grade prazo x aporte da carteira: o toggle e a métrica reexecutam só este trecho"""
+    v_inicial, v_mensal, anos, renda_desejada, anos_retirada, check_aposentadoria = cenario
+    if st.toggle("🧪 E se...? Prazo × Aporte Mensal", key="modo_sensibilidade",
+                 help="Avalia a carteira atual em todos os prazos (1-40 anos) e 50 níveis de aporte de uma só vez."):
+        grade = obter_grade_sensibilidade(
+            UNIVERSO.versao,
+            normalizar_pesos(pesos_atuais),
+            round(v_inicial, 2),
+            teto_aporte_sensibilidade(v_mensal),
+            renda_desejada,
+            anos_retirada,
+            check_aposentadoria,
+            UNIVERSO
+        )
+        metricas = ['final_real', 'pct_cdi'] + (['cobertura_renda'] if check_aposentadoria and renda_desejada > 0 else [])
+        metrica = st.radio(
+            "Métrica", 
+            metricas, 
+            format_func=lambda m: METRICAS_SENSIBILIDADE[m][0],
+            horizontal=True, 
+            key="sens_metrica",
+            label_visibility="collapsed"
+        )
+        st.image(png_sensibilidade(grade, metrica, anos, v_mensal), width="stretch")
+        st.caption("○ Cenário atual • A grade é recalculada só quando a carteira, o valor inicial "
+                   "ou os parâmetros de aposentadoria mudam.")
+
+# --- AJUSTE FINO (FRAGMENTO ANINHADO, COM DEBOUNCE) ---
+def marcar_ajuste():
+    """on_change dos sliders: registra a edição e adia o recálculo do painel"""
+    st.session_state["ajuste_pendente"] = True
+    st.session_state["ajuste_em"] = time.monotonic()
+
+# Só existe enquanto há ajuste pendente: confere a cada ATRASO_AJUSTE s e recarrega
+# a página (e com ela o painel) quando nenhum slider mudou nesse intervalo
+@st.fragment(run_every=ATRASO_AJUSTE)
+def aplicar_ajustes_pendentes():
+    if time.monotonic() - st.session_state["ajuste_em"] >= ATRASO_AJUSTE:
+        st.rerun()
+
+@st.fragment
+def sliders_ajuste_fino():
+    """Sliders por ativo: cada soltura reexecuta só este trecho; o painel espera o debounce"""
     def gerar_sliders_educativos(tipo_alvo, coluna_alvo):
-        """Gera sliders agrupados por mercado"""
-        mercados = sorted(list(set([
-            v['mercado'] for k, v in ATIVOS.items() if v['tipo'] == tipo_alvo
-        ])))
-        
-        for merc in mercados:
+        """Gera sliders agrupados por mercado (grupos prontos em UNIVERSO.tabela)"""
+        tabela = UNIVERSO.tabela
+        for merc in tabela.mercados_por_tipo.get(tipo_alvo, ()):
             with coluna_alvo.expander(merc, expanded=False):
-                ativos_mercado = [k for k, v in ATIVOS.items() if v['mercado'] == merc]
+                ativos_mercado = [tabela.nomes[i] for i in tabela.por_mercado[merc]]
                 cols = st.columns(min(3, len(ativos_mercado)))
-                
+
                 for i, k in enumerate(ativos_mercado):
                     with cols[i % 3]: 
                         valor_atual = ATIVOS[k]['retorno']
                         is_live = k in LIVE_RETURNS
-                        
+
                         # Emoji indicador de fonte
                         label_emoji = "🟢" if is_live else "🏦" if ATIVOS[k]['tipo'] == 'RF' else "🔧"
-                        
+
                         st.slider(
                             f"{k} ({label_emoji} {valor_atual:.2f}%)", 
                             0, 100, 
                             key=f"sl_{k}",
-                            help=ATIVOS[k]['desc']
+                            on_change=marcar_ajuste,
+                            help=" • ".join(filter(None, (ATIVOS[k]['desc'], resumir_estatisticas(k))))
                         )
-                    
+
+    t1, t2 = st.tabs(["🛡️ RENDA FIXA", "📈 RENDA VARIÁVEL"])
     with t1: 
         gerar_sliders_educativos('RF', st)
     with t2: 
         gerar_sliders_educativos('RV', st)
 
-# Containers para organização
-dashboard_container = st.container()
-raiox_container = st.container()
-
-# --- PLANEJAMENTO DE APOSENTADORIA ---
-st.markdown("<br>", unsafe_allow_html=True)
-with st.container(border=True): 
-    st.markdown("### 🏖️ Planejamento de Aposentadoria (FIRE)")
-    check_aposentadoria = st.checkbox("ATIVAR SIMULAÇÃO DE RENDA PASSIVA", value=False)
-    
-    renda_desejada = 0
-    anos_retirada = 99
-    
-    if check_aposentadoria:
-        c_m1, c_m2 = st.columns(2)
-        with c_m1:
-            renda_desejada = st.number_input(
-                "Renda Mensal Desejada (R$)", 
-                value=100.0,
-                step=100.0, 
-                min_value=0.0
-            ) 
-        with c_m2:
-            anos_retirada = st.slider(
-                "Começar a receber em (Anos):", 
-                0, anos, 
-                min(5, anos)
-            )
+    if st.session_state.get("ajuste_pendente"):
+        st.caption("⏳ A carteira é recalculada quando você parar de ajustar os sliders...")
+        aplicar_ajustes_pendentes()
+
+# --- PAINEL (ENTRADAS → MOTOR → DASHBOARD) ---
+@st.fragment
+def painel_carteira(modo):
+    """Entradas do cenário, cálculo, ranking, dashboard, Raio-X e viabilidade FIRE"""
+    execucao = Execucao('painel')
+
+    # --- INPUTS DE INVESTIMENTO ---
+    c1, c2, c3 = st.columns(3)
+    v_inicial = c1.number_input(
+        "Aporte Inicial (R$)", 
+        step=100.0, 
+        min_value=0.0,
+        key="v_inicial"
+    )
+    v_mensal = c2.number_input(
+        "Aporte Mensal (R$)", 
+        step=100.0, 
+        min_value=0.0,
+        key="v_mensal"
+    )
+    anos = c3.slider("Prazo (Anos)", 1, 40, key="anos")
+
+    # --- AJUSTE FINO DA CARTEIRA ---
+    # O painel roda com os sliders atuais: nenhum ajuste fica pendente
+    st.session_state["ajuste_pendente"] = False
+    with st.expander("🎛️ AJUSTE FINO DA CARTEIRA (Clique para Abrir/Fechar)", expanded=False):
+        sliders_ajuste_fino()
+
+        rebalancear_meses = st.selectbox(
+            "Modo da Projeção",
+            list(MODOS_PROJECAO),
+            format_func=MODOS_PROJECAO.get,
+            key="modo_projecao",
+            help="Por ativo: cada ativo rende a própria taxa (descontada a própria taxa de administração) "
+                 "e aportes/retiradas seguem os pesos alvo; o gráfico mostra a composição do patrimônio."
+        )
 
-# ==============================================================================
-# 9. EXECUÇÃO E DASHBOARD
-# ==============================================================================
+    # Containers para organização
+    ranking_container = st.container()
+    dashboard_container = st.container()
+    raiox_container = st.container()
 
-pesos_atuais = {k: st.session_state[f"sl_{k}"] for k in ATIVOS.keys()}
-d = calcular(
-    pesos_atuais, 
-    v_inicial, 
-    v_mensal, 
-    anos, 
-    renda_desejada, 
-    anos_retirada, 
-    check_aposentadoria
-)
+    # --- PLANEJAMENTO DE APOSENTADORIA ---
+    st.markdown("<br>", unsafe_allow_html=True)
+    with st.container(border=True): 
+        st.markdown("### 🏖️ Planejamento de Aposentadoria (FIRE)")
+        check_aposentadoria = st.checkbox("ATIVAR SIMULAÇÃO DE RENDA PASSIVA", key="check_aposentadoria")
+
+        renda_desejada = 0
+        anos_retirada = 99
+
+        if check_aposentadoria:
+            c_m1, c_m2 = st.columns(2)
+            with c_m1:
+                renda_desejada = st.number_input(
+                    "Renda Mensal Desejada (R$)", 
+                    step=100.0, 
+                    min_value=0.0,
+                    key="renda_desejada"
+                ) 
+            with c_m2:
+                # O prazo pode ter encolhido desde a última escolha
+                st.session_state["anos_retirada"] = min(st.session_state["anos_retirada"], anos)
+                anos_retirada = st.slider(
+                    "Começar a receber em (Anos):", 
+                    0, anos, 
+                    key="anos_retirada"
+                )
+
+    execucao.marcar('entradas')
+
+    pesos_atuais = {k: st.session_state[f"sl_{k}"] for k in ATIVOS.keys()}
+    # Cache do processo, chaveado pela versão do UNIVERSO: reruns sem mudança de entrada
+    # (expander, checkbox) e carteiras populares (perfis, teses) não recalculam, em nenhuma sessão
+    d = calcular_cacheado(
+        pesos_atuais, 
+        v_inicial, 
+        v_mensal, 
+        anos, 
+        renda_desejada, 
+        anos_retirada, 
+        check_aposentadoria,
+        universo=UNIVERSO,
+        rebalancear_meses=rebalancear_meses
+    )
+    cenario = (v_inicial, v_mensal, anos, renda_desejada, anos_retirada, check_aposentadoria)
+    execucao.marcar('calculo')
+
+    # --- RANKING DE ESTRATÉGIAS (MODO ASSISTIDO) ---
+    if modo == "Assistido":
+        with ranking_container:
+            with st.expander("🏆 RANKING DE ESTRATÉGIAS (Todas as Teses)", expanded=False):
+                nomes_teses = list(TESES.keys())
+                ranking = avaliar_carteiras(
+                    montar_matriz_pesos([TESES[t]['pesos'] for t in nomes_teses], UNIVERSO),
+                    v_inicial, 
+                    v_mensal, 
+                    anos, 
+                    renda_desejada, 
+                    anos_retirada, 
+                    check_aposentadoria,
+                    universo=UNIVERSO
+                )
+                df_ranking = pd.DataFrame({
+                    'Estratégia': nomes_teses,
+                    'Saldo Final (Nominal)': ranking['final_nom'],
+                    'Saldo Final (Real)': ranking['final_real'],
+                    'Retorno Líquido (% a.a.)': ranking['retorno_aa'],
+                    'Risco (0-10)': ranking['risco'],
+                    'Renda Passiva (R$/mês)': ranking['renda_passiva_possivel'],
+                }).sort_values('Saldo Final (Real)', ascending=False, ignore_index=True)
+                df_ranking.index += 1
+
+                st.caption(f"Todas as {len(nomes_teses)} teses simuladas com seus parâmetros atuais ({anos} anos).")
+                st.dataframe(
+                    df_ranking,
+                    column_config={
+                        'Saldo Final (Nominal)': st.column_config.NumberColumn(format="R$ %.2f"),
+                        'Saldo Final (Real)': st.column_config.NumberColumn(format="R$ %.2f"),
+                        'Retorno Líquido (% a.a.)': st.column_config.NumberColumn(format="%.2f%%"),
+                        'Risco (0-10)': st.column_config.NumberColumn(format="%.1f"),
+                        'Renda Passiva (R$/mês)': st.column_config.NumberColumn(format="R$ %.2f"),
+                    }
+                )
+
+            backtest_historico(pesos_atuais, incluir_carteira=not d['is_poup'])
+    execucao.marcar('ranking_backtest')
+
+    with dashboard_container:
+        # --- MÉTRICAS PRINCIPAIS ---
+        k1, k2, k3, k4 = st.columns(4)
+
+        COLORS = {
+            "neutral": "#E0E0E0", 
+            "success": "#00CC96", 
+            "warning": "#FDD835",
+            "danger": "#FF4B4B", 
+            "primary": "#29B6F6", 
+            "blue_light": "#81D4FA"
+        }
 
-with dashboard_container:
-    # --- MÉTRICAS PRINCIPAIS ---
-    k1, k2, k3, k4 = st.columns(4)
-
-    COLORS = {
-        "neutral": "#E0E0E0", 
-        "success": "#00CC96", 
-        "warning": "#FDD835",
-        "danger": "#FF4B4B", 
-        "primary": "#29B6F6", 
-        "blue_light": "#81D4FA"
-    }
+        cdi_final = d['y_cdi_nom'][-1]
+        poup_final = d['y_poup_nom'][-1]
+        saldo_final = d['final_nom']
+
+        lucro_nominal = saldo_final - d['investido']
+        lucro_cdi = cdi_final - d['investido']
+        lucro_poup = poup_final - d['investido']
+        lucro_real = d['final_real'] - d['investido']
+
+        # Lógica de comparação com CDI
+        if lucro_nominal < 0:
+            cor_cdi_header = COLORS["danger"]
+            txt_cdi_header = "📉 Prejuízo"
+            cor_geral_card = COLORS["danger"]
+        elif lucro_nominal < lucro_cdi:
+            cor_cdi_header = COLORS["warning"]
+            pct = calc_percent(lucro_nominal, lucro_cdi)
+            txt_cdi_header = f"⚠️ {fmt_pct(pct)}% do CDI"
+            cor_geral_card = COLORS["warning"]
+        else:
+            cor_cdi_header = COLORS["success"]
+            pct = calc_percent(lucro_nominal, lucro_cdi)
+            txt_cdi_header = f"🚀 {fmt_pct(pct)}% do CDI"
+            cor_geral_card = COLORS["success"]
+
+        # Lógica de comparação com Poupança
+        if lucro_nominal < 0: 
+            cor_poup_header = COLORS["danger"]
+            txt_poup_header = "📉 Prejuízo"
+        elif abs(lucro_nominal - lucro_poup) < 0.01: 
+            cor_poup_header = COLORS["warning"]
+            txt_poup_header = "⚠️ = Poupança"
+        else: 
+            cor_poup_header = COLORS["success"]
+            pct_p = calc_percent(lucro_nominal, lucro_poup)
+            txt_poup_header = f"📈 {fmt_pct(pct_p)}% da Poupança"
+
+        sinal_nominal = "-" if lucro_nominal < 0 else "+"
+        sinal_real = "-" if lucro_real < 0 else "+"
+
+        # Classificação de risco
+        c_risco = (COLORS["success"] if d['risco'] < 4 else 
+                   COLORS["warning"] if d['risco'] < 7 else 
+                   COLORS["danger"])
+        l_risco = ("Baixo" if d['risco'] < 4 else 
+                   "Médio" if d['risco'] < 7 else 
+                   "Alto")
+
+        # Cards de métricas
+        k1.markdown(f"""
+        <div class="metric-card">
+            <div class="metric-label" style="color:{COLORS['neutral']}">TOTAL INVESTIDO</div>
+            <div class="metric-main">{fmt_currency(d['investido'])}</div>
+            <div class="metric-detail"> </div>
+        </div>""", unsafe_allow_html=True)
+
+        k2.markdown(f"""
+        <div class="metric-card" style="border-bottom: 3px solid {cor_geral_card};">
+            <div class="metric-label" style="color:{cor_geral_card}">SALDO BRUTO (NOMINAL)</div>
+            <div class="metric-main" style="color:white;">{fmt_currency(d['final_nom'])}</div>
+            <div class="metric-detail">Líquido Real (Ajustado): <span style="color:{cor_geral_card};">{fmt_currency(d['final_real'])}</span></div>
+        </div>""", unsafe_allow_html=True)
+
+        k3.markdown(f"""
+        <div class="metric-card" style="border-bottom: 3px solid {cor_geral_card};">
+            <div class="metric-label" style="color:{cor_geral_card}">LUCRO BRUTO (NOMINAL)</div>
+            <div class="metric-main" style="color:white;">{sinal_nominal} {fmt_currency(abs(lucro_nominal))}</div>
+            <div class="metric-detail">Líquido Real (Ajustado): <span style="color:{cor_geral_card}">{sinal_real} {fmt_currency(abs(lucro_real))}</span></div>
+        </div>""", unsafe_allow_html=True)
+
+        k4.markdown(f"""
+        <div class="metric-card">
+            <div class="metric-label">RISCO ({l_risco})</div>
+            <div class="metric-main" style="color:{c_risco}">{d['risco']:.1f}/10</div>
+            <div class="metric-detail">Retorno: {d['retorno_aa']:.2f}% a.a.</div>
+        </div>""", unsafe_allow_html=True)
+
+        if d['is_poup']:
+            st.warning("⚠️ **MODO POUPANÇA ATIVO** (Carteira vazia). Adicione ativos ou escolha uma estratégia para otimizar seus investimentos.")
 
-    cdi_final = d['y_cdi_nom'][-1]
-    poup_final = d['y_poup_nom'][-1]
-    saldo_final = d['final_nom']
-    
-    lucro_nominal = saldo_final - d['investido']
-    lucro_cdi = cdi_final - d['investido']
-    lucro_poup = poup_final - d['investido']
-    lucro_real = d['final_real'] - d['investido']
-
-    # Lógica de comparação com CDI
-    if lucro_nominal < 0:
-        cor_cdi_header = COLORS["danger"]
-        txt_cdi_header = "📉 Prejuízo"
-        cor_geral_card = COLORS["danger"]
-    elif lucro_nominal < lucro_cdi:
-        cor_cdi_header = COLORS["warning"]
-        pct = calc_percent(lucro_nominal, lucro_cdi)
-        txt_cdi_header = f"⚠️ {fmt_pct(pct)}% do CDI"
-        cor_geral_card = COLORS["warning"]
-    else:
-        cor_cdi_header = COLORS["success"]
-        pct = calc_percent(lucro_nominal, lucro_cdi)
-        txt_cdi_header = f"🚀 {fmt_pct(pct)}% do CDI"
-        cor_geral_card = COLORS["success"]
-
-    # Lógica de comparação com Poupança
-    if lucro_nominal < 0: 
-        cor_poup_header = COLORS["danger"]
-        txt_poup_header = "📉 Prejuízo"
-    elif abs(lucro_nominal - lucro_poup) < 0.01: 
-        cor_poup_header = COLORS["warning"]
-        txt_poup_header = "⚠️ = Poupança"
-    else: 
-        cor_poup_header = COLORS["success"]
-        pct_p = calc_percent(lucro_nominal, lucro_poup)
-        txt_poup_header = f"📈 {fmt_pct(pct_p)}% da Poupança"
-
-    sinal_nominal = "-" if lucro_nominal < 0 else "+"
-    sinal_real = "-" if lucro_real < 0 else "+"
-    
-    # Classificação de risco
-    c_risco = (COLORS["success"] if d['risco'] < 4 else 
-               COLORS["warning"] if d['risco'] < 7 else 
-               COLORS["danger"])
-    l_risco = ("Baixo" if d['risco'] < 4 else 
-               "Médio" if d['risco'] < 7 else 
-               "Alto")
-
-    # Cards de métricas
-    k1.markdown(f"""
-    <div class="metric-card">
-        <div class="metric-label" style="color:{COLORS['neutral']}">TOTAL INVESTIDO</div>
-        <div class="metric-main">{fmt_currency(d['investido'])}</div>
-        <div class="metric-detail"> </div>
-    </div>""", unsafe_allow_html=True)
-    
-    k2.markdown(f"""
-    <div class="metric-card" style="border-bottom: 3px solid {cor_geral_card};">
-        <div class="metric-label" style="color:{cor_geral_card}">SALDO BRUTO (NOMINAL)</div>
-        <div class="metric-main" style="color:white;">{fmt_currency(d['final_nom'])}</div>
-        <div class="metric-detail">Líquido Real (Ajustado): <span style="color:{cor_geral_card};">{fmt_currency(d['final_real'])}</span></div>
-    </div>""", unsafe_allow_html=True)
-    
-    k3.markdown(f"""
-    <div class="metric-card" style="border-bottom: 3px solid {cor_geral_card};">
-        <div class="metric-label" style="color:{cor_geral_card}">LUCRO BRUTO (NOMINAL)</div>
-        <div class="metric-main" style="color:white;">{sinal_nominal} {fmt_currency(abs(lucro_nominal))}</div>
-        <div class="metric-detail">Líquido Real (Ajustado): <span style="color:{cor_geral_card}">{sinal_real} {fmt_currency(abs(lucro_real))}</span></div>
-    </div>""", unsafe_allow_html=True)
-    
-    k4.markdown(f"""
-    <div class="metric-card">
-        <div class="metric-label">RISCO ({l_risco})</div>
-        <div class="metric-main" style="color:{c_risco}">{d['risco']:.1f}/10</div>
-        <div class="metric-detail">Retorno: {d['retorno_aa']:.2f}% a.a.</div>
-    </div>""", unsafe_allow_html=True)
-
-    if d['is_poup']:
-        st.warning("⚠️ **MODO POUPANÇA ATIVO** (Carteira vazia). Adicione ativos ou escolha uma estratégia para otimizar seus investimentos.")
-
-    st.markdown(f"""
-    <div style="display: flex; flex-wrap: wrap; justify-content: space-between; align-items: center; margin-top: 10px; margin-bottom: 10px; background-color: #262730; padding: 12px; border-radius: 5px; border: 1px solid #444; width: 100%;">
-        <div style="font-size: 16px; font-weight: bold; color: #E0E0E0; margin-right: 10px;">📊 Raio-X: Nominal vs Real ({anos} Anos)</div>
-        <div style="font-size: 13px; font-family: sans-serif; font-weight: bold; white-space: nowrap;">
-            <span style="color: {cor_cdi_header}; margin-right: 15px;">{txt_cdi_header}</span>
-            <span style="color: {cor_poup_header};">{txt_poup_header}</span>
+        st.markdown(f"""
+        <div style="display: flex; flex-wrap: wrap; justify-content: space-between; align-items: center; margin-top: 10px; margin-bottom: 10px; background-color: #262730; padding: 12px; border-radius: 5px; border: 1px solid #444; width: 100%;">
+            <div style="font-size: 16px; font-weight: bold; color: #E0E0E0; margin-right: 10px;">📊 Raio-X: Nominal vs Real ({anos} Anos)</div>
+            <div style="font-size: 13px; font-family: sans-serif; font-weight: bold; white-space: nowrap;">
+                <span style="color: {cor_cdi_header}; margin-right: 15px;">{txt_cdi_header}</span>
+                <span style="color: {cor_poup_header};">{txt_poup_header}</span>
+            </div>
         </div>
-    </div>
-    """, unsafe_allow_html=True)
-
-    # --- GRÁFICOS ---
-    g1, g2 = st.columns([3, 1.2])
-
-    with g1:
-        fig, ax = plt.subplots(figsize=(10, 4))
-        COR_CART = cor_geral_card
-        COR_CDI = '#FF9800'
-        COR_POUP = '#FF5722'
-        COR_BRUTO = '#29B6F6'
-
-        if not d['is_poup']:
-            ax.plot(d['x'], d['y_cart_bruto'], color=COR_BRUTO, linewidth=1, 
-                   linestyle='--', label='Bruto (Sem taxas)', alpha=0.8)
-            ax.plot(d['x'], d['y_cart_nom'], color=COR_CART, linewidth=2, 
-                   label='Carteira (Líquida)')
-            ax.plot(d['x'], d['y_cart_real'], color=COR_CART, linewidth=1, 
-                   linestyle=':', alpha=0.5, label='_nolegend_')
-            
-            ax.fill_between(d['x'], d['y_cart_nom'], d['y_cart_bruto'], 
-                          color=COR_BRUTO, alpha=0.10, label='Impacto Tributário')
-            ax.fill_between(d['x'], d['y_cart_nom'], d['y_cart_real'], 
-                          color=COR_CART, alpha=0.15, label='Perda Inflação')
-        
-        ax.plot(d['x'], d['y_cdi_nom'], color=COR_CDI, linewidth=1.5, 
-               linestyle='--', alpha=0.7, label='CDI (Nominal)')
-        ax.plot(d['x'], d['y_cdi_real'], color=COR_CDI, linewidth=0.5, 
-               linestyle=':', alpha=0.3, label='_nolegend_')
-        ax.fill_between(d['x'], d['y_cdi_nom'], d['y_cdi_real'], 
-                       color=COR_CDI, alpha=0.08)
-        
-        style_poup = '-' if d['is_poup'] else ':'
-        alpha_line = 0.9 if d['is_poup'] else 0.5
-        ax.plot(d['x'], d['y_poup_nom'], color=COR_POUP, linewidth=1.5, 
-               linestyle=style_poup, alpha=alpha_line, label='Poupança (Nominal)')
-        ax.plot(d['x'], d['y_poup_real'], color=COR_POUP, linewidth=0.5, 
-               linestyle=':', alpha=0.3, label='_nolegend_')
-        ax.fill_between(d['x'], d['y_poup_nom'], d['y_poup_real'], 
-                       color=COR_POUP, alpha=0.08)
-        
-        ax.legend(loc='upper left', frameon=False, ncol=2, fontsize='x-small')
-        ax.grid(True, alpha=0.1)
-        ax.spines['top'].set_visible(False)
-        ax.spines['right'].set_visible(False)
-        ax.spines['bottom'].set_color('#444')
-        ax.spines['left'].set_color('#444')
-        ax.tick_params(colors='#aaa')
-        ax.set_xlabel('Meses', color='#aaa', fontsize=9)
-        ax.set_ylabel('Patrimônio (R$)', color='#aaa', fontsize=9)
-        
-        st.pyplot(fig)
-        plt.close(fig)
-
-    with g2:
-        fig2, ax2 = plt.subplots(figsize=(5, 5))
-        vals = [i['peso'] for i in d['ativos']]
-        labs = [f"{i['nome']}\n{i['peso']:.0f}%" for i in d['ativos']]
-        colors = [i['cor'] for i in d['ativos']]
-        
-        if not vals: 
-            vals = [1]
-            labs = ["Vazio"]
-            colors = ["#333"]
-            
-        ax2.pie(vals, labels=labs, colors=colors, startangle=90, 
-               textprops={'color': "white", 'fontsize': 7}, 
-               wedgeprops=dict(width=0.45, edgecolor='#222'))
-        ax2.set_title("Alocação", color='white', fontsize=10)
-        
-        st.pyplot(fig2)
-        plt.close(fig2)
+        """, unsafe_allow_html=True)
+        execucao.marcar('cards_html')
 
-# --- RAIO-X DA ESTRATÉGIA ---
-with raiox_container:
-    st.markdown("### 🧠 Raio-X da Estratégia (Live Check)")
-    
-    for item in d['ativos']:
-        is_live = item['nome'] in LIVE_RETURNS
-        is_bcb = item['tipo'] == 'RF' and MACRO_DATA['status']
-        
-        if is_live: 
-            tag = "<span style='color:#BB86FC; font-size:10px; border:1px solid #BB86FC; padding:1px 4px; border-radius:3px;'>HÍBRIDO (50/50)</span>"
-        elif is_bcb: 
-            tag = "<span style='color:#29B6F6; font-size:10px; border:1px solid #29B6F6; padding:1px 4px; border-radius:3px;'>BCB OFICIAL</span>"
-        else: 
-            tag = "<span style='color:#757575; font-size:10px; border:1px solid #757575; padding:1px 4px; border-radius:3px;'>ESTIMADO</span>"
-        
-        c1, c2 = st.columns([1.2, 3.8])
-        c1.markdown(
-            f"<span style='color:{item['cor']}; font-weight:bold;'>● {item['nome']}</span><br>{tag}", 
-            unsafe_allow_html=True
-        )
-        c2.caption(
-            f"**{item['mercado']}** • Retorno Base: **{item['retorno_real']:.2f}%** a.a. • {item['desc']}"
-        )
-        st.markdown("<hr style='margin: 5px 0; border-color: #333;'>", 
-                   unsafe_allow_html=True)
+        # --- GRÁFICOS ---
+        g1, g2 = st.columns([3, 1.2])
 
-# --- ANÁLISE DE VIABILIDADE DE APOSENTADORIA ---
-if check_aposentadoria:
-    st.markdown("### 🏖️ Análise de Viabilidade (Resultados)")
-    
-    if d['taxa_real_mensal'] > 0 and renda_desejada > 0: 
-        patrimonio_necessario = renda_desejada / d['taxa_real_mensal']
-    else: 
-        patrimonio_necessario = 0
-        
-    saldo_final_real = d['final_real']
-    atingiu = saldo_final_real >= patrimonio_necessario and patrimonio_necessario > 0
-    prog = (min(1.0, max(0.0, saldo_final_real / patrimonio_necessario)) 
-            if patrimonio_necessario > 0 else 0.0)
-        
-    if atingiu:
-        st.success("🚀 **META ATINGIDA!** Sua carteira suporta a retirada e ainda cresce.")
-        st.progress(prog, text=f"Sustentabilidade: {prog*100:.1f}%")
-    else:
-        if saldo_final_real < d['investido']: 
-            st.error("📉 **ALERTA CRÍTICO:** As retiradas estão consumindo seu patrimônio principal.")
+        with g1:
+            graficos_projecao(d, cor_geral_card, cenario, rebalancear_meses)
+
+        with g2:
+            st.image(png_alocacao(d['ativos']), width="stretch")
+        execucao.marcar('graficos')
+
+        # --- E SE...? (SENSIBILIDADE PRAZO x APORTE) ---
+        sensibilidade_prazo_aporte(pesos_atuais, cenario)
+        execucao.marcar('sensibilidade')
+
+    # --- RAIO-X DA ESTRATÉGIA ---
+    with raiox_container:
+        st.markdown("### 🧠 Raio-X da Estratégia (Live Check)")
+
+        for item in d['ativos']:
+            is_live = item['nome'] in LIVE_RETURNS
+            is_bcb = item['tipo'] == 'RF' and MACRO_DATA['status']
+
+            if is_live: 
+                tag = "<span style='color:#BB86FC; font-size:10px; border:1px solid #BB86FC; padding:1px 4px; border-radius:3px;'>HÍBRIDO (50/50)</span>"
+            elif is_bcb: 
+                tag = "<span style='color:#29B6F6; font-size:10px; border:1px solid #29B6F6; padding:1px 4px; border-radius:3px;'>BCB OFICIAL</span>"
+            else: 
+                tag = "<span style='color:#757575; font-size:10px; border:1px solid #757575; padding:1px 4px; border-radius:3px;'>ESTIMADO</span>"
+
+            c1, c2 = st.columns([1.2, 3.8])
+            c1.markdown(
+                f"<span style='color:{item['cor']}; font-weight:bold;'>● {item['nome']}</span><br>{tag}", 
+                unsafe_allow_html=True
+            )
+            c2.caption(" • ".join(filter(None, (
+                f"**{item['mercado']}** • Retorno Base: **{item['retorno_real']:.2f}%** a.a.",
+                resumir_estatisticas(item['nome']), item['desc']
+            ))))
+            st.markdown("<hr style='margin: 5px 0; border-color: #333;'>", 
+                       unsafe_allow_html=True)
+    execucao.marcar('raiox')
+
+    # --- ANÁLISE DE VIABILIDADE DE APOSENTADORIA ---
+    if check_aposentadoria:
+        st.markdown("### 🏖️ Análise de Viabilidade (Resultados)")
+
+        if d['taxa_real_mensal'] > 0 and renda_desejada > 0: 
+            patrimonio_necessario = renda_desejada / d['taxa_real_mensal']
         else: 
-            st.warning("⚠️ **Atenção:** Você tem saldo, mas não o suficiente para viver apenas de renda passiva perpétua.")
-        
-        st.progress(prog, text=f"Cobertura da Meta de Independência: {prog*100:.1f}%")
-        st.caption(
-            f"Para uma renda perpétua de {fmt_currency(renda_desejada)}, "
-            f"você precisaria de {fmt_currency(patrimonio_necessario)} acumulados."
-        )
+            patrimonio_necessario = 0
+
+        saldo_final_real = d['final_real']
+        atingiu = saldo_final_real >= patrimonio_necessario and patrimonio_necessario > 0
+        prog = (min(1.0, max(0.0, saldo_final_real / patrimonio_necessario)) 
+                if patrimonio_necessario > 0 else 0.0)
+
+        if atingiu:
+            st.success("🚀 **META ATINGIDA!** Sua carteira suporta a retirada e ainda cresce.")
+            st.progress(prog, text=f"Sustentabilidade: {prog*100:.1f}%")
+        else:
+            if saldo_final_real < d['investido']: 
+                st.error("📉 **ALERTA CRÍTICO:** As retiradas estão consumindo seu patrimônio principal.")
+            else: 
+                st.warning("⚠️ **Atenção:** Você tem saldo, mas não o suficiente para viver apenas de renda passiva perpétua.")
+
+            st.progress(prog, text=f"Cobertura da Meta de Independência: {prog*100:.1f}%")
+            st.caption(
+                f"Para uma renda perpétua de {fmt_currency(renda_desejada)}, "
+                f"você precisaria de {fmt_currency(patrimonio_necessario)} acumulados."
+            )
+
+        # --- PLANO DIRETO (SOLVER) ---
+        if renda_desejada > 0:
+            plano = resolver_fire(d, v_inicial, v_mensal, anos, renda_desejada, anos_retirada)
+
+            if plano['aporte_necessario'] <= v_mensal:
+                txt_aporte, cor_aporte = "Seu aporte atual já basta", COLORS["success"]
+            else:
+                txt_aporte, cor_aporte = f"+ {fmt_currency(plano['aporte_necessario'] - v_mensal)} sobre o atual", COLORS["warning"]
+
+            if plano['meses_ate_meta'] is None:
+                txt_meta, det_meta, cor_meta = "Inatingível", "Em até 100 anos, com o aporte atual", COLORS["danger"]
+            else:
+                txt_meta = fmt_prazo(plano['meses_ate_meta'])
+                det_meta = "Acumulando com o aporte atual, sem retiradas"
+                cor_meta = COLORS["success"] if plano['meses_ate_meta'] <= anos * 12 else COLORS["warning"]
+
+            if plano['mes_esgotamento'] is None:
+                txt_esgot, det_esgot, cor_esgot = "Nunca", "A carteira sustenta a retirada escolhida", COLORS["success"]
+            else:
+                data_esgot = pd.Timestamp.today() + pd.DateOffset(months=plano['mes_esgotamento'])
+                txt_esgot = f"{data_esgot:%m/%Y}"
+                det_esgot = f"Em {fmt_prazo(plano['mes_esgotamento'])} (valores reais)"
+                cor_esgot = COLORS["danger"]
+
+            f1, f2, f3 = st.columns(3)
+            f1.markdown(f"""
+            <div class="metric-card" style="border-bottom: 3px solid {cor_aporte};">
+                <div class="metric-label" style="color:{cor_aporte}">APORTE NECESSÁRIO</div>
+                <div class="metric-main">{fmt_currency(plano['aporte_necessario'])}/mês</div>
+                <div class="metric-detail">{txt_aporte}</div>
+            </div>""", unsafe_allow_html=True)
+            f2.markdown(f"""
+            <div class="metric-card" style="border-bottom: 3px solid {cor_meta};">
+                <div class="metric-label" style="color:{cor_meta}">TEMPO ATÉ A META</div>
+                <div class="metric-main">{txt_meta}</div>
+                <div class="metric-detail">{det_meta}</div>
+            </div>""", unsafe_allow_html=True)
+            f3.markdown(f"""
+            <div class="metric-card" style="border-bottom: 3px solid {cor_esgot};">
+                <div class="metric-label" style="color:{cor_esgot}">SALDO ZERA EM</div>
+                <div class="metric-main">{txt_esgot}</div>
+                <div class="metric-detail">{det_esgot}</div>
+            </div>""", unsafe_allow_html=True)
+
+    execucao.marcar('aposentadoria')
+    execucao.finalizar()
+
+painel_carteira(modo)
+EXECUCAO.marcar('painel')
+
+# --- PLANOS SALVOS (FRAGMENTO) ---
+# Digitar o cliente, salvar ou excluir reexecuta só este trecho; carregar um plano
+# muda as entradas do painel e recarrega a página toda
+@st.fragment
+@REGISTRO.etapa('fragmento.planos')
+def meus_planos():
+    """Salvar o cenário atual e reabrir/excluir os planos de um cliente"""
+    with st.expander("💾 MEUS PLANOS (Salvar e Reabrir Cenários)", expanded=False):
+        usuario_plano = st.text_input("Cliente / usuário", key="plano_usuario",
+                                      placeholder="ex.: e-mail ou código do cliente").strip()
+        if not usuario_plano:
+            st.caption("💡 Informe o cliente para salvar o cenário atual ou reabrir os planos dele.")
+        else:
+            with closing(conectar_planos()) as conn_planos:
+                p1, p2 = st.columns([3, 1])
+                nome_plano = p1.text_input("Nome do plano", key="plano_nome",
+                                           placeholder="ex.: Aposentadoria aos 50").strip()
+                p2.markdown("<br>", unsafe_allow_html=True)
+                if p2.button("💾 Salvar cenário", key="plano_salvar", disabled=not nome_plano,
+                             width="stretch"):
+                    salvar_planos(conn_planos, [{
+                        'usuario': usuario_plano, 'nome': nome_plano, **entradas_cenario(),
+                    }])
+                    st.toast(f"Plano '{nome_plano}' salvo")
+
+                # Só planos sem resumo na versão atual dos dados são reprojetados (em lote)
+                projetar_pendentes(conn_planos, UNIVERSO, usuario=usuario_plano)
+                planos_salvos = carregar_planos(conn_planos, usuario_plano, UNIVERSO.versao)
+
+                if not planos_salvos:
+                    st.caption("Nenhum plano salvo para este cliente.")
+                else:
+                    st.dataframe(pd.DataFrame([{
+                        'Plano': pl['nome'],
+                        'Estratégia': pl['estrategia'] or "Personalizada",
+                        'Prazo': f"{pl['anos']} anos",
+                        'Aporte Mensal': fmt_currency(pl['v_mensal']),
+                        'Saldo Final (Real)': fmt_currency(pl['final_real']),
+                        'Renda Possível': fmt_currency(pl['renda_passiva_possivel']),
+                        'Salvo em': pl['atualizado_em'].replace('T', ' '),
+                    } for pl in planos_salvos]), hide_index=True, width="stretch")
+
+                    por_nome = {pl['nome']: pl for pl in planos_salvos}
+                    s1, s2, s3 = st.columns([3, 1, 1])
+                    sel_plano = s1.selectbox("Plano salvo", list(por_nome), key="plano_sel",
+                                             label_visibility="collapsed")
+                    if s2.button("📂 Carregar", key="plano_carregar", on_click=carregar_plano,
+                                 args=(por_nome[sel_plano],), width="stretch"):
+                        st.rerun()  # O callback mudou entradas de fora do fragmento
+                    if s3.button("🗑️ Excluir", key="plano_excluir", width="stretch"):
+                        excluir_plano(conn_planos, usuario_plano, sel_plano)
+                        st.rerun(scope="fragment")
+                    st.caption("📊 Projeções pela taxa média da carteira, com os dados de mercado atuais.")
+
+st.markdown("<br>", unsafe_allow_html=True)
+meus_planos()
+EXECUCAO.marcar('planos')
 
 # ==============================================================================
-# 10. MONITORES DE CONEXÃO (RODAPÉ)
+# 9. MONITORES DE CONEXÃO (RODAPÉ)
 # ==============================================================================
 st.markdown("<br><br>", unsafe_allow_html=True)
 st.divider()
 
-with st.expander("🔍 MONITORES DE CONEXÃO E DIAGNÓSTICO", expanded=False):
-    col_status1, col_status2, col_status3 = st.columns(3)
-    
-    with col_status1:
-        cor_bcb = "status-live" if MACRO_DATA['status'] else "status-static"
-        st.markdown(f"""
-            <div style="text-align: center;">
-                <span class="status-badge {cor_bcb}" style="font-size: 14px; padding: 8px 16px;">
-                    🏛️ BCB: {MACRO_DATA['selic']:.2f}% (Selic)
-                </span>
-            </div>
-        """, unsafe_allow_html=True)
-    
-    with col_status2:
-        st.markdown(f"""
-            <div style="text-align: center;">
-                <span class="status-badge {cor_bcb}" style="font-size: 14px; padding: 8px 16px;">
-                    📈 IPCA: {MACRO_DATA['ipca']:.2f}%
-                </span>
-            </div>
-        """, unsafe_allow_html=True)
-    
-    with col_status3:
-        st.markdown(f"""
-            <div style="text-align: center;">
-                <span class="status-badge {COR_STATUS_MERCADO}" style="font-size: 14px; padding: 8px 16px;">
-                    🌍 {STATUS_MERCADO}
-                </span>
-            </div>
-        """, unsafe_allow_html=True)
-    
-    st.markdown("<br>", unsafe_allow_html=True)
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.markdown("**📡 Diagnóstico Banco Central:**")
-        if MACRO_DATA['status']:
-            st.success(f"✅ Conectado com sucesso")
-            st.caption(f"Selic Meta: {SELIC_ATUAL:.2f}% a.a.")
-            st.caption(f"IPCA (12 meses): {IPCA_ATUAL:.2f}%")
-            st.caption(f"CDI Estimado: {CDI_ATUAL:.2f}% a.a.")
-        else:
-            st.error("❌ Falha na conexão com API do BCB")
-            st.caption("Usando valores padrão de fallback")
-    
-    with col2:
-        st.markdown("**📊 Diagnóstico Yahoo Finance:**")
-        if total_ativos_live > 0:
-            st.success(f"✅ Conectado - {total_ativos_live} ativos atualizados")
-            st.caption("**Ativos com dados live:**")
-            for nome, retorno in list(LIVE_RETURNS.items())[:5]:
-                emoji = "🟢" if retorno > 0 else "🔴"
-                st.caption(f"{emoji} {nome}: {retorno:+.2f}%")
-            if len(LIVE_RETURNS) > 5:
-                st.caption(f"... e mais {len(LIVE_RETURNS)-5} ativos")
-        else:
-            st.warning("⚠️ Nenhum ativo obtido do mercado")
-            st.caption("**Possíveis causas:**")
-            st.caption("• Mercado fechado (B3: 10h-17h)")
-            st.caption("• Problemas temporários na API")
-            
-            if st.button("🔄 Forçar Atualização dos Dados", key="force_refresh"):
-                st.cache_data.clear()
-                st.rerun()
-    
-    st.markdown("<br>", unsafe_allow_html=True)
-    st.info("💡 **Nota:** Os dados do BCB são atualizados diariamente. Os dados de mercado são atualizados a cada 12 horas durante o horário de funcionamento da B3.")
+# Estático entre interações do painel; o botão de atualizar reexecuta só este trecho
+@st.fragment
+def monitores_diagnostico():
+    """Status do BCB e do mercado, snapshot vigente e desempenho do processo"""
+    # Lido do monitor a cada execução: o botão de atualizar mostra o estado atual,
+    # não o capturado no último rerun completo
+    snapshot = MONITOR_MERCADO.snapshot_atual()
+    macro, live = snapshot['macro'], snapshot['live']
+    desatualizado = MONITOR_MERCADO.desatualizado()
+    universo = obter_universo(snapshot['versao'], snapshot)
+    status_txt, cor_mercado = status_mercado(len(live), desatualizado)
+
+    with st.expander("🔍 MONITORES DE CONEXÃO E DIAGNÓSTICO", expanded=False):
+        col_status1, col_status2, col_status3 = st.columns(3)
+
+        with col_status1:
+            cor_bcb = ("status-static" if not macro['status'] else 
+                       "status-warning" if desatualizado else 
+                       "status-live")
+            st.markdown(f"""
+                <div style="text-align: center;">
+                    <span class="status-badge {cor_bcb}" style="font-size: 14px; padding: 8px 16px;">
+                        🏛️ BCB: {macro['selic']:.2f}% (Selic)
+                    </span>
+                </div>
+            """, unsafe_allow_html=True)
+
+        with col_status2:
+            st.markdown(f"""
+                <div style="text-align: center;">
+                    <span class="status-badge {cor_bcb}" style="font-size: 14px; padding: 8px 16px;">
+                        📈 IPCA: {macro['ipca']:.2f}%
+                    </span>
+                </div>
+            """, unsafe_allow_html=True)
+
+        with col_status3:
+            st.markdown(f"""
+                <div style="text-align: center;">
+                    <span class="status-badge {cor_mercado}" style="font-size: 14px; padding: 8px 16px;">
+                        🌍 {status_txt}
+                    </span>
+                </div>
+            """, unsafe_allow_html=True)
+
+        st.markdown("<br>", unsafe_allow_html=True)
+
+        col1, col2 = st.columns(2)
+
+        with col1:
+            st.markdown("**📡 Diagnóstico Banco Central:**")
+            if macro['status']:
+                if macro['online']:
+                    st.success(f"✅ Conectado com sucesso")
+                else:
+                    st.warning("⏳ Exibindo o último histórico salvo (revalidando em segundo plano)")
+                st.caption(f"Selic Meta: {universo.selic:.2f}% a.a.")
+                st.caption(f"IPCA (12 meses): {universo.ipca:.2f}%")
+                st.caption(f"CDI Estimado: {universo.cdi:.2f}% a.a.")
+            else:
+                st.error("❌ Falha na conexão com API do BCB")
+                st.caption("Usando valores padrão de fallback")
+
+        with col2:
+            st.markdown("**📊 Diagnóstico Yahoo Finance:**")
+            if len(live) > 0:
+                st.success(f"✅ Conectado - {len(live)} ativos atualizados")
+                st.caption("**Ativos com dados live:**")
+                for nome, retorno in list(live.items())[:5]:
+                    emoji = "🟢" if retorno > 0 else "🔴"
+                    st.caption(f"{emoji} {nome}: {retorno:+.2f}%")
+                if len(live) > 5:
+                    st.caption(f"... e mais {len(live)-5} ativos")
+            else:
+                st.warning("⚠️ Nenhum ativo obtido do mercado")
+                st.caption("**Possíveis causas:**")
+                st.caption("• Mercado fechado (B3: 10h-17h)")
+                st.caption("• Problemas temporários na API")
+
+                if st.button("🔄 Forçar Atualização dos Dados", key="force_refresh"):
+                    MONITOR_MERCADO.revalidar(forcar=True)
+                    st.rerun()
+
+        st.markdown("<br>", unsafe_allow_html=True)
+        snapshot_info = (
+            f"🗂️ Snapshot de mercado **{snapshot['versao']}** • "
+            f"carregado às {snapshot['atualizado_em']:%d/%m %H:%M}"
+        )
+        if MONITOR_MERCADO.atualizando:
+            snapshot_info += " • 🔄 atualizando em segundo plano..."
+        elif desatualizado:
+            snapshot_info += " • ⏳ desatualizado (nova tentativa em breve)"
+        st.caption(snapshot_info)
+
+        # --- DESEMPENHO (TODAS AS SESSÕES DO PROCESSO) ---
+        d1, d2 = st.columns([4, 1])
+        d1.markdown("**⏱️ Desempenho (todas as sessões):**")
+        d2.button("🔄 Atualizar", key="diag_atualizar", width="stretch",
+                  help="Relê as métricas do processo sem recarregar a página")
+        resumo_metricas = REGISTRO.resumo()
+        col_tempos, col_caches = st.columns([1.7, 1])
+        with col_tempos:
+            st.dataframe(pd.DataFrame([{
+                'Etapa': etapa,
+                'Amostras': e['n'],
+                'p50 (ms)': e['p50_ms'],
+                'p95 (ms)': e['p95_ms'],
+                'p99 (ms)': e['p99_ms'],
+                'Último rerun (ms)': EXECUCAO.etapas[etapa] * 1000 if etapa in EXECUCAO.etapas else None,
+            } for etapa, e in resumo_metricas['etapas'].items()]),
+                column_config={c: st.column_config.NumberColumn(format="%.1f")
+                               for c in ('p50 (ms)', 'p95 (ms)', 'p99 (ms)', 'Último rerun (ms)')},
+                hide_index=True, width="stretch"
+            )
+        with col_caches:
+            st.dataframe(pd.DataFrame([{
+                'Cache': nome,
+                'Acertos': c['acertos'],
+                'Falhas': c['falhas'],
+                'Taxa de acerto': c['taxa_acerto'] * 100,
+            } for nome, c in resumo_metricas['caches'].items()]),
+                column_config={'Taxa de acerto': st.column_config.NumberColumn(format="%.0f%%")},
+                hide_index=True, width="stretch"
+            )
+        if ENDPOINT_METRICAS is not None:
+            st.caption(f"📈 Métricas no formato Prometheus em `:{ENDPOINT_METRICAS.server_address[1]}/metrics` • "
+                       "logs em JSON com `SIOEI_LOG_JSON=1`")
+        st.info("💡 **Nota:** Os dados do BCB são atualizados diariamente. Os dados de mercado são atualizados a cada 12 horas durante o horário de funcionamento da B3.")
+
+monitores_diagnostico()
+
+# Enquanto a revalidação roda, verifica periodicamente e recarrega a página quando
+# os dados novos chegarem (o resto da página não espera por isso)
+@st.fragment(run_every=2)
+def aguardar_dados_frescos(versao_exibida):
+    if (not MONITOR_MERCADO.atualizando or 
+            MONITOR_MERCADO.snapshot['versao'] != versao_exibida):
+        st.rerun()
+
+if MONITOR_MERCADO.atualizando:
+    aguardar_dados_frescos(SNAPSHOT_MERCADO['versao'])
+EXECUCAO.marcar('diagnostico')
 
 # ==============================================================================
-# 11. RODAPÉ
+# 10. RODAPÉ
 # ==============================================================================
 st.markdown("""
 <div style='text-align: center; margin-top: 50px; color: #888; font-size: 14px;'>
@@ -1111,4 +1168,5 @@ st.markdown("""
         <a href='https://github.com/Open0Bit/SIOEI' target='_blank' style='color: #00E676; text-decoration: none;'>GitHub</a>
     </p>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+EXECUCAO.finalizar()
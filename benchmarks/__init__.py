@@ -0,0 +1,5 @@
+"""
+Benchmarks do SIOEI (motor, dados e gráficos), com fixtures offline e histórico.
+
+Rode a partir da raiz do repositório: `python -m benchmarks.run`.
+"""
@@ -0,0 +1,144 @@
+"""
+Teste de carga da API HTTP do SIOEI (sioei.api), offline.
+
+    python -m benchmarks.carga_api                          # 64 conexões por 10 s
+    python -m benchmarks.carga_api -c 256 -d 20 --repetidos 0.8
+    python -m benchmarks.carga_api --janela-lote 0          # sem micro-lotes, para comparar
+
+Sobe a API num subprocesso com o armazém das fixtures (como benchmarks.run) e
+dispara POST /projecao em conexões keep-alive. Uma fração `--repetidos` dos
+pedidos sai de um conjunto pequeno de cenários populares (acertos do cache de
+respostas); o resto é único. Imprime requisições/s, latências (p50/p90/p99) e
+as estatísticas do servidor (lotes e cache).
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from time import perf_counter
+
+import numpy as np
+import requests
+
+from benchmarks.fixtures import ServidorSGS, carregar_series_sgs
+
+CARTEIRAS = ('Conservador (Rentista)', 'Moderado (Dividendeiro)', 'Agressivo (Arrojado BR)',
+             'All Weather (Ray Dalio)', 'Warren Buffett (90/10)', 'Bogleheads (Lazy Portfolio)')
+
+# ==============================================================================
+# SERVIDOR
+# ==============================================================================
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def subir_api(porta, ambiente, janela_lote, timeout=60):
+    """Inicia `python -m sioei.api` e espera GET /mercado responder"""
+    processo = subprocess.Popen(
+        [sys.executable, '-m', 'sioei.api', '--porta', str(porta), '--janela-lote', str(janela_lote)],
+        env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            if requests.get(f"http://127.0.0.1:{porta}/mercado", timeout=5).ok:
+                return processo
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    processo.kill()
+    raise RuntimeError("A API não respondeu a tempo")
+
+# ==============================================================================
+# CLIENTE (HTTP/1.1 KEEP-ALIVE SOBRE ASYNCIO)
+# ==============================================================================
+def gerar_corpo(rng, repetidos):
+    """Cenário popular (de um conjunto pequeno) com chance `repetidos`, senão um único"""
+    if rng.random() < repetidos:
+        return {'carteira': rng.choice(CARTEIRAS), 'v_inicial': 10000, 'v_mensal': 1000,
+                'anos': rng.choice((10, 20, 30))}
+    return {'carteira': rng.choice(CARTEIRAS), 'v_inicial': round(rng.uniform(0, 1e6), 2),
+            'v_mensal': round(rng.uniform(0, 2e4), 2), 'anos': rng.randint(1, 40),
+            'renda_desejada': round(rng.uniform(0, 2e4), 2), 'anos_inicio_retirada': rng.randint(0, 40),
+            'usar_retirada': rng.random() < 0.5}
+
+async def conexao(porta, ate, repetidos, semente, latencias, erros):
+    rng = random.Random(semente)
+    leitor, escritor = await asyncio.open_connection('127.0.0.1', porta)
+    try:
+        while perf_counter() < ate:
+            corpo = json.dumps(gerar_corpo(rng, repetidos)).encode()
+            pedido = (f"POST /projecao HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+                      f"Content-Length: {len(corpo)}\r\n\r\n").encode() + corpo
+            inicio = perf_counter()
+            escritor.write(pedido)
+            cabecalho = await leitor.readuntil(b"\r\n\r\n")
+            campos = dict(linha.split(b":", 1) for linha in cabecalho.split(b"\r\n")[1:] if b":" in linha)
+            tamanho = int({k.strip().lower(): v for k, v in campos.items()}[b'content-length'])
+            await leitor.readexactly(tamanho)
+            latencias.append(perf_counter() - inicio)
+            if cabecalho.split(b" ", 2)[1] != b"200":
+                erros.append(cabecalho.split(b"\r\n", 1)[0].decode())
+    finally:
+        escritor.close()
+
+async def disparar(porta, conexoes, duracao, repetidos):
+    latencias, erros = [], []
+    ate = perf_counter() + duracao
+    inicio = perf_counter()
+    await asyncio.gather(*(conexao(porta, ate, repetidos, i, latencias, erros) for i in range(conexoes)))
+    return latencias, erros, perf_counter() - inicio
+
+# ==============================================================================
+# EXECUÇÃO
+# ==============================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.carga_api', description='Teste de carga da API.')
+    parser.add_argument('-c', '--conexoes', type=int, default=64, help='conexões simultâneas (padrão: 64)')
+    parser.add_argument('-d', '--duracao', type=float, default=10, help='segundos de carga (padrão: 10)')
+    parser.add_argument('--repetidos', type=float, default=0.5,
+                        help='fração de pedidos repetidos/populares (padrão: 0.5)')
+    parser.add_argument('--janela-lote', type=float, default=2, help='janela do micro-lote na API, em ms')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.ERROR)
+
+    with tempfile.TemporaryDirectory(prefix='sioei-carga-') as diretorio, ServidorSGS() as servidor:
+        os.environ['SIOEI_DADOS'] = diretorio
+        os.environ['SIOEI_BCB_URL'] = servidor.url
+        from benchmarks.casos import popular_armazem
+        from sioei.data import SERIES_BCB
+        servidor.publicar(carregar_series_sgs(SERIES_BCB.values()))
+        popular_armazem()
+
+        porta = porta_livre()
+        api = subir_api(porta, dict(os.environ), args.janela_lote)
+        try:
+            asyncio.run(disparar(porta, min(args.conexoes, 8), 1.0, args.repetidos))  # Aquecimento
+            latencias, erros, tempo = asyncio.run(disparar(porta, args.conexoes, args.duracao, args.repetidos))
+            estatisticas = requests.get(f"http://127.0.0.1:{porta}/estatisticas", timeout=5).json()
+        finally:
+            api.terminate()
+            api.wait(timeout=10)
+
+    ms = np.percentile(latencias, [50, 90, 99]) * 1000
+    print(f"{len(latencias)} requisições em {tempo:.1f} s com {args.conexoes} conexões "
+          f"({args.repetidos:.0%} repetidas, janela de lote {args.janela_lote:g} ms)")
+    print(f"  vazão:     {len(latencias) / tempo:,.0f} req/s")
+    print(f"  latência:  p50 {ms[0]:.2f} ms • p90 {ms[1]:.2f} ms • p99 {ms[2]:.2f} ms • "
+          f"máx {max(latencias) * 1000:.2f} ms")
+    print(f"  servidor:  {estatisticas['lotes']} lotes, {estatisticas['media_por_lote']:.1f} projeções/lote • "
+          f"cache {estatisticas['cache']['taxa_acerto']:.0%} de acertos")
+    if erros:
+        print(f"  erros:     {len(erros)} (ex.: {erros[0]})")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,398 @@
+"""
+Casos de benchmark do SIOEI: motor, planos salvos, base de ATIVOS, camada de dados, estatísticas e gráficos.
+
+Importe só depois de apontar SIOEI_DADOS e SIOEI_BCB_URL para o ambiente de
+benchmark (ver benchmarks.run), pois sioei.data lê essas variáveis na importação.
+"""
+
+import os
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.fixtures import (ServidorPrecos, baixador_fixture, baixador_servidor, carregar_fechamentos,
+                                 fechamentos_sinteticos)
+from sioei import data
+from sioei.api import AgrupadorProjecoes
+from sioei.backtest import backtest_carteiras
+from sioei.charts import (CACHE_GRAFICOS, png_alocacao, png_composicao, png_monte_carlo, png_projecao,
+                          png_sensibilidade)
+from sioei.engine import (CACHE_CALCULOS, avaliar_carteiras, calcular, calcular_cacheado, evoluir_por_ativo,
+                          grade_sensibilidade, montar_matriz_pesos, normalizar_entrada, resolver_fire,
+                          simular_monte_carlo)
+from sioei.estatisticas import JANELAS, EstatisticasRolantes
+from sioei.planos import (carregar_planos, conectar_planos, listar_cenarios, projetar_pendentes,
+                          salvar_planos)
+from sioei.optimizer import montar_covariancia
+from sioei.universe import PERFIS, TESES, Universo, construir_ativos, construir_universo
+
+@dataclass
+class Caso:
+    """Um benchmark: `funcao` é medida; `preparar` roda antes de cada medição, fora do tempo"""
+    nome: str
+    funcao: Callable
+    preparar: Optional[Callable] = None
+    tolerancia: Optional[float] = None  # Regressão aceitável (fração); None = padrão do executor
+
+CASOS = []
+
+def caso(nome, preparar=None, tolerancia=None):
+    def registrar(funcao):
+        CASOS.append(Caso(nome, funcao, preparar, tolerancia))
+        return funcao
+    return registrar
+
+# ==============================================================================
+# AMBIENTE (ARMAZÉM LOCAL + FIXTURES)
+# ==============================================================================
+TICKERS_YAHOO = data.TICKERS_YAHOO
+CARTEIRA_PADRAO = PERFIS['Moderado (Dividendeiro) ⚖️']
+
+@lru_cache(maxsize=1)
+def baixar_fixture():
+    return baixador_fixture(carregar_fechamentos(TICKERS_YAHOO))
+
+def limpar_armazem():
+    if os.path.exists(data.ARQUIVO_ARMAZEM):
+        os.remove(data.ARQUIVO_ARMAZEM)
+
+def popular_armazem():
+    """Garante o armazém completo (BCB + preços), como após uma atualização bem-sucedida"""
+    data.carregar_dados_bcb(atualizar=True)
+    data.atualizar_armazem(TICKERS_YAHOO, baixar=baixar_fixture())
+
+@lru_cache(maxsize=1)
+def universo_fixture():
+    popular_armazem()
+    return construir_universo(data.montar_snapshot(atualizar=False))
+
+@lru_cache(maxsize=None)
+def resultados_grafico(anos=40):
+    """Entrada dos gráficos: projeção com retirada e leque de Monte Carlo"""
+    universo = universo_fixture()
+    d = calcular(CARTEIRA_PADRAO, 10000, 1000, anos, 5000, anos * 3 // 4, True, universo=universo)
+    mc = simular_monte_carlo(d['retorno_aa'], d['risco'], 10000, 1000, anos, 5000, anos * 3 // 4, True,
+                             semente=42, universo=universo)
+    return d, mc
+
+# ==============================================================================
+# MOTOR
+# ==============================================================================
+def _registrar_calcular(anos, usar_retirada):
+    rotulo = 'retirada' if usar_retirada else 'acumulacao'
+
+    @caso(f"engine.calcular[{anos}a,{rotulo}]")
+    def _():
+        calcular(CARTEIRA_PADRAO, 10000, 1000, anos, 5000, anos // 2, usar_retirada,
+                 universo=universo_fixture())
+
+for _anos in (1, 10, 20, 40):
+    for _retirada in (False, True):
+        _registrar_calcular(_anos, _retirada)
+
+@lru_cache(maxsize=1)
+def entradas_api(n=64):
+    """Projeções distintas como chegam num micro-lote da API (já normalizadas)"""
+    rng = np.random.default_rng(11)
+    carteiras = list(PERFIS.values()) + [t['pesos'] for t in TESES.values()]
+    return [normalizar_entrada(carteiras[i % len(carteiras)], *rng.uniform(0, 1e5, 2).round(2),
+                               int(rng.integers(1, 41)), 5000, 20, bool(i % 2))
+            for i in range(n)]
+
+def _registrar_por_ativo(rebalancear_meses):
+    @caso(f"engine.calcular[40a,retirada,por ativo,rebal={rebalancear_meses}m]")
+    def _():
+        calcular(CARTEIRA_PADRAO, 10000, 1000, 40, 5000, 20, True, universo=universo_fixture(),
+                 rebalancear_meses=rebalancear_meses)
+
+for _rebal in (0, 12):
+    _registrar_por_ativo(_rebal)
+
+@lru_cache(maxsize=1)
+def fatores_sinteticos(n_ativos=500):
+    """Fatores mensais (bruto, líquido, real) e pesos de um universo sintético grande"""
+    rng = np.random.default_rng(7)
+    taxas = rng.uniform(0.002, 0.015, n_ativos)
+    fatores = np.stack([1 + taxas, 1 + taxas * 0.9, (1 + taxas * 0.9) / 1.0035])
+    return fatores, rng.dirichlet(np.ones(n_ativos))
+
+@caso("engine.evoluir_por_ativo[500 ativos,40a,anual]")
+def _():
+    fatores, pesos = fatores_sinteticos()
+    evoluir_por_ativo(fatores, pesos, 10000, 1000, 5000, 240, 480, rebalancear_meses=12)
+
+@caso("engine.calcular_cacheado[40a,acerto]")
+def _():
+    calcular_cacheado(CARTEIRA_PADRAO, 10000, 1000, 40, 5000, 20, True,
+                      universo=universo_fixture(), versao_dados='benchmark')
+
+@caso("engine.calcular_cacheado[40a,falha]", preparar=CACHE_CALCULOS.limpar)
+def _(_):
+    calcular_cacheado(CARTEIRA_PADRAO, 10000, 1000, 40, 5000, 20, True,
+                      universo=universo_fixture(), versao_dados='benchmark')
+
+@caso("engine.avaliar_carteiras[teses+perfis,40a]")
+def _():
+    universo = universo_fixture()
+    carteiras = list(PERFIS.values()) + [t['pesos'] for t in TESES.values()]
+    avaliar_carteiras(montar_matriz_pesos(carteiras, universo), 10000, 1000, 40, 5000, 20, True,
+                      universo=universo)
+
+@caso("engine.grade_sensibilidade[40x50]")
+def _():
+    grade_sensibilidade(CARTEIRA_PADRAO, 10000, np.arange(1, 41), np.linspace(0, 5000, 50), 5000, 20, True,
+                        universo=universo_fixture())
+
+@caso("engine.resolver_fire[40a]")
+def _():
+    resolver_fire(resultados_grafico()[0], 10000, 1000, 40, 5000, 30)
+
+@caso("engine.resolver_fire[40a,por ativo anual]")
+def _():
+    d = calcular(CARTEIRA_PADRAO, 10000, 1000, 40, 5000, 30, True, universo=universo_fixture(),
+                 rebalancear_meses=12)
+    resolver_fire(d, 10000, 1000, 40, 5000, 30)
+
+@caso("api.lote[64 projeções]")
+def _():
+    AgrupadorProjecoes._avaliar(universo_fixture(), entradas_api())
+
+@caso("engine.simular_monte_carlo[10k,40a]")
+def _():
+    d, _ = resultados_grafico()
+    simular_monte_carlo(d['retorno_aa'], d['risco'], 10000, 1000, 40, semente=42,
+                        universo=universo_fixture())
+
+@lru_cache(maxsize=1)
+def universo_sintetico(n_ativos=500):
+    """Universo com `n_ativos` ativos sintéticos (meta do README: 500+) e carteiras de 20 deles"""
+    rng = np.random.default_rng(17)
+    mercados = [f"Mercado {i}" for i in range(40)]
+    ativos = {f"Ativo {i:03d}": {
+        'retorno': float(rng.uniform(6, 30)), 'risco': int(rng.integers(1, 11)), 'taxa': float(rng.uniform(0, 3)),
+        'tipo': 'RF' if i % 2 else 'RV', 'mercado': mercados[i % len(mercados)], 'cor': '#888888', 'desc': '',
+    } for i in range(n_ativos)}
+    universo = Universo(selic=10.5, ipca=4.5, ativos=ativos, versao='sintetico')
+    nomes = list(ativos)
+    carteiras = [{nomes[j]: int(rng.integers(1, 20)) for j in rng.choice(n_ativos, 20, replace=False)}
+                 for _ in range(1000)]
+    return universo, carteiras
+
+@caso("engine.calcular[500 ativos,carteira de 20,40a]")
+def _():
+    universo, carteiras = universo_sintetico()
+    calcular(carteiras[0], 10000, 1000, 40, 5000, 20, True, universo=universo)
+
+@caso("engine.avaliar_carteiras[500 ativos,1k carteiras]")
+def _():
+    universo, carteiras = universo_sintetico()
+    avaliar_carteiras(montar_matriz_pesos(carteiras, universo), 10000, 1000, 40, universo=universo)
+
+@caso("optimizer.montar_covariancia[500 ativos,sem histórico]")
+def _():
+    montar_covariancia(pd.DataFrame(), universo=universo_sintetico()[0])
+
+# ==============================================================================
+# BACKTEST (TODAS AS TESES, HISTÓRICO LONGO DAS FIXTURES)
+# ==============================================================================
+@lru_cache(maxsize=1)
+def dados_backtest():
+    popular_armazem()
+    precos = data.carregar_historico_backtest(anos=12, atualizar=True, baixar=baixar_fixture())
+    return precos, data.carregar_dados_bcb(atualizar=False)['historico']
+
+def _registrar_backtest(regra):
+    @caso(f"backtest.teses[18,10a,{regra}]")
+    def _():
+        precos, historico_bcb = dados_backtest()
+        backtest_carteiras([t['pesos'] for t in TESES.values()], precos, historico_bcb, regra,
+                           inicio=precos.index[-1] - pd.DateOffset(years=10))
+
+for _regra in ('nenhum', 'mensal', 'limiar'):
+    _registrar_backtest(_regra)
+
+# ==============================================================================
+# PLANOS SALVOS (SQLITE NO ARMAZÉM DO BENCHMARK)
+# ==============================================================================
+@lru_cache(maxsize=1)
+def banco_planos(n=20000, planos_por_usuario=10):
+    """Banco com `n` planos (estratégias e parâmetros variados), todos já projetados"""
+    rng = np.random.default_rng(13)
+    carteiras = list(PERFIS.values()) + [t['pesos'] for t in TESES.values()]
+    planos = [{
+        'usuario': f"cliente{i // planos_por_usuario:05d}", 'nome': f"plano {i % planos_por_usuario}",
+        'pesos': carteiras[i % len(carteiras)], 'v_inicial': float(rng.uniform(0, 1e6)),
+        'v_mensal': float(rng.uniform(0, 2e4)), 'anos': int(rng.integers(1, 41)),
+        'renda_desejada': float(rng.uniform(0, 2e4)), 'anos_inicio_retirada': int(rng.integers(0, 41)),
+        'usar_retirada': bool(i % 2),
+    } for i in range(n)]
+    with closing(conectar_planos()) as conn:
+        salvar_planos(conn, planos)
+        projetar_pendentes(conn, universo_fixture())
+    return n
+
+def invalidar_projecoes(n=2000):
+    """Apaga os resumos dos `n` primeiros planos (como após editá-los)"""
+    banco_planos()
+    with closing(conectar_planos()) as conn, conn:
+        conn.execute("DELETE FROM projecoes WHERE plano_id <= ?", (n,))
+
+@caso("planos.listar_cenarios[20k,top 50 por saldo real]", preparar=banco_planos)
+def _(_):
+    with closing(conectar_planos()) as conn:
+        listar_cenarios(conn, universo_fixture().versao, limite=50)
+
+@caso("planos.carregar_planos[cliente com 10]", preparar=banco_planos)
+def _(_):
+    with closing(conectar_planos()) as conn:
+        carregar_planos(conn, "cliente00042", universo_fixture().versao)
+
+@caso("planos.projetar_pendentes[2k de 20k]", preparar=invalidar_projecoes)
+def _(_):
+    with closing(conectar_planos()) as conn:
+        projetar_pendentes(conn, universo_fixture())
+
+# ==============================================================================
+# BASE DE ATIVOS
+# ==============================================================================
+@caso("universe.construir_ativos")
+def _():
+    universo = universo_fixture()
+    construir_ativos(universo.selic, universo.ipca, universo.live)
+
+@caso("universe.construir_universo[snapshot em disco]")
+def _():
+    universo_fixture()
+    construir_universo(data.montar_snapshot(atualizar=False))
+
+# ==============================================================================
+# DADOS (SERVIDORES SGS E DE PREÇOS LOCAIS + FECHAMENTOS GRAVADOS)
+# ==============================================================================
+@caso("data.carregar_dados_bcb[frio]", preparar=limpar_armazem, tolerancia=0.5)
+def _(_):
+    data.carregar_dados_bcb(atualizar=True)
+
+@caso("data.carregar_dados_bcb[incremental]", preparar=popular_armazem, tolerancia=0.5)
+def _(_):
+    data.carregar_dados_bcb(atualizar=True)
+
+@caso("data.carregar_dados_bcb[disco]", preparar=popular_armazem)
+def _(_):
+    data.carregar_dados_bcb(atualizar=False)
+
+@caso("data.retornos_live[frio]", preparar=limpar_armazem, tolerancia=0.5)
+def _(_):
+    historico, _ = data.atualizar_armazem(TICKERS_YAHOO, baixar=baixar_fixture())
+    data.calcular_retornos_live(historico)
+
+@caso("data.retornos_live[incremental]", preparar=popular_armazem, tolerancia=0.5)
+def _(_):
+    historico, _ = data.atualizar_armazem(TICKERS_YAHOO, baixar=baixar_fixture())
+    data.calcular_retornos_live(historico)
+
+@caso("data.montar_snapshot[disco]", preparar=popular_armazem)
+def _(_):
+    data.montar_snapshot(atualizar=False)
+
+# --- DOWNLOAD EM LOTES (SERVIDOR DE PREÇOS LOCAL, 50 MS POR REQUISIÇÃO) ---
+TICKERS_SINTETICOS = [f"T{i:04d}.SA" for i in range(1000)]
+
+@lru_cache(maxsize=None)
+def servidor_precos(instabilidade=0.0, invalidos=()):
+    """ServidorPrecos com 1000 tickers sintéticos, aberto até o fim do processo"""
+    servidor = ServidorPrecos(fechamentos_sinteticos(TICKERS_SINTETICOS), latencia=0.05,
+                              instabilidade=instabilidade, invalidos=invalidos)
+    servidor.__enter__()
+    return servidor, baixador_servidor(servidor.url)
+
+def _registrar_lotes(n_tickers):
+    @caso(f"data.baixar_em_lotes[{n_tickers} tickers,1 ano]", tolerancia=0.5)
+    def _():
+        _, baixar = servidor_precos()
+        data.baixar_em_lotes(TICKERS_SINTETICOS[:n_tickers], date.today() - timedelta(days=365), baixar,
+                             por_segundo=0)
+
+for _n in (100, 500, 1000):
+    _registrar_lotes(_n)
+
+@caso("data.baixar_em_lotes[500 tickers,serializado como o yfinance]", tolerancia=0.5)
+def _():
+    # Caminho de produção: baixar_fechamentos_yahoo segura _LOCK_YFINANCE a cada lote
+    _, baixar = servidor_precos()
+    
+    def baixar_serializado(tickers, inicio):
+        with data._LOCK_YFINANCE:
+            return baixar(tickers, inicio)
+    data.baixar_em_lotes(TICKERS_SINTETICOS[:500], date.today() - timedelta(days=365), baixar_serializado,
+                         por_segundo=0)
+
+@caso("data.baixar_em_lotes[500 tickers,10% instável,1 inválido]", tolerancia=0.5)
+def _():
+    _, baixar = servidor_precos(0.1, ('T0042.SA',))
+    data.baixar_em_lotes(TICKERS_SINTETICOS[:500], date.today() - timedelta(days=365), baixar,
+                         por_segundo=0, espera=0.05)
+
+# --- ESTATÍSTICAS EM JANELAS MÓVEIS (500 ATIVOS, 5 ANOS + UM PREGÃO) ---
+@lru_cache(maxsize=1)
+def precos_estatisticas(n_ativos=500):
+    fechamentos = fechamentos_sinteticos(TICKERS_SINTETICOS[:n_ativos])
+    return fechamentos.iloc[-(max(JANELAS.values()) + 2):]
+
+@lru_cache(maxsize=1)
+def motor_estatisticas():
+    motor = EstatisticasRolantes(precos_estatisticas().columns)
+    motor.adicionar(precos_estatisticas())
+    return motor
+
+@caso("estatisticas.adicionar[500 ativos,último pregão reescrito]")
+def _():
+    motor_estatisticas().adicionar(precos_estatisticas().iloc[-1:])
+
+@caso("estatisticas.adicionar[500 ativos,recálculo completo]", tolerancia=0.5)
+def _():
+    EstatisticasRolantes(precos_estatisticas().columns).adicionar(precos_estatisticas())
+
+@caso("estatisticas.resumo[500 ativos,4 janelas]")
+def _():
+    motor_estatisticas().resumo()
+
+# ==============================================================================
+# GRÁFICOS (PNG COMO NO DASHBOARD: "sem cache" rasteriza, "cache" é um acerto)
+# ==============================================================================
+def _registrar_graficos(anos):
+    @caso(f"charts.g1_projecao[{anos}a,sem cache]", preparar=CACHE_GRAFICOS.limpar)
+    def _(_):
+        png_projecao(resultados_grafico(anos)[0], '#00E676')
+
+    @caso(f"charts.g1_monte_carlo[{anos}a,sem cache]", preparar=CACHE_GRAFICOS.limpar)
+    def _(_):
+        d, mc = resultados_grafico(anos)
+        png_monte_carlo(d, mc, '#00E676')
+
+for _anos in (1, 40):
+    _registrar_graficos(_anos)
+
+@caso("charts.g2_alocacao[sem cache]", preparar=CACHE_GRAFICOS.limpar)
+def _(_):
+    png_alocacao(resultados_grafico()[0]['ativos'])
+
+@caso("charts.g1_composicao[40a,sem cache]", preparar=CACHE_GRAFICOS.limpar)
+def _(_):
+    d = calcular(CARTEIRA_PADRAO, 10000, 1000, 40, 5000, 30, True, universo=universo_fixture(),
+                 rebalancear_meses=12)
+    png_composicao(d)
+
+@caso("charts.sensibilidade[40x50,sem cache]", preparar=CACHE_GRAFICOS.limpar)
+def _(_):
+    grade = grade_sensibilidade(CARTEIRA_PADRAO, 10000, np.arange(1, 41), np.linspace(0, 5000, 50),
+                                universo=universo_fixture())
+    png_sensibilidade(grade, 'final_real', 20, 1000)
+
+@caso("charts.g1_projecao[40a,cache]")
+def _():
+    png_projecao(resultados_grafico()[0], '#00E676')
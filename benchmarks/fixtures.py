@@ -0,0 +1,262 @@
+"""
+Fixtures de mercado dos benchmarks: séries SGS e fechamentos diários, e servidores
+locais que fazem o papel do BCB (ServidorSGS) e de uma fonte de preços (ServidorPrecos).
+
+Se houver gravações em benchmarks/fixtures/ (ver `gravar_fixtures`), elas são usadas;
+senão, gera-se um histórico sintético determinístico (sementes fixas, até hoje)
+com o mesmo formato das APIs.
+Assim os benchmarks rodam sempre offline e com a mesma carga de dados.
+"""
+
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+DIRETORIO_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+INICIO_SINTETICO = date(2000, 1, 1)
+
+# ==============================================================================
+# SÉRIES SGS (BANCO CENTRAL)
+# ==============================================================================
+def serie_sgs_sintetica(codigo):
+    """Série no formato da API SGS: Selic Meta (432) diária, IPCA 12m (13522) mensal"""
+    rng = np.random.default_rng(codigo)
+    dias = pd.bdate_range(INICIO_SINTETICO, date.today())
+    if codigo == 13522:
+        dias = pd.date_range(INICIO_SINTETICO, date.today(), freq='MS')
+        valores = np.clip(6 + np.cumsum(rng.normal(0, 0.35, len(dias))), 2, 12)
+    else:
+        # Selic muda em degraus de até 0,5 p.p. a cada 32 dias úteis (~reuniões do Copom)
+        passos = np.where(np.arange(len(dias)) % 32 == 0, rng.choice([-0.5, -0.25, 0, 0.25, 0.5], len(dias)), 0)
+        valores = np.clip(12 + np.cumsum(passos), 2, 26)
+    return [{'data': d.strftime("%d/%m/%Y"), 'valor': f"{v:.2f}"} for d, v in zip(dias, valores)]
+
+def carregar_series_sgs(codigos):
+    """{codigo: lista de observações SGS}, gravadas se houver, senão sintéticas"""
+    series = {}
+    for codigo in codigos:
+        caminho = os.path.join(DIRETORIO_FIXTURES, f"sgs_{codigo}.json")
+        if os.path.exists(caminho):
+            with open(caminho, encoding="utf-8") as f:
+                series[codigo] = json.load(f)
+        else:
+            series[codigo] = serie_sgs_sintetica(codigo)
+    return series
+
+class ServidorSGS:
+    """
+    Substituto local da API SGS (mesma rota, parâmetros e limite de 10 anos por janela).
+    Use como context manager; `url` vai em SIOEI_BCB_URL e `requisicoes` conta as chamadas.
+    A porta é reservada na criação, então a URL existe antes de as séries serem publicadas.
+    """
+
+    def __init__(self, series=None):
+        self.series = {}
+        self.requisicoes = 0
+        self.publicar(series or {})
+        servidor = self
+
+        class Manipulador(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                servidor.requisicoes += 1
+                url = urlparse(self.path)
+                consulta = parse_qs(url.query)
+                codigo = int(re.search(r"bcdata\.sgs\.(\d+)", url.path).group(1))
+                inicio = datetime.strptime(consulta['dataInicial'][0], "%d/%m/%Y").date()
+                fim = datetime.strptime(consulta['dataFinal'][0], "%d/%m/%Y").date()
+                if (fim - inicio).days > 3650:
+                    status, obs = 406, {'erro': 'janela maior que 10 anos'}
+                else:
+                    obs = [o for d, o in servidor.series.get(codigo, []) if inicio <= d <= fim]
+                    status = 200 if obs else 404
+                corpo = json.dumps(obs).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+        self._http = ThreadingHTTPServer(('127.0.0.1', 0), Manipulador)
+        self.url = f"http://127.0.0.1:{self._http.server_address[1]}"
+
+    def publicar(self, series):
+        """Passa a servir `series` ({codigo: observações no formato SGS})"""
+        self.series.update({
+            codigo: [(datetime.strptime(o['data'], "%d/%m/%Y").date(), o) for o in obs]
+            for codigo, obs in series.items()
+        })
+
+    def __enter__(self):
+        threading.Thread(target=self._http.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._http.shutdown()
+        self._http.server_close()
+
+# ==============================================================================
+# FECHAMENTOS DIÁRIOS (YAHOO FINANCE)
+# ==============================================================================
+def fechamentos_sinteticos(tickers):
+    """Passeio aleatório log-normal por ticker nos dias úteis dos últimos 12 anos (datas x tickers)"""
+    dias = pd.bdate_range(date.today() - timedelta(days=12 * 365), date.today())
+    colunas = {}
+    for i, ticker in enumerate(sorted(tickers)):
+        rng = np.random.default_rng(1000 + i)
+        colunas[ticker] = 100 * np.exp(np.cumsum(rng.normal(0.0004, 0.015, len(dias))))
+    return pd.DataFrame(colunas, index=dias)
+
+def carregar_fechamentos(tickers):
+    """Fechamentos gravados (precos.csv) se houver, senão sintéticos"""
+    caminho = os.path.join(DIRETORIO_FIXTURES, "precos.csv")
+    if os.path.exists(caminho):
+        return pd.read_csv(caminho, index_col=0, parse_dates=True)
+    return fechamentos_sinteticos(tickers)
+
+def baixador_fixture(fechamentos):
+    """Substituto de `baixar_fechamentos_yahoo` para `atualizar_armazem(baixar=...)`"""
+    def baixar(tickers, inicio):
+        colunas = [t for t in tickers if t in fechamentos.columns]
+        return fechamentos.loc[fechamentos.index >= pd.Timestamp(inicio), colunas]
+    return baixar
+
+class ServidorPrecos:
+    """
+    Fonte de preços local para `baixar_em_lotes` (no lugar do Yahoo), com rede simulada.
+    
+        GET /fechamentos?tickers=A,B&inicio=AAAA-MM-DD
+        -> {"datas": [...], "fechamentos": {"A": [...], "B": [...]}}
+    
+    Cada requisição leva `latencia` segundos; acima de `max_por_segundo` responde 429,
+    com probabilidade `instabilidade` responde 503 e, se o lote tiver algum ticker de
+    `invalidos`, 404 (o lote inteiro falha). Tickers desconhecidos vêm sem dados.
+    Use como context manager, como o ServidorSGS.
+    """
+
+    def __init__(self, fechamentos, latencia=0.02, max_por_segundo=None, instabilidade=0.0,
+                 invalidos=(), semente=0):
+        self.datas = np.array(fechamentos.index.strftime("%Y-%m-%d"))
+        self.colunas = {t: fechamentos[t].round(4).to_numpy() for t in fechamentos.columns}
+        self.latencia = latencia
+        self.max_por_segundo = max_por_segundo
+        self.instabilidade = instabilidade
+        self.invalidos = set(invalidos)
+        self.requisicoes = 0
+        self.recusadas = 0
+        self._recentes = deque()
+        self._rng = random.Random(semente)
+        self._lock = threading.Lock()
+        servidor = self
+
+        class Manipulador(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                consulta = parse_qs(urlparse(self.path).query)
+                tickers = consulta['tickers'][0].split(',')
+                inicio = consulta['inicio'][0]
+                status = servidor._admitir(tickers)
+                time.sleep(servidor.latencia)
+                if status == 200:
+                    i = int(np.searchsorted(servidor.datas, inicio))
+                    corpo = json.dumps({
+                        'datas': servidor.datas[i:].tolist(),
+                        'fechamentos': {t: servidor.colunas[t][i:].tolist()
+                                        for t in tickers if t in servidor.colunas},
+                    }).encode()
+                else:
+                    corpo = json.dumps({'erro': status}).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+        self._http = ThreadingHTTPServer(('127.0.0.1', 0), Manipulador)
+        self._http.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._http.server_address[1]}"
+
+    def _admitir(self, tickers):
+        """Status HTTP da requisição: limite de taxa, instabilidade e tickers inválidos"""
+        with self._lock:
+            self.requisicoes += 1
+            agora = time.monotonic()
+            while self._recentes and agora - self._recentes[0] > 1:
+                self._recentes.popleft()
+            if self.max_por_segundo is not None and len(self._recentes) >= self.max_por_segundo:
+                self.recusadas += 1
+                return 429
+            self._recentes.append(agora)
+            if self._rng.random() < self.instabilidade:
+                return 503
+        return 404 if self.invalidos.intersection(tickers) else 200
+
+    def __enter__(self):
+        threading.Thread(target=self._http.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._http.shutdown()
+        self._http.server_close()
+
+def baixador_servidor(url, conexoes=16, timeout=10):
+    """`baixar(tickers, inicio)` que consulta um ServidorPrecos, para `baixar_em_lotes(baixar=...)`"""
+    from sioei.data import criar_sessao_http
+    sessao = criar_sessao_http(conexoes, tentativas=0)  # As retentativas são do baixar_em_lotes
+
+    def baixar(tickers, inicio):
+        resposta = sessao.get(f"{url}/fechamentos", timeout=timeout, params={
+            'tickers': ','.join(tickers), 'inicio': inicio.strftime("%Y-%m-%d")})
+        resposta.raise_for_status()
+        corpo = resposta.json()
+        return pd.DataFrame(corpo['fechamentos'], index=pd.to_datetime(corpo['datas']))
+    return baixar
+
+# ==============================================================================
+# GRAVAÇÃO (REQUER REDE)
+# ==============================================================================
+def gravar_fixtures():
+    """Grava em benchmarks/fixtures/ as respostas reais atuais do BCB e do Yahoo"""
+    from sioei.data import (SERIES_BCB, INICIO_HISTORICO_BCB, TICKERS_YAHOO, baixar_fechamentos_yahoo,
+                            criar_sessao_http, janelas_consulta)
+
+    os.makedirs(DIRETORIO_FIXTURES, exist_ok=True)
+    sessao = criar_sessao_http()
+    for codigo in SERIES_BCB.values():
+        obs = []
+        for inicio, fim in janelas_consulta(INICIO_HISTORICO_BCB, date.today()):
+            resposta = sessao.get(
+                f"https://api.bcb.gov.br/dados/serie/bcdata.sgs.{codigo}/dados",
+                params={'formato': 'json', 'dataInicial': inicio.strftime("%d/%m/%Y"),
+                        'dataFinal': fim.strftime("%d/%m/%Y")},
+                timeout=30
+            )
+            if resposta.status_code != 404:
+                resposta.raise_for_status()
+                obs += resposta.json()
+        with open(os.path.join(DIRETORIO_FIXTURES, f"sgs_{codigo}.json"), "w", encoding="utf-8") as f:
+            json.dump(obs, f)
+
+    precos = baixar_fechamentos_yahoo(TICKERS_YAHOO, date.today() - timedelta(days=12 * 365))
+    precos.to_csv(os.path.join(DIRETORIO_FIXTURES, "precos.csv"))
+
+if __name__ == '__main__':
+    gravar_fixtures()
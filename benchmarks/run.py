@@ -0,0 +1,165 @@
+"""
+Executor dos benchmarks do SIOEI.
+
+    python -m benchmarks.run                 # roda tudo, compara com o histórico e grava
+    python -m benchmarks.run -k engine       # só casos cujo nome contém "engine"
+    python -m benchmarks.run --sem-gravar    # compara sem acrescentar ao histórico
+
+Tudo roda offline: o armazém vai para um diretório temporário e o BCB é servido
+por um servidor SGS local com as fixtures. Cada execução é acrescentada a
+benchmarks/historico.jsonl; a linha de base de um caso é a mediana das últimas
+execuções na mesma máquina e versão do Python. Sai com código 1 se algum caso
+ficar mais lento que a linha de base além da tolerância.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+from time import perf_counter
+
+import matplotlib
+
+from benchmarks.fixtures import ServidorSGS, carregar_series_sgs
+
+DIRETORIO_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ARQUIVO_HISTORICO = os.path.join(DIRETORIO_BENCHMARKS, "historico.jsonl")
+TOLERANCIA_PADRAO = 0.25    # Até 25% mais lento que a linha de base não é regressão
+EXECUCOES_BASE = 5          # Execuções anteriores que formam a linha de base
+
+# ==============================================================================
+# MEDIÇÃO
+# ==============================================================================
+def medir(caso, repeticoes):
+    """Tempo por chamada (s) do caso: mediana, mínimo e desvio entre repetições"""
+    if caso.preparar is None:
+        # Como o timeit: agrupa chamadas até cada repetição durar ≥ 0,2 s
+        timer = timeit.Timer(caso.funcao)
+        chamadas, _ = timer.autorange()
+        tempos = [t / chamadas for t in timer.repeat(repeticoes, chamadas)]
+    else:
+        # Casos com estado (ex.: armazém vazio) preparam antes de cada chamada, fora do tempo
+        chamadas = 1
+        caso.funcao(caso.preparar())
+        tempos = []
+        for _ in range(repeticoes):
+            argumento = caso.preparar()
+            inicio = perf_counter()
+            caso.funcao(argumento)
+            tempos.append(perf_counter() - inicio)
+    return {
+        'mediana': statistics.median(tempos),
+        'minimo': min(tempos),
+        'desvio': statistics.pstdev(tempos),
+        'chamadas': chamadas,
+        'repeticoes': repeticoes
+    }
+
+def formatar_tempo(segundos):
+    for unidade, escala in (('s', 1), ('ms', 1e-3), ('µs', 1e-6)):
+        if segundos >= escala:
+            return f"{segundos / escala:.2f} {unidade}"
+    return f"{segundos / 1e-9:.0f} ns"
+
+# ==============================================================================
+# HISTÓRICO E REGRESSÕES
+# ==============================================================================
+def identificar_ambiente():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=DIRETORIO_BENCHMARKS,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'maquina': platform.node(), 'python': platform.python_version(), 'commit': commit}
+
+def ler_historico(caminho):
+    if not os.path.exists(caminho):
+        return []
+    with open(caminho, encoding="utf-8") as f:
+        return [json.loads(linha) for linha in f if linha.strip()]
+
+def linha_de_base(historico, ambiente, nome):
+    """Mediana das medianas do caso nas últimas EXECUCOES_BASE execuções comparáveis"""
+    comparaveis = [
+        execucao['resultados'][nome]['mediana'] for execucao in historico
+        if execucao['maquina'] == ambiente['maquina'] and execucao['python'] == ambiente['python']
+        and nome in execucao['resultados']
+    ]
+    return statistics.median(comparaveis[-EXECUCOES_BASE:]) if comparaveis else None
+
+def classificar(mediana, base, tolerancia):
+    if base is None:
+        return 'novo'
+    if mediana > base * (1 + tolerancia):
+        return 'REGRESSÃO'
+    if mediana < base * (1 - tolerancia):
+        return 'melhora'
+    return 'ok'
+
+# ==============================================================================
+# EXECUÇÃO
+# ==============================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description='Benchmarks do SIOEI.')
+    parser.add_argument('-k', '--filtro', default='', help='roda só casos cujo nome contém o texto')
+    parser.add_argument('-r', '--repeticoes', type=int, default=5, help='repetições por caso (padrão: 5)')
+    parser.add_argument('--tolerancia', type=float, default=None,
+                        help=f'regressão aceitável, em fração (padrão: {TOLERANCIA_PADRAO} ou a do caso)')
+    parser.add_argument('--historico', default=ARQUIVO_HISTORICO, help='arquivo JSONL do histórico')
+    parser.add_argument('--sem-gravar', action='store_true', help='não acrescenta esta execução ao histórico')
+    parser.add_argument('--listar', action='store_true', help='só lista os casos')
+    args = parser.parse_args(argv)
+
+    matplotlib.use('Agg')
+    logging.basicConfig(level=logging.ERROR)
+
+    with tempfile.TemporaryDirectory(prefix='sioei-bench-') as diretorio, ServidorSGS() as servidor:
+        # sioei.data lê estas variáveis na importação: definir antes de importar os casos
+        os.environ['SIOEI_DADOS'] = diretorio
+        os.environ['SIOEI_BCB_URL'] = servidor.url
+        from benchmarks.casos import CASOS
+        from sioei.data import SERIES_BCB
+        servidor.publicar(carregar_series_sgs(SERIES_BCB.values()))
+
+        casos = [c for c in CASOS if args.filtro in c.nome]
+        if args.listar:
+            print("\n".join(c.nome for c in casos))
+            return
+
+        ambiente = identificar_ambiente()
+        historico = ler_historico(args.historico)
+        resultados = {}
+        regressoes = []
+
+        largura = max(len(c.nome) for c in casos)
+        print(f"{'caso':<{largura}}  {'mediana':>10}  {'base':>10}  {'Δ':>7}  status")
+        for c in casos:
+            resultado = medir(c, args.repeticoes)
+            resultados[c.nome] = resultado
+            base = linha_de_base(historico, ambiente, c.nome)
+            tolerancia = args.tolerancia if args.tolerancia is not None else (c.tolerancia or TOLERANCIA_PADRAO)
+            status = classificar(resultado['mediana'], base, tolerancia)
+            if status == 'REGRESSÃO':
+                regressoes.append(c.nome)
+            delta = f"{(resultado['mediana'] / base - 1) * 100:+.0f}%" if base else '-'
+            print(f"{c.nome:<{largura}}  {formatar_tempo(resultado['mediana']):>10}  "
+                  f"{formatar_tempo(base) if base else '-':>10}  {delta:>7}  {status}", flush=True)
+
+    if not args.sem_gravar:
+        with open(args.historico, "a", encoding="utf-8") as f:
+            f.write(json.dumps({'data': datetime.now().isoformat(timespec='seconds'), **ambiente,
+                                'resultados': resultados}, ensure_ascii=False) + "\n")
+
+    if regressoes:
+        print(f"\n{len(regressoes)} regressão(ões) além da tolerância: {', '.join(regressoes)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
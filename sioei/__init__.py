@@ -0,0 +1,20 @@
+"""
+SIOEI - Sistema Inteligente de Otimização e Execução de Investimentos.
+
+Núcleo computacional importável sem Streamlit:
+
+- sioei.universe:     base de ATIVOS, PERFIS e TESES (construída a partir de um snapshot)
+- sioei.data:         BCB, Yahoo Finance, armazém local e pré-carga em segundo plano
+- sioei.engine:       projeções (calcular), avaliação em lote e Monte Carlo
+- sioei.optimizer:    covariância e fronteira eficiente
+- sioei.estatisticas: retorno, volatilidade, drawdown e correlações em janelas móveis
+- sioei.backtest:     replay histórico diário de carteiras com rebalanceamento
+- sioei.api:          API HTTP (FastAPI) com micro-lotes e cache de respostas
+- sioei.planos:       planos salvos dos clientes e resumos projetados (SQLite indexado)
+- sioei.metricas:     tempos por etapa, acertos de cache, Prometheus e logs em JSON
+
+Os submódulos não são importados aqui, para que `import sioei.engine` carregue
+só o necessário. Nenhum dado é lido até a primeira chamada que precise dele.
+"""
+
+__version__ = "5.0"
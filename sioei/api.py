@@ -0,0 +1,273 @@
+"""
+API HTTP do SIOEI (FastAPI): projeções, estratégias e snapshot de mercado em JSON.
+
+    python -m sioei.api --porta 8000
+
+Endpoints:
+    GET  /mercado       snapshot atual: versão, Selic, IPCA, CDI, retornos live, ATIVOS e
+                        estatísticas por janela (retorno, volatilidade, drawdown...)
+    GET  /estrategias   PERFIS e TESES com descrição e pesos
+    POST /projecao      projeção de uma carteira (nome de perfil/tese ou pesos)
+    GET  /estatisticas  acertos do cache de respostas e tamanho dos lotes
+    GET  /metrics       tempos por etapa (p50/p95/p99) e caches, formato Prometheus
+
+Projeções que chegam juntas (janela de JANELA_LOTE segundos) viram uma única
+chamada vetorizada de `avaliar_carteiras`. Respostas ficam num cache LRU, já
+serializadas em JSON, chaveado pela versão do Universo e pela entrada normalizada
+(`normalizar_entrada`); pedidos idênticos em andamento esperam o mesmo cálculo.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+
+from sioei.batch import carteiras_conhecidas, normalizar_nome
+from sioei.cache import CacheLRU
+from sioei.data import MonitorMercado
+from sioei.engine import avaliar_carteiras, montar_matriz_pesos, normalizar_entrada
+from sioei.metricas import REGISTRO, configurar_logs
+from sioei.universe import DESCRICOES_PERFIS, PERFIS, TESES, construir_universo
+
+logger = logging.getLogger(__name__)
+
+JANELA_LOTE = 0.002   # Espera máxima (s) por outras projeções antes de avaliar o lote
+MAX_LOTE = 512        # Lote cheio é avaliado na hora, sem esperar a janela
+COLUNAS_PROJECAO = ('retorno_aa', 'risco', 'investido', 'final_nom', 'final_real',
+                    'renda_passiva_possivel')
+
+@lru_cache(maxsize=1024)
+def _chave_carteira(nome):
+    return normalizar_nome(nome)
+
+class EntradaProjecao(BaseModel):
+    """Corpo de POST /projecao: `carteira` (perfil ou tese) ou `pesos` por ativo"""
+    carteira: Optional[str] = None
+    pesos: Optional[dict[str, float]] = None
+    v_inicial: float = Field(0.0, ge=0)
+    v_mensal: float = Field(0.0, ge=0)
+    anos: int = Field(ge=0, le=100)
+    renda_desejada: float = Field(0.0, ge=0)
+    anos_inicio_retirada: int = Field(99, ge=0)
+    usar_retirada: bool = False
+
+# ==============================================================================
+# MICRO-LOTES
+# ==============================================================================
+class AgrupadorProjecoes:
+    """
+    Junta as projeções pedidas dentro de `janela` segundos (ou até `max_lote`)
+    e avalia todas numa única chamada de `avaliar_carteiras`.
+
+    Roda no event loop: o lote é avaliado ali mesmo, pois a versão vetorizada
+    leva menos de um milissegundo mesmo com centenas de carteiras.
+    """
+
+    def __init__(self, janela=JANELA_LOTE, max_lote=MAX_LOTE):
+        self.janela = janela
+        self.max_lote = max_lote
+        self._fila = []
+        self._agendado = None
+        self.lotes = 0
+        self.projecoes = 0
+
+    async def projetar(self, universo, entrada):
+        """Resultado (dict de COLUNAS_PROJECAO) de uma entrada de `normalizar_entrada`"""
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        self._fila.append((universo, entrada, futuro))
+        if len(self._fila) >= self.max_lote or self.janela <= 0:
+            self._despachar()
+        elif self._agendado is None:
+            self._agendado = loop.call_later(self.janela, self._despachar)
+        return await futuro
+
+    def _despachar(self):
+        if self._agendado is not None:
+            self._agendado.cancel()
+            self._agendado = None
+        fila, self._fila = self._fila, []
+        if not fila:
+            return
+
+        # Um snapshot novo pode chegar no meio da janela: um lote por Universo
+        por_universo = {}
+        for item in fila:
+            por_universo.setdefault(id(item[0]), []).append(item)
+        for itens in por_universo.values():
+            try:
+                resultados = self._avaliar(itens[0][0], [entrada for _, entrada, _ in itens])
+            except Exception as e:
+                for _, _, futuro in itens:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+                continue
+            for (_, _, futuro), resultado in zip(itens, resultados):
+                if not futuro.done():
+                    futuro.set_result(resultado)
+        self.lotes += 1
+        self.projecoes += len(fila)
+
+    @staticmethod
+    @REGISTRO.etapa("api.lote")
+    def _avaliar(universo, entradas):
+        pesos, v_ini, v_mes, anos, renda, anos_ret, retirada, _ = zip(*entradas)
+        r = avaliar_carteiras(
+            montar_matriz_pesos([dict(p) for p in pesos], universo),
+            np.array(v_ini), np.array(v_mes), np.array(anos), np.array(renda),
+            np.array(anos_ret), np.array(retirada), universo=universo
+        )
+        colunas = {c: np.broadcast_to(r[c], len(entradas)).tolist() for c in COLUNAS_PROJECAO}
+        return [{c: colunas[c][i] for c in COLUNAS_PROJECAO} for i in range(len(entradas))]
+
+# ==============================================================================
+# SERVIÇO
+# ==============================================================================
+class ServicoProjecoes:
+    """Estado do processo da API: snapshot de mercado, Universo vigente, lotes e cache"""
+
+    def __init__(self, monitor=None, janela=JANELA_LOTE, max_lote=MAX_LOTE, tamanho_cache=4096):
+        self.monitor = monitor or MonitorMercado()
+        self.agrupador = AgrupadorProjecoes(janela, max_lote)
+        self.cache = CacheLRU(tamanho_max=tamanho_cache)
+        REGISTRO.registrar_cache('api.respostas', self.cache)
+        self.carteiras = carteiras_conhecidas()
+        self._universo = None
+
+    def universo_atual(self):
+        """Universo do snapshot vigente, reconstruído só quando a versão dos dados muda"""
+        snapshot = self.monitor.snapshot_atual()
+        if self._universo is None or self._universo.versao != snapshot['versao']:
+            self._universo = construir_universo(snapshot)
+            logger.info(f"API usando snapshot {self._universo.versao}")
+        return self._universo
+
+    def resolver_pesos(self, entrada, universo):
+        if (entrada.carteira is None) == (entrada.pesos is None):
+            raise HTTPException(422, "Informe `carteira` ou `pesos` (apenas um)")
+        if entrada.carteira is not None:
+            pesos = self.carteiras.get(_chave_carteira(entrada.carteira))
+            if pesos is None:
+                raise HTTPException(404, f"Carteira desconhecida: {entrada.carteira}")
+            return pesos
+        desconhecidos = [nome for nome in entrada.pesos if nome not in universo.ativos]
+        if desconhecidos:
+            raise HTTPException(422, f"Ativos desconhecidos: {', '.join(desconhecidos)}")
+        if any(peso < 0 for peso in entrada.pesos.values()):
+            raise HTTPException(422, "Pesos não podem ser negativos")
+        return entrada.pesos
+
+    async def _responder(self, universo, normalizada):
+        resultado = await self.agrupador.projetar(universo, normalizada)
+        return json.dumps({'versao_dados': universo.versao, **resultado}).encode()
+
+    async def projetar(self, entrada):
+        """Corpo JSON (bytes) da projeção de uma EntradaProjecao"""
+        universo = self.universo_atual()
+        normalizada = normalizar_entrada(
+            self.resolver_pesos(entrada, universo), entrada.v_inicial, entrada.v_mensal, entrada.anos,
+            entrada.renda_desejada, entrada.anos_inicio_retirada, entrada.usar_retirada
+        )
+        chave = (universo.versao,) + normalizada
+        # O cache guarda a tarefa: pedidos idênticos em andamento aguardam o mesmo cálculo
+        tarefa = self.cache.obter(chave, lambda: asyncio.ensure_future(self._responder(universo, normalizada)))
+        try:
+            # shield: um cliente que desconecta não cancela a tarefa compartilhada
+            return await asyncio.shield(tarefa)
+        except Exception:
+            self.cache.descartar(chave)
+            raise
+
+    def estatisticas(self):
+        lotes = self.agrupador.lotes
+        return {
+            'cache': self.cache.estatisticas(),
+            'lotes': lotes,
+            'projecoes_avaliadas': self.agrupador.projecoes,
+            'media_por_lote': self.agrupador.projecoes / lotes if lotes else 0.0,
+        }
+
+# ==============================================================================
+# APLICAÇÃO
+# ==============================================================================
+def listar_estrategias():
+    return {
+        'perfis': [{'nome': nome, 'desc': DESCRICOES_PERFIS.get(nome, ''), 'pesos': pesos}
+                   for nome, pesos in PERFIS.items()],
+        'teses': [{'nome': nome, 'desc': tese['desc'], 'pesos': tese['pesos']}
+                  for nome, tese in TESES.items()],
+    }
+
+def criar_app(servico=None):
+    """Aplicação FastAPI; sem `servico`, cria um (com seu MonitorMercado) na primeira requisição"""
+    app = FastAPI(title="SIOEI API", description="Projeções e cenário de mercado do SIOEI")
+    estado = {'servico': servico}
+    catalogo = listar_estrategias()
+
+    def obter_servico():
+        if estado['servico'] is None:
+            estado['servico'] = ServicoProjecoes()
+        return estado['servico']
+
+    @app.get("/mercado")
+    async def mercado():
+        servico = obter_servico()
+        universo = servico.universo_atual()
+        return {
+            'versao': universo.versao,
+            'atualizado_em': servico.monitor.snapshot['atualizado_em'].isoformat(timespec='seconds'),
+            'desatualizado': servico.monitor.desatualizado(),
+            'status_bcb': universo.status_bcb,
+            'selic': universo.selic,
+            'ipca': universo.ipca,
+            'cdi': universo.cdi,
+            'poupanca': universo.poupanca,
+            'live': dict(universo.live),
+            'ativos': {nome: {k: info[k] for k in ('retorno', 'taxa', 'risco', 'tipo', 'mercado')}
+                       for nome, info in universo.ativos.items()},
+            'estatisticas': universo.estatisticas,
+        }
+
+    @app.get("/estrategias")
+    async def estrategias():
+        return catalogo
+
+    @app.post("/projecao")
+    async def projecao(entrada: EntradaProjecao):
+        with REGISTRO.etapa("api.projecao"):
+            corpo = await obter_servico().projetar(entrada)
+        return Response(corpo, media_type='application/json')
+
+    @app.get("/estatisticas")
+    async def estatisticas():
+        return obter_servico().estatisticas()
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metricas():
+        return PlainTextResponse(REGISTRO.texto_prometheus(), media_type="text/plain; version=0.0.4")
+
+    return app
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m sioei.api', description='API HTTP do SIOEI.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8000)
+    parser.add_argument('--janela-lote', type=float, default=JANELA_LOTE * 1000,
+                        help=f'espera máxima por projeções do mesmo lote, em ms (padrão: {JANELA_LOTE * 1000:g}; 0 desliga)')
+    parser.add_argument('--max-lote', type=int, default=MAX_LOTE, help=f'tamanho máximo do lote (padrão: {MAX_LOTE})')
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    configurar_logs(formato='%(asctime)s %(levelname)s %(message)s')
+    servico = ServicoProjecoes(janela=args.janela_lote / 1000, max_lote=args.max_lote)
+    uvicorn.run(criar_app(servico), host=args.host, port=args.porta, log_level='warning')
+
+if __name__ == '__main__':
+    main()
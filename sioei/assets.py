@@ -0,0 +1,127 @@
+"""
+Recursos estáticos do dashboard: logo pré-redimensionado e CSS.
+
+Tudo é preparado uma vez por processo e reaproveitado por todas as sessões e
+execuções da página. Com `server.enableStaticServing` ligado (.streamlit/config.toml),
+o logo sai da rota estática do Streamlit (app/static/) e nem passa pelo websocket.
+"""
+
+import logging
+import os
+import re
+from functools import lru_cache
+from io import BytesIO
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+DIRETORIO_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIRETORIO_ESTATICO = os.path.join(DIRETORIO_RAIZ, "static")  # Servido em app/static/
+ARQUIVO_LOGO = os.path.join(DIRETORIO_RAIZ, "SIOEI LOGO.jpg")
+URL_LOGO = "https://raw.githubusercontent.com/Open0Bit/SIOEI/main/SIOEI%20LOGO.jpg"
+ARQUIVO_CSS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "estilo.css")
+
+LARGURA_LOGO = 130          # Desktop
+LARGURA_LOGO_COMPACTO = 90  # Telas até 1024px (mesmo breakpoint do .logo-container no CSS)
+
+# Fundo, borda e brilho do botão de modo ativo (AMBIENT LIGHTING)
+CORES_MODO = {
+    'Automático': ('#051a14', '#00E676', 'rgba(0, 230, 118, 0.3)'),
+    'Assistido': ('#120a2e', '#7C4DFF', 'rgba(124, 77, 255, 0.3)'),
+    'Manual': ('#1f1505', '#FF9800', 'rgba(255, 152, 0, 0.3)'),
+}
+
+# ==============================================================================
+# LOGO
+# ==============================================================================
+@lru_cache(maxsize=1)
+def _logo_original():
+    """Logo em resolução cheia (arquivo local ou GitHub); None se indisponível. Uma vez por processo."""
+    try:
+        if os.path.exists(ARQUIVO_LOGO):
+            return Image.open(ARQUIVO_LOGO)
+        import requests
+        response = requests.get(URL_LOGO, timeout=5)
+        response.raise_for_status()
+        return Image.open(BytesIO(response.content))
+    except Exception as e:
+        logger.warning(f"Erro ao carregar logo: {e}")
+        return None
+
+@lru_cache(maxsize=None)
+def logo_png(largura):
+    """Logo redimensionado para `largura` px (proporção mantida) e codificado em PNG"""
+    original = _logo_original()
+    if original is None:
+        return None
+    altura = round(original.height * largura / original.width)
+    buffer = BytesIO()
+    original.resize((largura, altura), Image.LANCZOS).save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+def nome_logo_estatico(largura):
+    return f"sioei-logo-{largura}.png"
+
+def gerar_logos_estaticos():
+    """Grava em static/ as versões pré-redimensionadas que ainda não existirem; True se todas existem"""
+    try:
+        os.makedirs(DIRETORIO_ESTATICO, exist_ok=True)
+        for largura in (LARGURA_LOGO, LARGURA_LOGO_COMPACTO):
+            caminho = os.path.join(DIRETORIO_ESTATICO, nome_logo_estatico(largura))
+            if not os.path.exists(caminho):
+                png = logo_png(largura)
+                if png is None:
+                    return False
+                with open(caminho, "wb") as f:
+                    f.write(png)
+        return True
+    except OSError as e:
+        logger.warning(f"Erro ao gravar logos estáticos: {e}")
+        return False
+
+@lru_cache(maxsize=2)
+def html_logo(servir_estatico):
+    """Bloco .logo-container: rota estática se disponível, senão data URI do PNG de 130px"""
+    if servir_estatico and gerar_logos_estaticos():
+        return f"""
+        <div class="logo-container">
+            <picture>
+                <source media="(max-width: 1024px)" srcset="app/static/{nome_logo_estatico(LARGURA_LOGO_COMPACTO)}">
+                <img src="app/static/{nome_logo_estatico(LARGURA_LOGO)}" width="{LARGURA_LOGO}" alt="SIOEI Logo">
+            </picture>
+        </div>
+        """
+
+    png = logo_png(LARGURA_LOGO)
+    if png is None:
+        return '<div class="logo-container" style="font-size: 50px;">🇧🇷</div>'
+    import base64
+    return f"""
+        <div class="logo-container">
+            <img src="data:image/png;base64,{base64.b64encode(png).decode()}" width="{LARGURA_LOGO}" alt="SIOEI Logo">
+        </div>
+        """
+
+# ==============================================================================
+# CSS
+# ==============================================================================
+def minificar_css(css):
+    """Remove comentários e espaços supérfluos (o CSS é reenviado a cada execução)"""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{}:;,>])\s*", r"\1", css)
+    return css.replace(";}", "}").strip()
+
+@lru_cache(maxsize=1)
+def css_base():
+    """Folha de estilo completa (sioei/estilo.css), lida e minificada uma vez por processo"""
+    with open(ARQUIVO_CSS, encoding="utf-8") as f:
+        return f"<style>{minificar_css(f.read())}</style>"
+
+@lru_cache(maxsize=None)
+def css_modo(modo):
+    """Só as variáveis de cor do modo; as regras que as usam já estão em `css_base`"""
+    fundo, cor, brilho = CORES_MODO[modo]
+    return (f"<style>:root{{--sioei-fundo-modo:{fundo};--sioei-cor-modo:{cor};"
+            f"--sioei-brilho-modo:{brilho}}}</style>")
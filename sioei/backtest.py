@@ -0,0 +1,209 @@
+"""
+Backtest histórico do SIOEI: replay diário de carteiras (pesos_dict) sobre dados reais.
+
+Ativos com ticker (TICKERS_MAP) usam os fechamentos do armazém; os demais, e os
+dias anteriores ao primeiro fechamento de cada ticker, seguem a curva de
+`construir_ativos` com a Selic e o IPCA vigentes em cada dia (séries do BCB).
+Tudo é vetorizado nos dias e nas carteiras; só o rebalanceamento por limiar
+percorre, em Python, os eventos de rebalanceamento.
+"""
+
+import numpy as np
+import pandas as pd
+
+from sioei.universe import construir_ativos, tabelar_ativos
+
+DIAS_UTEIS_ANO = 252
+DIAS_CORRIDOS_ANO = 365.25
+REBALANCEAMENTOS = {
+    'nenhum': 'Sem rebalanceamento (buy & hold)',
+    'mensal': 'Mensal',
+    'trimestral': 'Trimestral',
+    'limiar': 'Por limiar de desvio',
+}
+LIMIAR_PADRAO = 0.05  # Desvio máximo (fração) de um ativo em relação ao peso alvo
+
+# ==============================================================================
+# RETORNOS DIÁRIOS (MERCADO + CURVAS DO BCB)
+# ==============================================================================
+def montar_retornos_diarios(precos, historico_bcb, inicio=None, fim=None, descontar_taxas=True):
+    """
+    Retornos diários simples (dias úteis x ATIVOS) para o backtest.
+
+    `precos`: fechamentos com colunas = nomes de ATIVOS (ver carregar_historico_backtest).
+    `historico_bcb`: {'selic': pd.Series, 'ipca': pd.Series} (macro['historico']).
+    Com `descontar_taxas`, a taxa anual de cada ativo é descontada dia a dia.
+    Curvas do modelo e taxas rendem pelo tempo corrido de cada passo (ver `anos_por_passo`):
+    a grade tem ~261 dias úteis por ano, não 252.
+
+    Retorna (datas, tabela, retornos, cobertura): `tabela` (TabelaAtivos) dá a ordem
+    das colunas e `cobertura` = fração dos dias em que cada ativo usou preço de
+    mercado (0 = só curva do modelo).
+    """
+    selic = historico_bcb.get('selic', pd.Series(dtype=float)).dropna()
+    ipca = historico_bcb.get('ipca', pd.Series(dtype=float)).dropna()
+    if selic.empty or ipca.empty:
+        raise ValueError("Backtest requer o histórico de Selic e IPCA do BCB")
+
+    inicio = pd.Timestamp(inicio) if inicio is not None else max(selic.index[0], ipca.index[0])
+    fim = pd.Timestamp(fim) if fim is not None else max(
+        selic.index[-1], precos.index.max() if len(precos) else selic.index[-1])
+    datas = pd.bdate_range(inicio, fim)
+
+    # Cenário vigente em cada dia; construir_ativos roda uma vez por par (Selic, IPCA) distinto
+    cenarios = np.column_stack([
+        selic.reindex(datas.union(selic.index)).ffill().bfill().reindex(datas).to_numpy(),
+        ipca.reindex(datas.union(ipca.index)).ffill().bfill().reindex(datas).to_numpy(),
+    ])
+    pares, qual_par = np.unique(cenarios, axis=0, return_inverse=True)
+    bases = [construir_ativos(s, i, {}) for s, i in pares]
+    tabela = tabelar_ativos(bases[0])
+    retorno_aa = np.array([[b[n]['retorno'] for n in tabela.nomes] for b in bases])
+    taxa_aa = tabela.taxa if descontar_taxas else np.zeros(len(tabela.nomes))
+
+    passos = anos_por_passo(datas)[:, np.newaxis]
+    retornos = (1 + (retorno_aa - taxa_aa) / 100)[qual_par.ravel()] ** passos - 1
+
+    # Preço de mercado onde houver: fechamento do dia (ou o último antes dele)
+    mercado = [n for n in tabela.nomes if n in precos.columns]
+    cobertura = np.zeros(len(tabela.nomes))
+    if mercado:
+        fechamentos = precos[mercado].sort_index()
+        fechamentos = fechamentos.reindex(datas.union(fechamentos.index)).ffill().reindex(datas)
+        variacao = fechamentos.pct_change(fill_method=None).to_numpy()
+        idx = [tabela.indice[n] for n in mercado]
+        custo_diario = (1 - taxa_aa[idx] / 100) ** passos
+        liquido = (1 + variacao) * custo_diario - 1
+        valido = np.isfinite(liquido)
+        retornos[:, idx] = np.where(valido, liquido, retornos[:, idx])
+        cobertura[idx] = valido.mean(axis=0)
+
+    return datas, tabela, retornos, cobertura
+
+# ==============================================================================
+# SIMULAÇÃO
+# ==============================================================================
+def datas_rebalanceamento(datas, regra):
+    """
+    Pontos de rebalanceamento (índices no vetor de valores, 0 = início) para
+    regras de calendário: no fechamento do último dia útil de cada mês/trimestre.
+    """
+    if regra == 'nenhum':
+        return np.array([0])
+    periodos = datas.to_period('M' if regra == 'mensal' else 'Q')
+    viradas = np.flatnonzero(periodos[1:] != periodos[:-1]) + 1
+    return np.concatenate([[0], viradas])
+
+def simular_segmentos(crescimento, pesos, pontos):
+    """
+    Valor (dias + 1, carteiras) de carteiras rebalanceadas para `pesos` nos `pontos`
+    e deixadas à deriva entre eles, mais o giro (fração negociada, só ida) por carteira.
+
+    `crescimento` é o produto acumulado de (1 + retorno) de cada ativo, com uma
+    linha de uns no início: entre dois pontos, cada ativo cresce G[t] / G[ponto].
+    """
+    dias = len(crescimento) - 1
+    t = np.arange(1, dias + 1)
+    base = pontos[np.searchsorted(pontos, t, side='left') - 1]
+    relativo = crescimento[1:] / crescimento[base]                  # (dias, ativos)
+    fator = relativo @ pesos.T                                      # (dias, carteiras)
+
+    # Valor em cada ponto de rebalanceamento = produto dos fatores dos segmentos anteriores
+    valor_base = np.ones((dias + 1, pesos.shape[0]))
+    valor_base[pontos[1:]] = np.cumprod(fator[pontos[1:] - 1], axis=0)
+    valor = np.vstack([np.ones(pesos.shape[0]), valor_base[base] * fator])
+
+    # Giro: distância entre os pesos à deriva e os alvos em cada rebalanceamento
+    if len(pontos) > 1:
+        rel_pontos = relativo[pontos[1:] - 1]                                # (pontos, ativos)
+        deriva = pesos[np.newaxis] * rel_pontos[:, np.newaxis, :]            # (pontos, carteiras, ativos)
+        deriva /= fator[pontos[1:] - 1][:, :, np.newaxis]
+        giro = 0.5 * np.abs(deriva - pesos[np.newaxis]).sum(axis=2).sum(axis=0)
+    else:
+        giro = np.zeros(pesos.shape[0])
+    return valor, giro
+
+def pontos_por_limiar(crescimento, pesos, limiar, janela=DIAS_UTEIS_ANO):
+    """
+    Pontos de rebalanceamento de uma carteira pela regra de limiar: rebalanceia no
+    primeiro dia em que algum ativo se afasta mais que `limiar` do peso alvo.
+    A deriva é avaliada em blocos de `janela` dias a partir de cada ponto.
+    """
+    dias = len(crescimento) - 1
+    pontos = [0]
+    inicio, fim = 0, min(dias, janela)
+    while inicio < dias:
+        relativo = crescimento[inicio + 1:fim + 1] / crescimento[inicio]
+        deriva = relativo * pesos
+        deriva /= deriva.sum(axis=1, keepdims=True)
+        fora = np.flatnonzero(np.abs(deriva - pesos).max(axis=1) > limiar)
+        if len(fora):
+            inicio = inicio + 1 + fora[0]
+            pontos.append(inicio)
+            fim = min(dias, inicio + janela)
+        elif fim < dias:
+            fim = min(dias, fim + janela)
+        else:
+            break
+    return np.array(pontos)
+
+def anos_por_passo(datas):
+    """Duração, em anos corridos, de cada passo da grade (o primeiro parte do dia útil anterior)"""
+    anterior = (datas[0] - pd.offsets.BDay(1)).to_datetime64()
+    return np.diff(datas.values, prepend=anterior) / np.timedelta64(1, 'D') / DIAS_CORRIDOS_ANO
+
+def metricas_backtest(valor, giro, passos):
+    """
+    CAGR, volatilidade anual, drawdown máximo e giro anual (todos em %) por carteira.
+    `passos` é a duração (anos corridos) de cada linha de `valor` após a base.
+    """
+    anos = passos.sum()
+    diario = valor[1:] / valor[:-1] - 1
+    return {
+        'cagr': (valor[-1] ** (1 / anos) - 1) * 100,
+        'volatilidade': diario.std(axis=0, ddof=1) * np.sqrt(len(passos) / anos) * 100,
+        'max_drawdown': (valor / np.maximum.accumulate(valor, axis=0) - 1).min(axis=0) * 100,
+        'giro': giro / anos * 100,
+    }
+
+def backtest(datas, retornos, pesos, rebalanceamento='mensal', limiar=LIMIAR_PADRAO):
+    """
+    Replay diário de uma ou mais carteiras sobre `retornos` (dias x ativos).
+
+    `pesos` tem uma linha por carteira e uma coluna por ativo (normalizados aqui).
+    `rebalanceamento` é uma das chaves de REBALANCEAMENTOS.
+    Retorna 'valor' (dias x carteiras, base 1 antes do primeiro dia) e as métricas.
+    """
+    if rebalanceamento not in REBALANCEAMENTOS:
+        raise ValueError(f"Rebalanceamento desconhecido: {rebalanceamento}")
+    pesos = np.atleast_2d(np.asarray(pesos, dtype=float))
+    total = pesos.sum(axis=1, keepdims=True)
+    if (total <= 0).any():
+        raise ValueError("Toda carteira do backtest precisa de algum peso positivo")
+    pesos = pesos / total
+    crescimento = np.vstack([np.ones(pesos.shape[1]), np.cumprod(1 + retornos, axis=0)])
+
+    if rebalanceamento == 'limiar':
+        resultados = [simular_segmentos(crescimento, linha[np.newaxis],
+                                        pontos_por_limiar(crescimento, linha, limiar))
+                      for linha in pesos]
+        valor = np.hstack([v for v, _ in resultados])
+        giro = np.concatenate([g for _, g in resultados])
+    else:
+        valor, giro = simular_segmentos(crescimento, pesos, datas_rebalanceamento(datas, rebalanceamento))
+
+    return {'datas': datas, 'valor': valor[1:], **metricas_backtest(valor, giro, anos_por_passo(datas))}
+
+def backtest_carteiras(lista_pesos, precos, historico_bcb, rebalanceamento='mensal',
+                       limiar=LIMIAR_PADRAO, inicio=None, fim=None):
+    """
+    Backtest de uma lista de pesos_dict (ex.: todas as TESES) no mesmo período.
+    Acrescenta 'nomes_modelo': ativos usados pelas carteiras sem nenhum preço de mercado.
+    """
+    datas, tabela, retornos, cobertura = montar_retornos_diarios(precos, historico_bcb, inicio, fim)
+    matriz = tabela.matriz_pesos(lista_pesos)
+    resultado = backtest(datas, retornos, matriz, rebalanceamento, limiar)
+    usados = matriz.sum(axis=0) > 0
+    resultado['nomes_modelo'] = [n for n, u, c in zip(tabela.nomes, usados, cobertura) if u and c == 0]
+    resultado['cobertura'] = dict(zip(tabela.nomes, cobertura))
+    return resultado
@@ -0,0 +1,253 @@
+"""
+Execução em lote do SIOEI: projeta carteiras inteiras de clientes fora do Streamlit.
+
+Lê cenários de um CSV ou Parquet em blocos, avalia cada bloco em um pool de
+processos e grava o resultado bloco a bloco, então a memória não cresce com o
+tamanho da entrada. Todo o lote usa um único snapshot de mercado, montado uma
+vez no processo principal e repassado aos workers.
+
+Uso:
+    python -m sioei.batch clientes.csv resultado.csv --workers 8
+
+Colunas da entrada (uma linha por cenário):
+    v_inicial, v_mensal, anos, carteira        obrigatórias
+    renda_desejada, anos_inicio_retirada,
+    usar_retirada                              opcionais (padrão: sem retirada)
+
+`carteira` é o nome de um perfil (PERFIS) ou tese (TESES); a comparação ignora
+maiúsculas, acentos e emojis. Demais colunas (ex.: id do cliente) são repassadas.
+Linhas com carteira desconhecida, prazo fracionário ou negativo, ou valor em R$
+vazio, não numérico ou negativo não são projetadas: saem com a coluna `erro`.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import unicodedata
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from sioei.engine import avaliar_carteiras, montar_matriz_pesos
+from sioei.universe import PERFIS, TESES, construir_universo
+
+logger = logging.getLogger(__name__)
+
+COLUNAS_OBRIGATORIAS = ('v_inicial', 'v_mensal', 'anos', 'carteira')
+PADROES_RETIRADA = {'renda_desejada': 0.0, 'anos_inicio_retirada': 99, 'usar_retirada': False}
+COLUNAS_RESULTADO = ('retorno_aa', 'risco', 'investido', 'final_nom', 'final_real',
+                     'renda_passiva_possivel')
+VALORES_VERDADEIROS = {'1', 'true', 'sim', 's', 'yes', 'y', 'x'}
+
+# ==============================================================================
+# CARTEIRAS
+# ==============================================================================
+def normalizar_nome(nome):
+    """Chave de comparação de nomes: sem acentos, emojis, pontuação e caixa"""
+    texto = unicodedata.normalize('NFKD', str(nome))
+    return ' '.join(''.join(c for c in texto if c.isalnum() or c.isspace()).casefold().split())
+
+def carteiras_conhecidas():
+    """Pesos de todos os perfis e teses, indexados pelo nome normalizado"""
+    carteiras = {normalizar_nome(nome): pesos for nome, pesos in PERFIS.items()}
+    carteiras.update({normalizar_nome(nome): tese['pesos'] for nome, tese in TESES.items()})
+    return carteiras
+
+# ==============================================================================
+# WORKER
+# ==============================================================================
+# Estado de cada processo do pool, preenchido uma única vez por `_iniciar_worker`
+_UNIVERSO = None
+_VERSAO = None
+_INDICE_CARTEIRAS = {}
+_MATRIZ_CARTEIRAS = None
+
+def _iniciar_worker(universo):
+    global _UNIVERSO, _VERSAO, _INDICE_CARTEIRAS, _MATRIZ_CARTEIRAS
+    _UNIVERSO = universo
+    _VERSAO = universo.versao
+    # Uma linha da matriz por carteira conhecida; cada cenário só aponta para a sua
+    carteiras = carteiras_conhecidas()
+    _INDICE_CARTEIRAS = {nome: i for i, nome in enumerate(carteiras)}
+    _MATRIZ_CARTEIRAS = montar_matriz_pesos(list(carteiras.values()), universo)
+
+def _coluna_booleana(serie):
+    if serie.dtype == bool:
+        return serie
+    return serie.astype(str).str.strip().str.casefold().isin(VALORES_VERDADEIROS)
+
+def _coluna_numerica(serie):
+    """Valores numéricos (texto não numérico vira NaN) e máscara das células vazias"""
+    vazia = serie.isna() | serie.astype(str).str.strip().eq('')
+    return pd.to_numeric(serie.where(~vazia), errors='coerce'), vazia
+
+def _prazo_valido(anos):
+    return anos.notna() & (anos >= 0) & (anos % 1 == 0)
+
+def avaliar_bloco(bloco):
+    """Avalia um bloco de cenários (DataFrame) e devolve as colunas de resultado anexadas"""
+    bloco = bloco.reset_index(drop=True)
+    for coluna, padrao in PADROES_RETIRADA.items():
+        if coluna not in bloco.columns:
+            bloco[coluna] = padrao
+
+    chaves = bloco['carteira'].map(normalizar_nome)
+    conhecida = chaves.isin(_INDICE_CARTEIRAS.keys())
+    retirada = _coluna_booleana(bloco['usar_retirada'])
+
+    # Prazos em anos inteiros; o início da retirada só é exigido quando há retirada
+    anos, _ = _coluna_numerica(bloco['anos'])
+    inicio, inicio_vazio = _coluna_numerica(bloco['anos_inicio_retirada'])
+    inicio = inicio.mask(inicio_vazio, PADROES_RETIRADA['anos_inicio_retirada'])
+    prazo_ok = _prazo_valido(anos) & (~retirada | _prazo_valido(inicio))
+
+    # Valores em R$: numéricos e não negativos; renda vazia só vale sem retirada
+    valores, erro_valor = {}, pd.Series('', index=bloco.index)
+    for coluna, opcional in (('v_inicial', False), ('v_mensal', False), ('renda_desejada', ~retirada)):
+        valor, vazia = _coluna_numerica(bloco[coluna])
+        invalido = ~((valor >= 0) | (vazia & opcional))
+        erro_valor = erro_valor.mask(invalido & erro_valor.eq(''), f'valor inválido: {coluna}')
+        valores[coluna] = valor.fillna(0.0).to_numpy()
+
+    erros = np.select(
+        [~conhecida, ~prazo_ok], ['carteira desconhecida', 'prazo inválido'], default=erro_valor.to_numpy()
+    )
+    linhas = np.flatnonzero(erros == '')
+
+    # Cada cenário é uma linha da matriz de pesos: um único `avaliar_carteiras` por bloco
+    r = avaliar_carteiras(
+        _MATRIZ_CARTEIRAS[chaves.iloc[linhas].map(_INDICE_CARTEIRAS).to_numpy(dtype=int)],
+        valores['v_inicial'][linhas], valores['v_mensal'][linhas],
+        anos.to_numpy()[linhas].astype(int), valores['renda_desejada'][linhas],
+        inicio.fillna(0).to_numpy()[linhas].astype(int),
+        retirada.to_numpy()[linhas],
+        universo=_UNIVERSO
+    )
+
+    resultado = {coluna: np.full(len(bloco), np.nan) for coluna in COLUNAS_RESULTADO}
+    for coluna in COLUNAS_RESULTADO:
+        resultado[coluna][linhas] = r[coluna]
+
+    return bloco.assign(**resultado, erro=erros, versao_dados=_VERSAO)
+
+# ==============================================================================
+# LEITURA E ESCRITA EM BLOCOS
+# ==============================================================================
+def _formato(caminho):
+    return 'parquet' if caminho.lower().endswith(('.parquet', '.pq')) else 'csv'
+
+def ler_blocos(caminho, tamanho_bloco):
+    """Gera DataFrames de até `tamanho_bloco` linhas, sem carregar o arquivo inteiro"""
+    if _formato(caminho) == 'parquet':
+        import pyarrow.parquet as pq
+        arquivo = pq.ParquetFile(caminho)
+        for lote in arquivo.iter_batches(batch_size=tamanho_bloco):
+            yield lote.to_pandas()
+    else:
+        yield from pd.read_csv(caminho, chunksize=tamanho_bloco)
+
+class EscritorBlocos:
+    """Grava blocos de resultado em CSV ou Parquet conforme a extensão da saída"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.formato = _formato(caminho)
+        self._escritor = None
+        self.linhas = 0
+
+    def gravar(self, bloco):
+        if self.formato == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            tabela = pa.Table.from_pandas(bloco, preserve_index=False)
+            if self._escritor is None:
+                self._escritor = pq.ParquetWriter(self.caminho, tabela.schema)
+            self._escritor.write_table(tabela.cast(self._escritor.schema))
+        else:
+            bloco.to_csv(self.caminho, mode='w' if self.linhas == 0 else 'a',
+                         header=self.linhas == 0, index=False)
+        self.linhas += len(bloco)
+
+    def fechar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+
+def _mapear_em_ordem(executor, funcao, itens, em_voo):
+    """Como `executor.map`, mas com no máximo `em_voo` tarefas pendentes por vez"""
+    pendentes = deque()
+    for item in itens:
+        pendentes.append(executor.submit(funcao, item))
+        if len(pendentes) >= em_voo:
+            yield pendentes.popleft().result()
+    while pendentes:
+        yield pendentes.popleft().result()
+
+# ==============================================================================
+# EXECUÇÃO
+# ==============================================================================
+def executar_lote(entrada, saida, workers=None, tamanho_bloco=5000, snapshot=None, atualizar=False):
+    """
+    Projeta todos os cenários de `entrada` e grava em `saida`. Devolve o nº de linhas.
+
+    Sem `snapshot`, monta um a partir do armazém local (e da rede se `atualizar`).
+    """
+    if snapshot is None:
+        from sioei.data import montar_snapshot
+        snapshot = montar_snapshot(atualizar=atualizar)
+    universo = construir_universo(snapshot)
+    workers = workers or os.cpu_count() or 1
+    logger.info(f"Lote com snapshot {universo.versao} (Selic {universo.selic:.2f}%, "
+                f"IPCA {universo.ipca:.2f}%) em {workers} processo(s)")
+
+    def validar(blocos):
+        for bloco in blocos:
+            faltando = [c for c in COLUNAS_OBRIGATORIAS if c not in bloco.columns]
+            if faltando:
+                raise ValueError(f"Colunas obrigatórias ausentes em {entrada}: {', '.join(faltando)}")
+            yield bloco
+
+    blocos = validar(ler_blocos(entrada, tamanho_bloco))
+    escritor = EscritorBlocos(saida)
+    try:
+        if workers == 1:
+            _iniciar_worker(universo)
+            for bloco in blocos:
+                escritor.gravar(avaliar_bloco(bloco))
+        else:
+            with ProcessPoolExecutor(workers, initializer=_iniciar_worker,
+                                     initargs=(universo,)) as executor:
+                for resultado in _mapear_em_ordem(executor, avaliar_bloco, blocos, 2 * workers):
+                    escritor.gravar(resultado)
+                    logger.info(f"{escritor.linhas} cenários gravados")
+    finally:
+        escritor.fechar()
+    return escritor.linhas
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m sioei.batch',
+        description='Projeta em lote cenários de clientes (CSV/Parquet) com o motor do SIOEI.'
+    )
+    parser.add_argument('entrada', help='arquivo .csv ou .parquet com os cenários')
+    parser.add_argument('saida', help='arquivo .csv ou .parquet de resultado')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='processos no pool (padrão: nº de CPUs)')
+    parser.add_argument('-b', '--tamanho-bloco', type=int, default=5000,
+                        help='linhas por bloco lido/gravado (padrão: 5000)')
+    parser.add_argument('--atualizar', action='store_true',
+                        help='atualiza BCB/Yahoo antes de rodar (padrão: só armazém local)')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s %(message)s', stream=sys.stderr)
+    try:
+        linhas = executar_lote(args.entrada, args.saida, args.workers, args.tamanho_bloco,
+                               atualizar=args.atualizar)
+    except (OSError, ValueError) as e:
+        parser.exit(1, f"{parser.prog}: erro: {e}\n")
+    logger.info(f"✓ {linhas} cenários projetados em {args.saida}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Caches em memória do SIOEI, compartilhados por todas as sessões do processo.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+def chave_conteudo(*partes):
+    """
+    Hash estável (hex) de arrays NumPy e valores simples, para usar como chave de cache.
+    Arrays entram pelo conteúdo (bytes, dtype e forma); o resto, pelo repr.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for parte in partes:
+        if isinstance(parte, np.ndarray):
+            parte = np.ascontiguousarray(parte)
+            h.update(f"{parte.dtype.str}{parte.shape}".encode())
+            h.update(parte.tobytes())
+        else:
+            h.update(repr(parte).encode())
+        h.update(b'|')
+    return h.hexdigest()
+
+class CacheLRU:
+    """Dicionário limitado a `tamanho_max` itens com descarte LRU, seguro entre threads"""
+
+    def __init__(self, tamanho_max=256):
+        self.tamanho_max = tamanho_max
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave, calcular):
+        """Valor de `chave`; se ausente, `calcular()` (fora do lock) e guarda o resultado"""
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return self._itens[chave]
+            self.falhas += 1
+
+        valor = calcular()
+        with self._lock:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho_max:
+                self._itens.popitem(last=False)
+        return valor
+
+    def descartar(self, chave):
+        """Remove `chave` (se presente), ex.: um resultado que falhou"""
+        with self._lock:
+            self._itens.pop(chave, None)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self.acertos = self.falhas = 0
+
+    def estatisticas(self):
+        with self._lock:
+            total = self.acertos + self.falhas
+            return {
+                'itens': len(self._itens),
+                'tamanho_max': self.tamanho_max,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'taxa_acerto': self.acertos / total if total else 0.0
+            }
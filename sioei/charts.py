@@ -0,0 +1,359 @@
+"""
+Gráficos do dashboard do SIOEI (matplotlib, sem Streamlit).
+
+Cada função devolve o PNG já codificado. Os PNGs ficam num cache LRU por
+conteúdo (dados + estilo), então estados repetidos não voltam ao matplotlib.
+Quando é preciso desenhar, cada tipo de gráfico reaproveita uma figura
+persistente: os artistas são criados uma vez e só recebem dados novos
+(`set_data`). Séries mais longas que a largura em pixels são reduzidas antes
+de desenhar.
+"""
+
+import threading
+from io import BytesIO
+
+import numpy as np
+from matplotlib import style
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter
+
+from sioei.cache import CacheLRU, chave_conteudo
+from sioei.metricas import REGISTRO
+
+ESTILO = 'dark_background'
+COR_CDI = '#FF9800'
+COR_POUP = '#FF5722'
+COR_BRUTO = '#29B6F6'
+OPCOES_PNG = {'format': 'png', 'bbox_inches': 'tight', 'dpi': 200}  # Mesmas do st.pyplot
+
+CACHE_GRAFICOS = CacheLRU(tamanho_max=64)
+REGISTRO.registrar_cache('graficos', CACHE_GRAFICOS)
+
+# Figuras persistentes por tipo de gráfico; matplotlib não é thread-safe, então
+# atualizar + rasterizar acontece sob um único lock (acertos de cache não o tocam)
+_FIGURAS = {}
+_LOCK_RENDER = threading.Lock()
+
+# ==============================================================================
+# INFRAESTRUTURA
+# ==============================================================================
+def indices_reduzidos(n, max_pontos, *series):
+    """
+    Índices a desenhar quando n pontos não cabem em `max_pontos` colunas de pixel.
+
+    Divide o eixo em faixas e mantém, em cada uma, o primeiro e o último ponto e
+    os extremos de cada série, para que quebras (ex.: início das retiradas) não sumam.
+    """
+    if n <= max_pontos:
+        return np.arange(n)
+    tamanho = -(-n // max(1, max_pontos // 2))
+    inicio = np.arange(0, n, tamanho)
+    manter = [inicio, np.minimum(inicio + tamanho, n) - 1]
+    sobra = (-n) % tamanho
+    for serie in series:
+        faixas = np.pad(np.asarray(serie, dtype=float), (0, sobra), mode='edge').reshape(-1, tamanho)
+        manter += [inicio + faixas.argmin(axis=1), inicio + faixas.argmax(axis=1)]
+    return np.unique(np.minimum(np.concatenate(manter), n - 1))
+
+def _largura_px(fig):
+    return int(fig.get_figwidth() * OPCOES_PNG['dpi'])
+
+def _estilizar_eixos(ax, xlabel, ylabel):
+    """Visual padrão dos eixos: grade discreta, sem bordas superior/direita"""
+    ax.grid(True, alpha=0.1)
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.spines['bottom'].set_color('#444')
+    ax.spines['left'].set_color('#444')
+    ax.tick_params(colors='#aaa')
+    ax.set_xlabel(xlabel, color='#aaa', fontsize=9)
+    ax.set_ylabel(ylabel, color='#aaa', fontsize=9)
+
+def _renderizar(tipo, construir, atualizar, *args):
+    """Atualiza a figura persistente de `tipo` (criada por `construir`) e devolve o PNG"""
+    with _LOCK_RENDER, style.context(ESTILO), REGISTRO.etapa(f"graficos.rasterizar.{tipo}"):
+        if tipo not in _FIGURAS:
+            _FIGURAS[tipo] = construir()
+        fig, ax, artistas = _FIGURAS[tipo]
+        atualizar(fig, ax, artistas, *args)
+        buffer = BytesIO()
+        fig.savefig(buffer, **OPCOES_PNG)
+        return buffer.getvalue()
+
+def _nova_figura(tamanho):
+    fig = Figure(figsize=tamanho)
+    FigureCanvasAgg(fig)
+    return fig, fig.add_subplot()
+
+def _reescalar(ax):
+    ax.relim(visible_only=True)
+    ax.autoscale_view()
+
+# ==============================================================================
+# PROJEÇÃO DETERMINÍSTICA (g1)
+# ==============================================================================
+SERIES_PROJECAO = ('y_cart_bruto', 'y_cart_nom', 'y_cart_real', 'y_cdi_nom', 'y_cdi_real',
+                   'y_poup_nom', 'y_poup_real')
+
+def _construir_projecao():
+    fig, ax = _nova_figura((10, 4))
+    vazio = ([0], [0], [0])
+    a = {
+        'bruto': ax.plot([], [], color=COR_BRUTO, linewidth=1, linestyle='--',
+                         label='Bruto (Sem taxas)', alpha=0.8)[0],
+        'nom': ax.plot([], [], linewidth=2, label='Carteira (Líquida)')[0],
+        'real': ax.plot([], [], linewidth=1, linestyle=':', alpha=0.5, label='_nolegend_')[0],
+        'faixa_bruto': ax.fill_between(*vazio, color=COR_BRUTO, alpha=0.10, label='Impacto Tributário'),
+        'faixa_real': ax.fill_between(*vazio, alpha=0.15, label='Perda Inflação'),
+        'cdi_nom': ax.plot([], [], color=COR_CDI, linewidth=1.5, linestyle='--',
+                           alpha=0.7, label='CDI (Nominal)')[0],
+        'cdi_real': ax.plot([], [], color=COR_CDI, linewidth=0.5, linestyle=':',
+                            alpha=0.3, label='_nolegend_')[0],
+        'faixa_cdi': ax.fill_between(*vazio, color=COR_CDI, alpha=0.08),
+        'poup_nom': ax.plot([], [], color=COR_POUP, linewidth=1.5, label='Poupança (Nominal)')[0],
+        'poup_real': ax.plot([], [], color=COR_POUP, linewidth=0.5, linestyle=':',
+                             alpha=0.3, label='_nolegend_')[0],
+        'faixa_poup': ax.fill_between(*vazio, color=COR_POUP, alpha=0.08),
+    }
+    _estilizar_eixos(ax, 'Meses', 'Patrimônio (R$)')
+    return fig, ax, a
+
+def _atualizar_projecao(fig, ax, a, d, cor_carteira):
+    idx = indices_reduzidos(len(d['x']), _largura_px(fig), *(d[s] for s in SERIES_PROJECAO))
+    x = np.asarray(d['x'])[idx]
+    y = {s: np.asarray(d[s])[idx] for s in SERIES_PROJECAO}
+
+    a['bruto'].set_data(x, y['y_cart_bruto'])
+    a['nom'].set_data(x, y['y_cart_nom'])
+    a['real'].set_data(x, y['y_cart_real'])
+    a['faixa_bruto'].set_data(x, y['y_cart_nom'], y['y_cart_bruto'])
+    a['faixa_real'].set_data(x, y['y_cart_nom'], y['y_cart_real'])
+    a['cdi_nom'].set_data(x, y['y_cdi_nom'])
+    a['cdi_real'].set_data(x, y['y_cdi_real'])
+    a['faixa_cdi'].set_data(x, y['y_cdi_nom'], y['y_cdi_real'])
+    a['poup_nom'].set_data(x, y['y_poup_nom'])
+    a['poup_real'].set_data(x, y['y_poup_real'])
+    a['faixa_poup'].set_data(x, y['y_poup_nom'], y['y_poup_real'])
+
+    # Carteira vazia (modo poupança): some a carteira e a poupança vira linha cheia
+    carteira = not d['is_poup']
+    for nome in ('bruto', 'nom', 'real', 'faixa_bruto', 'faixa_real'):
+        a[nome].set_visible(carteira)
+    for nome in ('nom', 'real', 'faixa_real'):
+        a[nome].set_color(cor_carteira)
+    a['poup_nom'].set_linestyle(':' if carteira else '-')
+    a['poup_nom'].set_alpha(0.5 if carteira else 0.9)
+
+    _reescalar(ax)
+    legenda = ['bruto', 'nom', 'faixa_bruto', 'faixa_real', 'cdi_nom', 'poup_nom']
+    ax.legend(handles=[a[nome] for nome in legenda if a[nome].get_visible()],
+              loc='upper left', frameon=False, ncol=2, fontsize='x-small')
+
+def png_projecao(d, cor_carteira):
+    """Carteira (bruta, líquida e real) contra CDI e Poupança, a partir de `calcular`"""
+    chave = chave_conteudo('projecao', cor_carteira, d['is_poup'], np.asarray(d['x']),
+                           *(np.asarray(d[s]) for s in SERIES_PROJECAO))
+    return CACHE_GRAFICOS.obter(chave, lambda: _renderizar(
+        'projecao', _construir_projecao, _atualizar_projecao, d, cor_carteira))
+
+# ==============================================================================
+# COMPOSIÇÃO POR ATIVO (g1, PROJEÇÃO POR ATIVO)
+# ==============================================================================
+def _construir_composicao():
+    fig, ax = _nova_figura((10, 4))
+    return fig, ax, {}
+
+def _atualizar_composicao(fig, ax, a, x, saldos, nomes, cores):
+    # O nº de camadas varia com a carteira: o empilhamento é refeito a cada desenho
+    total = saldos.sum(axis=1)
+    idx = indices_reduzidos(len(x), _largura_px(fig), total)
+    ax.clear()
+    ax.stackplot(x[idx], saldos[idx].T, labels=nomes, colors=cores, alpha=0.85, linewidth=0)
+    ax.plot(x[idx], total[idx], color='white', linewidth=1, alpha=0.6, label='_nolegend_')
+    _estilizar_eixos(ax, 'Meses', 'Patrimônio (R$)')
+    ax.set_xlim(x[0], x[-1])
+    ax.legend(loc='upper left', frameon=False, ncol=3, fontsize='x-small')
+
+def png_composicao(d):
+    """Saldo líquido de cada ativo, empilhado, de `calcular(..., rebalancear_meses=...)`"""
+    x = np.asarray(d['x'])
+    saldos = np.clip(np.asarray(d['y_ativos_nom']), 0, None)  # Retiradas podem zerar um ativo antes dos outros
+    nomes = tuple(a['nome'] for a in d['ativos'])
+    cores = tuple(a['cor'] for a in d['ativos'])
+    chave = chave_conteudo('composicao', x, saldos, nomes, cores)
+    return CACHE_GRAFICOS.obter(chave, lambda: _renderizar(
+        'composicao', _construir_composicao, _atualizar_composicao, x, saldos, nomes, cores))
+
+# ==============================================================================
+# LEQUE DE MONTE CARLO (g1, MODO ESTOCÁSTICO)
+# ==============================================================================
+def _construir_monte_carlo():
+    fig, ax = _nova_figura((10, 4))
+    vazio = ([0], [0], [0])
+    a = {
+        'p5_p95': ax.fill_between(*vazio, alpha=0.12, label='P5 - P95'),
+        'p25_p75': ax.fill_between(*vazio, alpha=0.25, label='P25 - P75'),
+        'p50': ax.plot([], [], linewidth=2, label='Mediana (P50)')[0],
+        'deterministico': ax.plot([], [], color='white', linewidth=1, linestyle='--',
+                                  alpha=0.6, label='Determinístico')[0],
+        'cdi': ax.plot([], [], color=COR_CDI, linewidth=1.5, linestyle='--',
+                       alpha=0.7, label='CDI (Nominal)')[0],
+    }
+    _estilizar_eixos(ax, 'Meses', 'Patrimônio (R$)')
+    return fig, ax, a
+
+def _atualizar_monte_carlo(fig, ax, a, d, mc, cor_carteira):
+    p = mc['percentis']
+    a['p5_p95'].set_data(mc['x'], p[5], p[95])
+    a['p25_p75'].set_data(mc['x'], p[25], p[75])
+    a['p50'].set_data(mc['x'], p[50])
+
+    idx = indices_reduzidos(len(d['x']), _largura_px(fig), d['y_cart_nom'], d['y_cdi_nom'])
+    x = np.asarray(d['x'])[idx]
+    a['deterministico'].set_data(x, np.asarray(d['y_cart_nom'])[idx])
+    a['cdi'].set_data(x, np.asarray(d['y_cdi_nom'])[idx])
+
+    for nome in ('p5_p95', 'p25_p75', 'p50'):
+        a[nome].set_color(cor_carteira)
+
+    # Linhas cobrem a faixa P50; os extremos P5/P95 entram à mão (relim ignora coleções)
+    _reescalar(ax)
+    ax.update_datalim(np.column_stack([mc['x'], p[5]]))
+    ax.update_datalim(np.column_stack([mc['x'], p[95]]))
+    ax.autoscale_view()
+    ax.legend(loc='upper left', frameon=False, ncol=2, fontsize='x-small')
+
+def png_monte_carlo(d, mc, cor_carteira):
+    """Faixas de percentis de `simular_monte_carlo` sobre a projeção determinística"""
+    chave = chave_conteudo('monte_carlo', cor_carteira, np.asarray(mc['x']),
+                           *(np.asarray(v) for v in mc['percentis'].values()),
+                           np.asarray(d['x']), np.asarray(d['y_cart_nom']), np.asarray(d['y_cdi_nom']))
+    return CACHE_GRAFICOS.obter(chave, lambda: _renderizar(
+        'monte_carlo', _construir_monte_carlo, _atualizar_monte_carlo, d, mc, cor_carteira))
+
+# ==============================================================================
+# ALOCAÇÃO (g2)
+# ==============================================================================
+def _construir_alocacao():
+    fig, ax = _nova_figura((5, 5))
+    return fig, ax, {}
+
+def _atualizar_alocacao(fig, ax, a, fatias):
+    # O nº de fatias varia: a rosca é refeita, mas a figura e o canvas são os mesmos
+    ax.clear()
+    vals = [peso for _, peso, _ in fatias] or [1]
+    labs = [f"{nome}\n{peso:.0f}%" for nome, peso, _ in fatias] or ["Vazio"]
+    colors = [cor for _, _, cor in fatias] or ["#333"]
+    ax.pie(vals, labels=labs, colors=colors, startangle=90,
+           textprops={'color': "white", 'fontsize': 7},
+           wedgeprops=dict(width=0.45, edgecolor='#222'))
+    ax.set_title("Alocação", color='white', fontsize=10)
+
+def png_alocacao(ativos_usados):
+    """Rosca com o peso de cada ativo da carteira (`calcular(...)['ativos']`)"""
+    fatias = tuple((i['nome'], float(i['peso']), i['cor']) for i in ativos_usados)
+    return CACHE_GRAFICOS.obter(chave_conteudo('alocacao', fatias), lambda: _renderizar(
+        'alocacao', _construir_alocacao, _atualizar_alocacao, fatias))
+
+# ==============================================================================
+# FRONTEIRA EFICIENTE (OTIMIZADOR)
+# ==============================================================================
+def _construir_fronteira():
+    fig, ax = _nova_figura((6, 4))
+    a = {
+        'fronteira': ax.plot([], [], color='#00E676', linewidth=2, label='Fronteira Eficiente')[0],
+        'ativos': ax.scatter([], [], s=15, alpha=0.7, label='Ativos'),
+        'escolhida': ax.scatter([], [], color='white', s=60, zorder=5, label='Escolhida'),
+    }
+    ax.legend(loc='lower right', frameon=False, fontsize='x-small')
+    ax.grid(True, alpha=0.1)
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.tick_params(colors='#aaa')
+    ax.set_xlabel('Volatilidade (% a.a.)', color='#aaa', fontsize=9)
+    ax.set_ylabel('Retorno Líquido (% a.a.)', color='#aaa', fontsize=9)
+    return fig, ax, a
+
+def _atualizar_fronteira(fig, ax, a, vols, rets, vol_ativos, retornos_ativos, cores_ativos, i):
+    pontos_ativos = np.column_stack([vol_ativos, retornos_ativos])
+    a['fronteira'].set_data(vols, rets)
+    a['ativos'].set_offsets(pontos_ativos)
+    a['ativos'].set_facecolor(cores_ativos)
+    a['escolhida'].set_offsets([[vols[i], rets[i]]])
+
+    _reescalar(ax)
+    ax.update_datalim(pontos_ativos)
+    ax.autoscale_view()
+    ax.legend(loc='lower right', frameon=False, fontsize='x-small')
+
+def png_fronteira(fronteira, vol_ativos, retornos_ativos, cores_ativos, i_escolhida):
+    """Fronteira de `fronteira_eficiente`, ativos individuais e o ponto escolhido"""
+    vols = np.asarray(fronteira['volatilidades'])
+    rets = np.asarray(fronteira['retornos'])
+    vol_ativos = np.asarray(vol_ativos, dtype=float)
+    retornos_ativos = np.asarray(retornos_ativos, dtype=float)
+    cores_ativos = list(cores_ativos)
+    chave = chave_conteudo('fronteira', vols, rets, vol_ativos, retornos_ativos,
+                           tuple(cores_ativos), int(i_escolhida))
+    return CACHE_GRAFICOS.obter(chave, lambda: _renderizar(
+        'fronteira', _construir_fronteira, _atualizar_fronteira,
+        vols, rets, vol_ativos, retornos_ativos, cores_ativos, int(i_escolhida)))
+
+# ==============================================================================
+# SENSIBILIDADE PRAZO x APORTE (MAPA DE CALOR)
+# ==============================================================================
+# Métrica de `grade_sensibilidade` -> (rótulo da barra de cores, colormap)
+METRICAS_SENSIBILIDADE = {
+    'final_real': ('Saldo Final Real (R$)', 'viridis'),
+    'pct_cdi': ('% do Lucro do CDI', 'RdYlGn'),
+    'cobertura_renda': ('Cobertura da Renda Desejada (%)', 'RdYlGn'),
+}
+
+def _construir_sensibilidade():
+    fig, ax = _nova_figura((10, 4))
+    a = {
+        'mapa': ax.imshow(np.zeros((1, 1)), origin='lower', aspect='auto', interpolation='nearest'),
+        'atual': ax.plot([], [], marker='o', markersize=8, markerfacecolor='none',
+                         markeredgecolor='white', markeredgewidth=1.5, linestyle='none')[0],
+    }
+    a['barra'] = fig.colorbar(a['mapa'], ax=ax)
+    a['barra'].formatter = FuncFormatter(lambda v, _: f"{v:,.0f}".replace(",", "."))
+    a['barra'].ax.tick_params(colors='#aaa', labelsize=8)
+    _estilizar_eixos(ax, 'Aporte Mensal (R$)', 'Prazo (Anos)')
+    ax.grid(False)
+    return fig, ax, a
+
+def _atualizar_sensibilidade(fig, ax, a, valores, anos, aportes, metrica, anos_atual, aporte_atual):
+    rotulo, cmap = METRICAS_SENSIBILIDADE[metrica]
+    passo_aporte = aportes[1] - aportes[0] if len(aportes) > 1 else 1.0
+    a['mapa'].set_data(valores)
+    a['mapa'].set_extent((aportes[0] - passo_aporte / 2, aportes[-1] + passo_aporte / 2,
+                          anos[0] - 0.5, anos[-1] + 0.5))
+    a['mapa'].set_cmap(cmap)
+
+    # Percentuais com escala fixa: % do CDI centrado em 100% (empate) e saturado
+    # fora de 0-200%, pois explode quando o lucro do CDI se aproxima de zero
+    if metrica == 'cobertura_renda':
+        limites = (0, 100)
+    elif metrica == 'pct_cdi':
+        limites = (0, 200)
+    else:
+        limites = (np.nanmin(valores), np.nanmax(valores))
+    a['mapa'].set_clim(*limites)
+    a['barra'].set_label(rotulo, color='#aaa', fontsize=9)
+
+    a['atual'].set_data([aporte_atual], [anos_atual])
+    ax.set_xlim(aportes[0] - passo_aporte / 2, aportes[-1] + passo_aporte / 2)
+    ax.set_ylim(anos[0] - 0.5, anos[-1] + 0.5)
+
+def png_sensibilidade(grade, metrica, anos_atual, aporte_atual):
+    """Mapa de calor de uma métrica de `grade_sensibilidade`; o círculo marca o cenário atual"""
+    valores = np.asarray(grade[metrica], dtype=float)
+    anos = np.asarray(grade['anos'])
+    aportes = np.asarray(grade['aportes'], dtype=float)
+    chave = chave_conteudo('sensibilidade', metrica, valores, anos, aportes,
+                           int(anos_atual), float(aporte_atual))
+    return CACHE_GRAFICOS.obter(chave, lambda: _renderizar(
+        'sensibilidade', _construir_sensibilidade, _atualizar_sensibilidade,
+        valores, anos, aportes, metrica, int(anos_atual), float(aporte_atual)))
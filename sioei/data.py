@@ -0,0 +1,599 @@
+"""
+Camada de dados do SIOEI: BCB (SGS), Yahoo Finance e armazém local em SQLite.
+
+Nada aqui depende do Streamlit. A rede só é acessada quando uma função de
+atualização é chamada; importar o módulo não faz nenhuma requisição.
+"""
+
+import hashlib
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from sioei.estatisticas import DIAS_UTEIS_ANO, JANELAS, EstatisticasRolantes, retorno_tendencia
+from sioei.metricas import REGISTRO
+from sioei.universe import TICKERS_MAP
+
+logger = logging.getLogger(__name__)
+
+# --- CONEXÃO BANCO CENTRAL (SGS API) ---
+URL_BCB = os.environ.get("SIOEI_BCB_URL", "https://api.bcb.gov.br/dados/serie")
+SERIES_BCB = {'selic': 432, 'ipca': 13522}
+INICIO_HISTORICO_BCB = datetime(2000, 1, 1).date()
+JANELA_MAXIMA_BCB = 3650  # A API SGS limita consultas de séries diárias a 10 anos
+
+def criar_sessao_http(conexoes=10, tentativas=2):
+    """Sessão HTTP com pool de conexões keep-alive e retentativas para erros transitórios"""
+    sessao = requests.Session()
+    retry = Retry(total=tentativas, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+    adaptador = HTTPAdapter(pool_connections=conexoes, pool_maxsize=conexoes, max_retries=retry)
+    sessao.mount("http://", adaptador)
+    sessao.mount("https://", adaptador)
+    return sessao
+
+@lru_cache(maxsize=None)
+def obter_sessao_http():
+    """Sessão compartilhada entre execuções e usuários (reaproveita conexões)"""
+    return criar_sessao_http()
+
+def baixar_serie_bcb(sessao, codigo, inicio, fim, timeout=10):
+    """Observações da série SGS `codigo` entre `inicio` e `fim` como lista de (data, valor)"""
+    with REGISTRO.etapa("dados.bcb.consulta"):
+        resposta = sessao.get(
+            f"{URL_BCB}/bcdata.sgs.{codigo}/dados",
+            params={
+                'formato': 'json',
+                'dataInicial': inicio.strftime("%d/%m/%Y"),
+                'dataFinal': fim.strftime("%d/%m/%Y"),
+            },
+            timeout=timeout
+        )
+    if resposta.status_code == 404:
+        return []  # Janela sem observações
+    resposta.raise_for_status()
+    return [(datetime.strptime(obs['data'], "%d/%m/%Y").date(), float(obs['valor'])) 
+            for obs in resposta.json()]
+
+def janelas_consulta(inicio, fim, dias=JANELA_MAXIMA_BCB):
+    """Quebra [inicio, fim] em janelas de no máximo `dias` dias"""
+    janelas = []
+    while inicio <= fim:
+        fim_janela = min(inicio + timedelta(days=dias - 1), fim)
+        janelas.append((inicio, fim_janela))
+        inicio = fim_janela + timedelta(days=1)
+    return janelas
+
+def atualizar_series_bcb(codigos, sessao=None, max_workers=8):
+    """
+    Atualiza o histórico local das séries SGS e devolve {codigo: pd.Series} lido do disco.
+    
+    Cada série só busca observações a partir da última data gravada; séries novas
+    baixam o histórico completo desde INICIO_HISTORICO_BCB. Todas as janelas de todas
+    as séries são consultadas em paralelo sobre a mesma sessão keep-alive.
+    Também devolve o conjunto de códigos que falharam nesta atualização.
+    """
+    sessao = sessao or obter_sessao_http()
+    hoje = datetime.now().date()
+    conn = conectar_armazem()
+    try:
+        ultimas = dict(conn.execute(
+            "SELECT serie, MAX(data) FROM series_bcb GROUP BY serie"
+        ).fetchall())
+        tarefas = []
+        for codigo in codigos:
+            ultima = ultimas.get(codigo)
+            inicio = (datetime.strptime(ultima, "%Y-%m-%d").date() 
+                      if ultima else INICIO_HISTORICO_BCB)
+            tarefas += [(codigo, ini, fim) for ini, fim in janelas_consulta(inicio, hoje)]
+        
+        falhas = set()
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futuros = [(codigo, pool.submit(baixar_serie_bcb, sessao, codigo, ini, fim)) 
+                       for codigo, ini, fim in tarefas]
+            for codigo, futuro in futuros:
+                try:
+                    obs = futuro.result()
+                except Exception as e:
+                    logger.warning(f"Erro BCB (série {codigo}): {e}")
+                    falhas.add(codigo)
+                    continue
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO series_bcb VALUES (?, ?, ?)",
+                        [(codigo, data.strftime("%Y-%m-%d"), valor) for data, valor in obs]
+                    )
+        
+        return ler_series_bcb(conn, codigos), falhas
+    finally:
+        conn.close()
+
+def ler_series_bcb(conn, codigos):
+    """Histórico gravado de cada série SGS como {codigo: pd.Series}, sem acessar a rede"""
+    series = {}
+    for codigo in codigos:
+        df = pd.read_sql_query(
+            "SELECT data, valor FROM series_bcb WHERE serie = ? ORDER BY data", 
+            conn, params=[codigo], index_col="data", parse_dates=["data"]
+        )
+        series[codigo] = df['valor']
+    return series
+
+def carregar_dados_bcb(atualizar=True):
+    """
+    Obtém dados macroeconômicos do Banco Central do Brasil (último valor + histórico).
+    
+    Com `atualizar=False` usa apenas o histórico já gravado em disco (sem rede).
+    'status' indica que os valores vêm do BCB; 'online' que a consulta à API funcionou agora.
+    """
+    macro = {'selic': 10.75, 'ipca': 4.50, 'status': False, 'online': False, 'historico': {}}
+    codigos = list(SERIES_BCB.values())
+    try:
+        if atualizar:
+            series, falhas = atualizar_series_bcb(codigos)
+        else:
+            conn = conectar_armazem()
+            try:
+                series, falhas = ler_series_bcb(conn, codigos), set(codigos)
+            finally:
+                conn.close()
+        
+        for nome, codigo in SERIES_BCB.items():
+            historico = series[codigo]
+            macro['historico'][nome] = historico
+            if not historico.empty:
+                macro[nome] = float(historico.iloc[-1])
+        
+        macro['online'] = not falhas
+        macro['status'] = all(not h.empty for h in macro['historico'].values())
+        if macro['online']:
+            logger.info("Dados do BCB obtidos com sucesso")
+    except Exception as e:
+        logger.warning(f"Erro BCB: {e}")
+    
+    return macro
+
+# --- ARMAZÉM LOCAL DE DADOS (SQLITE INCREMENTAL) + YAHOO FINANCE ---
+DIRETORIO_DADOS = os.environ.get(
+    "SIOEI_DADOS", 
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".sioei_dados")
+)
+ARQUIVO_ARMAZEM = os.path.join(DIRETORIO_DADOS, "mercado.sqlite")
+TICKERS_SEM_FONTE = ['IFIX', 'IDIV']  # Índices sem série no Yahoo: ficam só com a premissa histórica
+TICKERS_YAHOO = [t for t in TICKERS_MAP.values() if t not in TICKERS_SEM_FONTE]
+
+def conectar_armazem():
+    """Abre (e cria, se preciso) o banco local com fechamentos diários e séries do BCB"""
+    os.makedirs(DIRETORIO_DADOS, exist_ok=True)
+    conn = sqlite3.connect(ARQUIVO_ARMAZEM, timeout=30)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS precos (
+            ticker TEXT NOT NULL,
+            data TEXT NOT NULL,
+            fechamento REAL NOT NULL,
+            PRIMARY KEY (ticker, data)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS series_bcb (
+            serie INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            valor REAL NOT NULL,
+            PRIMARY KEY (serie, data)
+        ) WITHOUT ROWID
+    """)
+    return conn
+
+def ultimas_datas_armazenadas(conn, tickers):
+    """Data do último fechamento gravado para cada ticker (ausente se nunca baixado)"""
+    marcadores = ",".join("?" * len(tickers))
+    linhas = conn.execute(
+        f"SELECT ticker, MAX(data) FROM precos WHERE ticker IN ({marcadores}) GROUP BY ticker",
+        list(tickers)
+    ).fetchall()
+    return {ticker: datetime.strptime(data, "%Y-%m-%d").date() for ticker, data in linhas}
+
+def gravar_precos(conn, fechamentos):
+    """Grava (upsert) um DataFrame de fechamentos: índice = datas, colunas = tickers"""
+    longo = fechamentos.stack().dropna()
+    linhas = [(ticker, data.strftime("%Y-%m-%d"), float(valor)) 
+              for (data, ticker), valor in longo.items()]
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO precos VALUES (?, ?, ?)", linhas)
+    return len(linhas)
+
+def ler_precos(conn, tickers, inicio):
+    """Lê do disco a janela [inicio, hoje] como DataFrame largo (datas x tickers)"""
+    marcadores = ",".join("?" * len(tickers))
+    longo = pd.read_sql_query(
+        f"SELECT ticker, data, fechamento FROM precos "
+        f"WHERE ticker IN ({marcadores}) AND data >= ? ORDER BY data",
+        conn, 
+        params=list(tickers) + [inicio.strftime("%Y-%m-%d")]
+    )
+    if longo.empty:
+        return pd.DataFrame(columns=list(tickers))
+    largo = longo.pivot(index="data", columns="ticker", values="fechamento")
+    largo.index = pd.to_datetime(largo.index)
+    return largo
+
+_LOCK_YFINANCE = threading.Lock()
+
+class SemFechamentos(RuntimeError):
+    """A fonte respondeu sem nenhum fechamento para o lote (rede fora ou lote só de símbolos vazios)"""
+
+def baixar_fechamentos_yahoo(tickers, inicio):
+    """
+    Fechamentos ajustados do Yahoo Finance a partir de `inicio` (datas x tickers).
+    Chamadas simultâneas são serializadas (ver _LOCK_YFINANCE).
+    """
+    import yfinance as yf  # Import pesado: só quando de fato for à rede
+    
+    # yf.download guarda o resultado em estado global: um lote por vez
+    # (dentro do lote o próprio yfinance baixa os tickers em paralelo)
+    with _LOCK_YFINANCE:
+        data = yf.download(
+            list(tickers), 
+            start=inicio.strftime("%Y-%m-%d"), 
+            interval="1d", 
+            progress=False,
+            auto_adjust=True
+        )['Close']
+    if isinstance(data, pd.Series):
+        data = data.to_frame(name=list(tickers)[0])
+    if data.dropna(how='all').empty:
+        # O yfinance não levanta exceção em falhas de rede: lote inteiro vazio conta como erro
+        raise SemFechamentos(f"Yahoo não retornou fechamentos para {len(tickers)} ticker(s)")
+    return data
+
+# --- DOWNLOAD EM LOTES (UNIVERSOS GRANDES DE TICKERS) ---
+TAMANHO_LOTE = 50               # Tickers por chamada à fonte de preços
+LOTES_SIMULTANEOS = 4           # Chamadas em paralelo
+LOTES_POR_SEGUNDO = 2.0         # Limite de taxa da fonte (chamadas/s, somando as threads)
+TENTATIVAS_LOTE = 3
+TENTATIVAS_DIVISAO = 2          # Tentativas de cada metade de um lote dividido
+ESPERA_RETENTATIVA = 1.0        # Base (s) da espera exponencial entre tentativas
+LOTES_FALHOS_DISJUNTOR = 4      # Lotes seguidos falhando, sem nenhum sucesso, param o download
+STATUS_OK, STATUS_SEM_DADOS, STATUS_ERRO = 'ok', 'sem dados', 'erro'
+
+class LimitadorTaxa:
+    """Limite de `por_segundo` liberações por segundo entre threads, com rajadas de até `rajada`"""
+    
+    def __init__(self, por_segundo, rajada=1):
+        self.intervalo = 1 / por_segundo if por_segundo else 0.0
+        self.rajada = rajada
+        self._proxima = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def aguardar(self):
+        """Bloqueia até a próxima liberação permitida"""
+        if not self.intervalo:
+            return
+        with self._lock:
+            agora = time.monotonic()
+            # Tempo ocioso acumula crédito para até `rajada` liberações imediatas
+            self._proxima = max(self._proxima, agora - self.intervalo * (self.rajada - 1))
+            espera = self._proxima - agora
+            self._proxima += self.intervalo
+        if espera > 0:
+            time.sleep(espera)
+
+def erro_transitorio(erro):
+    """Falha de rede ou da fonte (timeout, 429, 5xx): repetir pode resolver, dividir o lote não"""
+    if isinstance(erro, requests.HTTPError) and erro.response is not None:
+        return erro.response.status_code == 429 or erro.response.status_code >= 500
+    if isinstance(erro, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)):
+        return True
+    texto = str(erro).lower()
+    return any(marca in texto for marca in ('429', 'too many requests', 'rate limit', 'timed out'))
+
+def baixar_em_lotes(tickers, inicio, baixar=baixar_fechamentos_yahoo, tamanho_lote=TAMANHO_LOTE,
+                    max_workers=LOTES_SIMULTANEOS, por_segundo=LOTES_POR_SEGUNDO,
+                    tentativas=TENTATIVAS_LOTE, espera=ESPERA_RETENTATIVA, limitador=None):
+    """
+    Fechamentos de muitos tickers desde `inicio`: `baixar(lote, inicio)` por lote de
+    `tamanho_lote`, com `max_workers` lotes em paralelo e no máximo `por_segundo` chamadas/s.
+    Com o `baixar` padrão (yfinance) as chamadas são serializadas: o paralelismo entre
+    lotes só vale para fontes que aceitam chamadas simultâneas.
+    
+    Lotes que falham são repetidos com espera exponencial (com jitter). Um lote que
+    ainda falha só é dividido ao meio (TENTATIVAS_DIVISAO por metade, com a mesma
+    espera) se a falha parecer de um símbolo: HTTP 4xx que não 429, ou outro erro não
+    transitório enquanto outros lotes dão certo. Falhas de rede, 429 e 5xx não são
+    divididas, e LOTES_FALHOS_DISJUNTOR lotes seguidos falhando sem nenhum sucesso
+    interrompem o download (fonte fora do ar). Devolve (fechamentos, status): o que foi
+    obtido (datas x tickers) e o status de cada ticker (STATUS_*).
+    Um `limitador` (LimitadorTaxa) pode ser compartilhado entre várias chamadas.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    limitador = limitador or LimitadorTaxa(por_segundo, rajada=max_workers)
+    disjuntor = {'sucessos': 0, 'falhas_seguidas': 0, 'aberto': False}
+    lock = threading.Lock()
+    
+    def tentar(lote, n_tentativas):
+        erro = RuntimeError("download interrompido: fonte de preços fora do ar")
+        for tentativa in range(n_tentativas):
+            if disjuntor['aberto']:
+                break
+            limitador.aguardar()
+            try:
+                with REGISTRO.etapa("dados.precos.lote"):
+                    return baixar(lote, inicio)
+            except Exception as e:
+                erro = e
+                if tentativa + 1 < n_tentativas:
+                    time.sleep(espera * 2 ** tentativa * random.uniform(0.5, 1.5))
+        raise erro
+    
+    def baixar_lote(lote):
+        """(lote, DataFrame ou exceção) na primeira passada, alimentando o disjuntor"""
+        try:
+            resultado = tentar(lote, tentativas)
+        except Exception as e:
+            with lock:
+                disjuntor['falhas_seguidas'] += 1
+                if not disjuntor['sucessos'] and disjuntor['falhas_seguidas'] >= LOTES_FALHOS_DISJUNTOR:
+                    disjuntor['aberto'] = True
+            return lote, e
+        with lock:
+            disjuntor['sucessos'] += 1
+            disjuntor['falhas_seguidas'] = 0
+        return lote, resultado
+    
+    def dividir(erro):
+        if disjuntor['aberto'] or erro_transitorio(erro) or isinstance(erro, SemFechamentos):
+            return False
+        if isinstance(erro, requests.HTTPError) and erro.response is not None:
+            return True  # 4xx que não 429: algum símbolo do lote é recusado
+        return disjuntor['sucessos'] > 0
+    
+    def isolar(lote, erro):
+        """Lista de (lote, DataFrame ou exceção), dividindo ao meio enquanto a falha for de símbolo"""
+        if len(lote) == 1 or not dividir(erro):
+            return [(lote, erro)]
+        partes = []
+        for metade in (lote[:len(lote) // 2], lote[len(lote) // 2:]):
+            try:
+                partes.append((metade, tentar(metade, TENTATIVAS_DIVISAO)))
+            except Exception as e:
+                partes += isolar(metade, e)
+        return partes
+    
+    lotes = [tickers[i:i + tamanho_lote] for i in range(0, len(tickers), tamanho_lote)]
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(lotes)))) as executor:
+        primeira = list(executor.map(baixar_lote, lotes))
+        resultados = [r for r in primeira if not isinstance(r[1], Exception)]
+        falhos = [r for r in primeira if isinstance(r[1], Exception)]
+        # Só depois da primeira passada se sabe se outros lotes deram certo
+        resultados += [r for partes in executor.map(lambda r: isolar(*r), falhos) for r in partes]
+    if disjuntor['aberto']:
+        logger.warning(f"Preços: {LOTES_FALHOS_DISJUNTOR} lotes seguidos falharam sem nenhum sucesso; "
+                       f"download interrompido")
+    
+    quadros, status, falhas = [], {}, {}
+    for lote, resultado in resultados:
+        if isinstance(resultado, Exception):
+            falhas.setdefault(str(resultado), []).extend(lote)
+            status.update(dict.fromkeys(lote, STATUS_ERRO))
+            continue
+        com_dados = resultado.columns[resultado.notna().any()].intersection(lote)
+        quadros.append(resultado[com_dados])
+        status.update({t: STATUS_OK if t in com_dados else STATUS_SEM_DADOS for t in lote})
+    for erro, nomes in falhas.items():
+        amostra = ', '.join(nomes[:5]) + (f" e mais {len(nomes) - 5}" if len(nomes) > 5 else "")
+        logger.warning(f"Falha ao baixar {amostra}: {erro}")
+    
+    fechamentos = pd.concat(quadros, axis=1).sort_index() if quadros else pd.DataFrame()
+    contagem = pd.Series(status, dtype=object).value_counts().to_dict()
+    logger.info(f"Preços: {len(lotes)} lote(s), {len(tickers)} tickers {contagem}")
+    return fechamentos, {t: status[t] for t in tickers}
+
+def atualizar_armazem(tickers, janela_dias=365, baixar=baixar_fechamentos_yahoo):
+    """
+    Atualiza o armazém de forma incremental e devolve a janela pedida, lida do disco.
+    
+    Só baixa barras a partir do último fechamento gravado (reescrevendo o último dia,
+    que pode ter sido capturado no meio do pregão). Tickers novos recebem a janela toda.
+    O download é feito em lotes (`baixar_em_lotes`) e o que chegar é gravado mesmo que
+    outros lotes falhem; tickers com falha são servidos do disco. Também devolve o
+    status do download de cada ticker (STATUS_*).
+    """
+    hoje = datetime.now().date()
+    inicio_janela = hoje - timedelta(days=janela_dias)
+    
+    conn = conectar_armazem()
+    try:
+        ultimas = ultimas_datas_armazenadas(conn, tickers)
+        
+        # Um download por data de início (em regra: um para o delta, outro para novos)
+        grupos = {}
+        for t in tickers:
+            grupos.setdefault(ultimas.get(t, inicio_janela), []).append(t)
+        
+        status = {}
+        limitador = LimitadorTaxa(LOTES_POR_SEGUNDO, rajada=LOTES_SIMULTANEOS)
+        for inicio_delta, grupo in grupos.items():
+            fechamentos, status_grupo = baixar_em_lotes(grupo, inicio_delta, baixar, limitador=limitador)
+            status.update(status_grupo)
+            if not fechamentos.empty:
+                gravadas = gravar_precos(conn, fechamentos)
+                logger.info(f"Armazém: {gravadas} barras gravadas desde {inicio_delta}")
+        return ler_precos(conn, tickers, inicio_janela), status
+    finally:
+        conn.close()
+
+def carregar_historico_precos(atualizar=True, janela_dias=365):
+    """
+    Fechamentos diários (ajustados) do último ano, uma coluna por ativo de TICKERS_MAP.
+    Com `atualizar=False` lê apenas o armazém local. Devolve (historico, online).
+    """
+    try:
+        if atualizar:
+            data, status = atualizar_armazem(TICKERS_YAHOO, janela_dias)
+            falhas = [t for t, s in status.items() if s == STATUS_ERRO]
+        else:
+            conn = conectar_armazem()
+            try:
+                data, falhas = ler_precos(conn, TICKERS_YAHOO, 
+                                          datetime.now().date() - timedelta(days=janela_dias)), TICKERS_YAHOO
+            finally:
+                conn.close()
+        nomes = {ticker: nome for nome, ticker in TICKERS_MAP.items()}
+        historico = data[[t for t in TICKERS_YAHOO if t in data.columns]].rename(columns=nomes)
+        return historico, not falhas
+    except Exception as e:
+        logger.warning(f"Erro no armazém de preços: {e}")
+        return pd.DataFrame(), False
+
+def carregar_historico_backtest(anos=15, atualizar=False, baixar=baixar_fechamentos_yahoo):
+    """
+    Fechamentos diários dos últimos `anos` para o backtest (colunas = nomes de ATIVOS).
+    
+    A atualização incremental só traz o último ano; com `atualizar=True` a janela
+    inteira é baixada de uma vez e gravada no armazém. Sem isso, lê apenas o disco.
+    """
+    inicio = datetime.now().date() - timedelta(days=int(anos * 365.25))
+    conn = conectar_armazem()
+    try:
+        if atualizar:
+            # Lotes que falharem ficam com o que já houver no armazém local
+            fechamentos, _ = baixar_em_lotes(TICKERS_YAHOO, inicio, baixar)
+            if not fechamentos.empty:
+                gravadas = gravar_precos(conn, fechamentos)
+                logger.info(f"Armazém: {gravadas} barras gravadas para o backtest desde {inicio}")
+        data = ler_precos(conn, TICKERS_YAHOO, inicio)
+    finally:
+        conn.close()
+    nomes = {ticker: nome for nome, ticker in TICKERS_MAP.items()}
+    return data[[t for t in TICKERS_YAHOO if t in data.columns]].rename(columns=nomes)
+
+def calcular_retornos_live(historico):
+    """
+    Retorno anualizado (%) da tendência log-linear da janela, por ativo. Ao contrário
+    da razão entre o primeiro e o último fechamento, uma ponta fora da curva pesa
+    como qualquer outro pregão.
+    """
+    dados_live = retorno_tendencia(historico)
+    logger.info(f"✓ Obtidos {len(dados_live)} retornos live")
+    return dados_live
+
+# --- ESTATÍSTICAS EM JANELAS MÓVEIS (INCREMENTAIS SOBRE O ARMAZÉM) ---
+_MOTOR_ESTATISTICAS = EstatisticasRolantes([nome for nome, t in TICKERS_MAP.items() if t in TICKERS_YAHOO])
+_LOCK_ESTATISTICAS = threading.Lock()
+
+def atualizar_estatisticas(motor=None):
+    """
+    Resumo das estatísticas em janelas móveis (sioei.estatisticas) dos ativos com
+    preços no armazém. O motor vive no processo: a primeira chamada lê os pregões
+    da maior janela e as seguintes só as barras a partir da última já vista.
+    """
+    motor = motor or _MOTOR_ESTATISTICAS
+    dias = int(max(JANELAS.values()) / DIAS_UTEIS_ANO * 365.25) + 15
+    with _LOCK_ESTATISTICAS:
+        inicio = motor.ultima_data.date() if motor.ultima_data else datetime.now().date() - timedelta(days=dias)
+        conn = conectar_armazem()
+        try:
+            data = ler_precos(conn, TICKERS_YAHOO, inicio)
+        finally:
+            conn.close()
+        nomes = {ticker: nome for nome, ticker in TICKERS_MAP.items()}
+        novos = motor.adicionar(data.rename(columns=nomes))
+        if novos:
+            logger.info(f"Estatísticas: {novos} pregão(ões) novo(s) até {motor.ultima_data:%Y-%m-%d}")
+        return motor.resumo()
+
+# --- PRÉ-CARGA EM SEGUNDO PLANO (STALE-WHILE-REVALIDATE) ---
+TTL_DADOS_MERCADO = 43200       # Idade máxima de um snapshot antes de revalidar (12h)
+INTERVALO_RETENTATIVA = 300     # Espera mínima entre tentativas após falha de rede
+
+def montar_snapshot(atualizar=True):
+    """Snapshot imutável de mercado: macro (BCB), histórico de preços, retornos live e estatísticas"""
+    origem = "rede" if atualizar else "disco"
+    with REGISTRO.etapa(f"dados.bcb[{origem}]"):
+        macro = carregar_dados_bcb(atualizar)
+    with REGISTRO.etapa(f"dados.precos[{origem}]"):
+        historico, mercado_online = carregar_historico_precos(atualizar)
+    live = calcular_retornos_live(historico)
+    try:
+        with REGISTRO.etapa("dados.estatisticas"):
+            estatisticas = atualizar_estatisticas()
+    except Exception as e:
+        logger.warning(f"Erro nas estatísticas de mercado: {e}")
+        estatisticas = {'data': None, 'janelas': {}, 'correlacoes': {}}
+    
+    assinatura = repr((
+        macro['selic'], macro['ipca'], macro['status'], sorted(live.items()),
+        historico.shape, str(historico.index.max()) if len(historico) else None, estatisticas['data']
+    ))
+    return {
+        'macro': macro,
+        'historico': historico,
+        'live': live,
+        'estatisticas': estatisticas,
+        'versao': hashlib.sha1(assinatura.encode()).hexdigest()[:12],
+        'atualizado_em': datetime.now(),
+        'completo': atualizar and macro['online'] and mercado_online
+    }
+
+class MonitorMercado:
+    """
+    Guarda o último snapshot de mercado e o revalida fora da execução da página.
+    
+    Na criação carrega o que houver em disco (instantâneo) e já dispara a busca na
+    rede em uma thread; a página nunca espera pelas APIs externas.
+    """
+    
+    def __init__(self, ttl=TTL_DADOS_MERCADO):
+        self.ttl = ttl
+        self.snapshot = montar_snapshot(atualizar=False)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._ultima_tentativa = None
+        self.revalidar()
+    
+    @property
+    def atualizando(self):
+        return self._thread is not None and self._thread.is_alive()
+    
+    def desatualizado(self):
+        """True se o snapshot veio só do disco, de uma busca com falhas ou passou do TTL"""
+        idade = (datetime.now() - self.snapshot['atualizado_em']).total_seconds()
+        return not self.snapshot['completo'] or idade > self.ttl
+    
+    def revalidar(self, forcar=False):
+        """Dispara a atualização em segundo plano, se necessária; nunca bloqueia"""
+        with self._lock:
+            if self.atualizando:
+                return False
+            if not forcar:
+                if not self.desatualizado():
+                    return False
+                if (self._ultima_tentativa is not None and 
+                        (datetime.now() - self._ultima_tentativa).total_seconds() < INTERVALO_RETENTATIVA):
+                    return False
+            self._ultima_tentativa = datetime.now()
+            self._thread = threading.Thread(target=self._atualizar, name="sioei-prefetch", daemon=True)
+            self._thread.start()
+            return True
+    
+    def _atualizar(self):
+        try:
+            self.snapshot = montar_snapshot(atualizar=True)
+            logger.info(f"Snapshot de mercado atualizado (versão {self.snapshot['versao']})")
+        except Exception as e:
+            logger.warning(f"Erro ao atualizar snapshot de mercado: {e}")
+    
+    def snapshot_atual(self):
+        """Último snapshot conhecido (dispara revalidação se estiver velho)"""
+        self.revalidar()
+        return self.snapshot
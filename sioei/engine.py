@@ -0,0 +1,574 @@
+"""
+Motor matemático do SIOEI: projeções determinísticas (forma fechada), avaliação
+em lote de carteiras e simulação de Monte Carlo.
+
+Só depende de NumPy; o cenário de mercado chega via `universo` (sioei.universe).
+"""
+
+import numpy as np
+
+from sioei.cache import CacheLRU
+from sioei.metricas import REGISTRO
+from sioei.universe import universo_padrao
+
+# ==============================================================================
+# PROJEÇÃO DETERMINÍSTICA
+# ==============================================================================
+def fator_anuidade(fator, n):
+    """
+    Soma da série geométrica 1 + g + g² + ... + g^(n-1), ou seja, quanto vale
+    ao final de n meses um aporte unitário feito todo mês (forma fechada).
+    """
+    fator = np.asarray(fator, dtype=float)
+    n = np.asarray(n, dtype=float)
+    quase_um = np.abs(fator - 1) < 1e-12
+    divisor = np.where(quase_um, 1.0, fator - 1)
+    return np.where(quase_um, n, (fator ** n - 1) / divisor)
+
+def saldo_no_mes(fatores, v_inicial, aporte, renda, mes_troca, k):
+    """
+    Saldo no mês k de saldo[m+1] = saldo[m] * g + fluxo[m], com saldo[0] = v_inicial.
+    
+    O fluxo vale `aporte` até `mes_troca` e `aporte - renda` a partir dele.
+    Forma fechada da anuidade em cada fase; todos os argumentos fazem broadcast.
+    """
+    # Fase de acumulação: para k > mes_troca congela no saldo de mes_troca
+    k1 = np.minimum(k, mes_troca)
+    acumulado = v_inicial * fatores ** k1 + aporte * fator_anuidade(fatores, k1)
+    
+    # Fase de retirada: k2 = meses decorridos após mes_troca (0 antes dele)
+    k2 = k - k1
+    return acumulado * fatores ** k2 + (aporte - renda) * fator_anuidade(fatores, k2)
+
+def evoluir_saldos(fatores, v_inicial, aporte, renda, mes_troca, meses):
+    """
+    Evolução mês a mês (ver `saldo_no_mes`) para cada fator g, sem laço.
+    Retorna um array (len(fatores), meses + 1).
+    """
+    g = np.asarray(fatores, dtype=float)[..., np.newaxis]
+    return saldo_no_mes(g, v_inicial, aporte, renda, mes_troca, np.arange(meses + 1))
+
+def evoluir_por_ativo(fatores, pesos, v_inicial, aporte, renda, mes_troca, meses, rebalancear_meses=0):
+    """
+    Saldo de cada ativo mês a mês, shape (..., meses + 1, ativos), para `fatores`
+    mensais (..., ativos) e `pesos` alvo (frações que somam 1).
+    
+    Aportes e retiradas entram pelos pesos alvo. Sem rebalanceamento cada ativo
+    segue sozinho a forma fechada de `saldo_no_mes` (a alocação deriva). Com
+    `rebalancear_meses` = R, o total volta aos pesos alvo a cada R meses: o total
+    nesses pontos segue V[s+1] = A·V[s] + c[s] e também sai em forma fechada.
+    Potências e anuidades vêm de uma tabela por ativo (um único `**`), indexada depois.
+    """
+    g = np.asarray(fatores, dtype=float)[..., np.newaxis, :]
+    w = np.asarray(pesos, dtype=float)
+    k = np.arange(meses + 1)
+    potencias = g ** k[:, np.newaxis]
+    quase_um = np.abs(g - 1) < 1e-12
+    anuidades = np.where(quase_um, k[:, np.newaxis], (potencias - 1) / np.where(quase_um, 1.0, g - 1))
+    
+    def saldo(inicial, troca, decorridos):
+        # saldo_no_mes com as potências tabeladas; `inicial` já é o total a distribuir
+        k1 = np.minimum(decorridos, troca)
+        k2 = decorridos - k1
+        acumulado = w * (inicial * potencias[..., k1, :] + aporte * anuidades[..., k1, :])
+        return acumulado * potencias[..., k2, :] + w * (aporte - renda) * anuidades[..., k2, :]
+    
+    if not rebalancear_meses:
+        return saldo(v_inicial, np.full(k.shape, mes_troca), k)
+    
+    # Segmentos entre rebalanceamentos: o mês m pertence ao último ponto < m
+    pontos = np.arange(0, max(meses, 1), rebalancear_meses)
+    segmento = np.maximum(np.searchsorted(pontos, k, side='left') - 1, 0)
+    
+    # Total em cada ponto: A = crescimento de uma unidade rebalanceada, c = efeito dos fluxos
+    r = min(rebalancear_meses, meses)
+    a = (w * potencias[..., [r], :]).sum(axis=-1)
+    c = saldo(0.0, np.maximum(mes_troca - pontos[:-1], 0), np.full(len(pontos) - 1, r)).sum(axis=-1)
+    s = np.arange(len(pontos))
+    acumulado = np.cumsum(c * a ** -s[1:].astype(float), axis=-1)
+    total_pontos = a ** s * (v_inicial + np.concatenate([np.zeros_like(a), acumulado], axis=-1))
+    
+    inicio = pontos[segmento]
+    return saldo(total_pontos[..., segmento, np.newaxis], np.maximum(mes_troca - inicio, 0), k - inicio)
+
+def calcular(pesos_dict, v_inicial, v_mensal, anos, renda_desejada=0, 
+             anos_inicio_retirada=99, usar_retirada=False, universo=None, rebalancear_meses=None):
+    """
+    Calcula a evolução patrimonial considerando aportes e possíveis retiradas.
+    Sem `universo`, usa o cenário padrão (sioei.universe.universo_padrao).
+    
+    Com `rebalancear_meses=None` a carteira rende a taxa média ponderada dos ativos.
+    Com um número de meses (0 = nunca rebalancear), cada ativo rende a própria taxa
+    (ver `evoluir_por_ativo`) e o resultado traz 'y_ativos_nom'/'y_ativos_real'
+    (meses + 1, ativos), na ordem de 'ativos', mais os fatores reais e pesos usados
+    ('fatores_reais_ativos'/'pesos_ativos', para `resolver_fire`).
+    """
+    universo = universo or universo_padrao()
+    inflacao_aa = universo.ipca
+    cdi_aa = universo.cdi
+    taxa_poupanca = universo.poupanca
+    
+    total = sum(pesos_dict.values())
+    usar_poupanca = False
+    ativos_usados = [] 
+    
+    retorno_bruto_ponderado = 0
+    custo_ponderado = 0
+    risco_pond = 0
+
+    if total == 0:
+        # Modo poupança quando carteira está vazia
+        usar_poupanca = True
+        total = 1
+        retorno_bruto_ponderado = taxa_poupanca
+        custo_ponderado = 0
+        risco_pond = 0.5
+        ativos_usados = [{
+            'nome': 'Dinheiro Parado (Poupança)', 
+            'peso': 100, 
+            'cor': '#757575', 
+            'desc': 'DINHEIRO PARADO! Perdendo valor para inflação.', 
+            'mercado': '⚠️ Alerta', 
+            'retorno_real': taxa_poupanca, 
+            'tipo': 'RF'
+        }]
+    else:
+        # Cálculo da carteira real: produtos escalares sobre as colunas de universo.tabela
+        tabela = universo.tabela
+        nomes_usados = [nome for nome, peso in pesos_dict.items() if peso > 0]
+        idx_usados = [tabela.indice[nome] for nome in nomes_usados]
+        fracoes = np.array([pesos_dict[nome] for nome in nomes_usados], dtype=float) / total
+        retorno_bruto_ponderado, custo_ponderado, risco_pond = (tabela.metricas[:, idx_usados] @ fracoes).tolist()
+        for nome, peso_real in zip(nomes_usados, fracoes.tolist()):
+            info = universo.ativos[nome]
+            ativos_usados.append({
+                'nome': nome, 
+                'peso': peso_real * 100, 
+                'cor': info['cor'], 
+                'desc': info['desc'], 
+                'mercado': info['mercado'], 
+                'retorno_real': info['retorno'], 
+                'tipo': info['tipo']
+            })
+    
+    retorno_liquido_aa = retorno_bruto_ponderado - custo_ponderado
+    
+    meses = anos * 12
+    mes_inicio_retirada = anos_inicio_retirada * 12
+    
+    # Taxas mensais
+    tx_cart_bruto = (1 + retorno_bruto_ponderado/100)**(1/12) - 1 
+    tx_cart = (1 + retorno_liquido_aa/100)**(1/12) - 1            
+    tx_cdi = (1 + cdi_aa/100)**(1/12) - 1
+    tx_poup = (1 + taxa_poupanca/100)**(1/12) - 1
+    tx_inf = (1 + inflacao_aa/100)**(1/12) - 1
+    
+    # Fatores de crescimento mensal das 7 séries (nominais e reais)
+    fatores = np.array([
+        1 + tx_cart,                    # y_cart_nom
+        (1 + tx_cart) / (1 + tx_inf),   # y_cart_real
+        1 + tx_cart_bruto,              # y_cart_bruto
+        1 + tx_cdi,                     # y_cdi_nom
+        (1 + tx_cdi) / (1 + tx_inf),    # y_cdi_real
+        1 + tx_poup,                    # y_poup_nom
+        (1 + tx_poup) / (1 + tx_inf),   # y_poup_real
+    ])
+    
+    # Mês em que o fluxo passa de aporte para (aporte - retirada)
+    mes_troca = min(mes_inicio_retirada, meses) if usar_retirada else meses
+    renda = renda_desejada if usar_retirada else 0
+    
+    y_cart_nom, y_cart_real, y_cart_bruto, y_cdi_nom, y_cdi_real, y_poup_nom, y_poup_real = \
+        evoluir_saldos(fatores, v_inicial, v_mensal, renda, mes_troca, meses)
+    
+    # Modo por ativo: as séries da carteira passam a ser a soma dos saldos de cada ativo
+    por_ativo = {}
+    if rebalancear_meses is not None and not usar_poupanca:
+        ret_ativos = tabela.retorno[idx_usados]
+        taxa_ativos = tabela.taxa[idx_usados]
+        tx_bruto = (1 + ret_ativos/100)**(1/12) - 1
+        tx_liquido = (1 + (ret_ativos - taxa_ativos)/100)**(1/12) - 1
+        fatores_ativos = np.stack([1 + tx_bruto, 1 + tx_liquido, (1 + tx_liquido) / (1 + tx_inf)])
+        bruto_a, nom_a, real_a = evoluir_por_ativo(
+            fatores_ativos, fracoes,
+            v_inicial, v_mensal, renda, mes_troca, meses, rebalancear_meses
+        )
+        y_cart_bruto, y_cart_nom, y_cart_real = bruto_a.sum(axis=1), nom_a.sum(axis=1), real_a.sum(axis=1)
+        por_ativo = {'y_ativos_nom': nom_a, 'y_ativos_real': real_a,
+                     'fatores_reais_ativos': fatores_ativos[2], 'pesos_ativos': fracoes}
+    
+    # Contabilizar apenas aportes (não retiradas)
+    investido = v_inicial + v_mensal * mes_troca
+    
+    # Cálculo da renda passiva sustentável
+    taxa_real_mensal = (1 + tx_cart) / (1 + tx_inf) - 1
+    if taxa_real_mensal <= 0: 
+        taxa_real_mensal = 0.0001
+    
+    renda_passiva_possivel = y_cart_real[-1] * taxa_real_mensal
+    
+    return {
+        'x': np.arange(meses + 1),
+        'y_cart_nom': y_cart_nom, 
+        'y_cart_real': y_cart_real, 
+        'y_cart_bruto': y_cart_bruto,
+        'y_cdi_nom': y_cdi_nom, 
+        'y_cdi_real': y_cdi_real,
+        'y_poup_nom': y_poup_nom, 
+        'y_poup_real': y_poup_real,
+        'final_nom': y_cart_nom[-1], 
+        'final_real': y_cart_real[-1], 
+        'investido': investido, 
+        'retorno_aa': retorno_liquido_aa, 
+        'risco': risco_pond, 
+        'ativos': ativos_usados, 
+        'is_poup': usar_poupanca,
+        'taxa_real_mensal': taxa_real_mensal, 
+        'fator_real_mensal': fatores[1],
+        'renda_passiva_possivel': renda_passiva_possivel,
+        'rebalancear_meses': rebalancear_meses,
+        **por_ativo
+    }
+
+def montar_matriz_pesos(lista_pesos, universo=None):
+    """Converte uma lista de pesos_dict em matriz (carteiras x ativos) na ordem de ATIVOS"""
+    return (universo or universo_padrao()).tabela.matriz_pesos(lista_pesos)
+
+def avaliar_carteiras(matriz_pesos, v_inicial, v_mensal, anos, renda_desejada=0,
+                      anos_inicio_retirada=99, usar_retirada=False, universo=None):
+    """
+    Versão em lote de `calcular`: avalia várias carteiras de uma só vez.
+    
+    `matriz_pesos` tem uma linha por carteira e uma coluna por ativo (ordem de ATIVOS).
+    Os demais parâmetros podem ser escalares ou arrays com um valor por carteira.
+    Retorna arrays com um valor por carteira (saldos finais, retorno, risco, renda).
+    """
+    universo = universo or universo_padrao()
+    matriz_pesos = np.atleast_2d(np.asarray(matriz_pesos, dtype=float))
+    tabela = universo.tabela
+    
+    total = matriz_pesos.sum(axis=1)
+    vazia = total == 0
+    fracoes = matriz_pesos / np.where(vazia, 1, total)[:, np.newaxis]
+    
+    # Carteira vazia cai no modo poupança, como em `calcular`
+    retorno_bruto = np.where(vazia, universo.poupanca, fracoes @ tabela.retorno)
+    custo = np.where(vazia, 0, fracoes @ tabela.taxa)
+    risco = np.where(vazia, 0.5, fracoes @ tabela.risco)
+    retorno_liquido_aa = retorno_bruto - custo
+    
+    meses = np.asarray(anos) * 12
+    tx_cart = (1 + retorno_liquido_aa/100)**(1/12) - 1
+    tx_inf = (1 + universo.ipca/100)**(1/12) - 1
+    fator_nom = 1 + tx_cart
+    fator_real = (1 + tx_cart) / (1 + tx_inf)
+    
+    # Só o saldo final interessa: avalia a forma fechada direto em k = meses
+    mes_troca = np.where(usar_retirada, np.minimum(np.asarray(anos_inicio_retirada) * 12, meses), meses)
+    renda = np.where(usar_retirada, renda_desejada, 0)
+    final_nom = saldo_no_mes(fator_nom, v_inicial, v_mensal, renda, mes_troca, meses)
+    final_real = saldo_no_mes(fator_real, v_inicial, v_mensal, renda, mes_troca, meses)
+    
+    taxa_real_mensal = fator_real - 1
+    taxa_real_mensal = np.where(taxa_real_mensal <= 0, 0.0001, taxa_real_mensal)
+    
+    return {
+        'final_nom': final_nom,
+        'final_real': final_real,
+        'investido': v_inicial + v_mensal * mes_troca,
+        'retorno_aa': retorno_liquido_aa,
+        'risco': risco,
+        'taxa_real_mensal': taxa_real_mensal,
+        'renda_passiva_possivel': final_real * taxa_real_mensal
+    }
+
+# ==============================================================================
+# METAS DE APOSENTADORIA (FIRE)
+# ==============================================================================
+MAX_MESES_META = 100 * 12  # Além disso a meta conta como inatingível
+
+def meses_ate_saldo(fator, saldo_inicial, fluxo, alvo):
+    """
+    Primeiro mês k ≥ 0 em que saldo[k] = saldo_inicial * g^k + fluxo * (1 + g + ... + g^(k-1))
+    alcança `alvo` (vindo de cima ou de baixo); None se nunca ou após MAX_MESES_META.
+    
+    O caminho é monótono (as diferenças mensais se multiplicam por g), então basta
+    inverter a forma fechada: g^k (saldo_inicial + c) = alvo + c, com c = fluxo / (g - 1).
+    """
+    if saldo_inicial == alvo:
+        return 0
+    subindo = saldo_inicial < alvo
+    if abs(fator - 1) < 1e-12:
+        k = (alvo - saldo_inicial) / fluxo if fluxo != 0 else -1.0
+    else:
+        c = fluxo / (fator - 1)
+        razao = (alvo + c) / (saldo_inicial + c) if saldo_inicial + c != 0 else -1.0
+        k = np.log(razao) / np.log(fator) if razao > 0 else -1.0
+    if not np.isfinite(k) or k < 0 or k > MAX_MESES_META:
+        return None
+    
+    # ceil da solução contínua, conferido na forma fechada (arredondamento de ponto flutuante)
+    k = int(np.ceil(k - 1e-9))
+    alcancou = lambda m: (saldo_no_mes(fator, saldo_inicial, fluxo, 0, m, m) >= alvo) == subindo
+    if k > 0 and alcancou(k - 1):
+        k -= 1
+    elif not alcancou(k):
+        k += 1
+    return k if k <= MAX_MESES_META else None
+
+def _primeiro_mes(alcancou, inicio=0):
+    """Primeiro índice ≥ `inicio` em que a máscara `alcancou` é verdadeira (None se nenhum)"""
+    k = inicio + int(np.argmax(alcancou[inicio:]))
+    return k if alcancou[k] else None
+
+def _resolver_fire_por_ativo(d, v_inicial, v_mensal, meses, renda_desejada, mes_troca, meta):
+    """
+    `resolver_fire` no modo por ativo: mesmas saídas, sobre o saldo real somado de
+    `evoluir_por_ativo` (deriva ou rebalanceamento), em vez da taxa média.
+    O saldo é linear em (inicial, aporte, renda), então o aporte sai de duas evoluções;
+    os meses vêm de uma busca na série mensal até MAX_MESES_META.
+    """
+    g, w, r = d['fatores_reais_ativos'], d['pesos_ativos'], d['rebalancear_meses']
+    total = lambda inicial, aporte, renda, troca, n: \
+        evoluir_por_ativo(g, w, inicial, aporte, renda, troca, n, r).sum(axis=-1)
+    
+    k1 = min(mes_troca, meses)
+    sem_aporte = total(v_inicial, 0, renda_desejada, k1, meses)[-1]
+    por_aporte = total(0, 1, 0, k1, meses)[-1]
+    aporte_necessario = max(0.0, float((meta - sem_aporte) / por_aporte))
+    
+    if v_inicial >= meta:
+        meses_ate_meta = 0
+    else:
+        meses_ate_meta = _primeiro_mes(total(v_inicial, v_mensal, 0, MAX_MESES_META, MAX_MESES_META) >= meta)
+    
+    saldos = total(v_inicial, v_mensal, renda_desejada, mes_troca, mes_troca + MAX_MESES_META)
+    mes_esgotamento = _primeiro_mes(saldos < 0, mes_troca)
+    
+    return {
+        'patrimonio_necessario': meta,
+        'aporte_necessario': aporte_necessario,
+        'meses_ate_meta': meses_ate_meta,
+        'mes_esgotamento': mes_esgotamento
+    }
+
+def resolver_fire(d, v_inicial, v_mensal, anos, renda_desejada, anos_inicio_retirada):
+    """
+    Plano de aposentadoria direto, sem tentativa e erro nos sliders, a partir de `calcular`
+    (valores reais, mesma meta da análise de viabilidade: renda / taxa_real_mensal):
+    
+    - aporte_necessario: aporte mensal para o saldo real final (com as retiradas
+      escolhidas) atingir a meta no prazo; o saldo é linear no aporte
+    - meses_ate_meta: meses acumulando com o aporte atual até atingir a meta
+    - mes_esgotamento: primeiro mês em que o saldo real fica negativo com a retirada
+      escolhida (None se nunca fica)
+    
+    Se `d` veio do modo por ativo, resolve sobre `evoluir_por_ativo` com o mesmo modo.
+    """
+    g = d['fator_real_mensal']
+    meses = anos * 12
+    mes_troca = anos_inicio_retirada * 12
+    meta = renda_desejada / d['taxa_real_mensal'] if renda_desejada > 0 else 0.0
+    
+    if 'fatores_reais_ativos' in d:
+        return _resolver_fire_por_ativo(d, v_inicial, v_mensal, meses, renda_desejada, mes_troca, meta)
+    
+    # saldo_final = (saldo sem aportes) + aporte * fator_anuidade(g, meses)
+    k1 = min(mes_troca, meses)
+    sem_aporte = saldo_no_mes(g, v_inicial, 0, renda_desejada, k1, meses)
+    aporte_necessario = max(0.0, float((meta - sem_aporte) / fator_anuidade(g, meses)))
+    
+    meses_ate_meta = 0 if v_inicial >= meta else meses_ate_saldo(g, v_inicial, v_mensal, meta)
+    
+    saldo_na_troca = saldo_no_mes(g, v_inicial, v_mensal, 0, mes_troca, mes_troca)
+    fluxo_retirada = v_mensal - renda_desejada
+    if saldo_na_troca <= 0:
+        # Nada acumulado: fica negativo na primeira retirada que supera o aporte
+        mes_esgotamento = mes_troca + 1 if fluxo_retirada < 0 else None
+    else:
+        apos_troca = meses_ate_saldo(g, saldo_na_troca, fluxo_retirada, 0.0)
+        mes_esgotamento = None if apos_troca is None else mes_troca + apos_troca
+    
+    return {
+        'patrimonio_necessario': meta,
+        'aporte_necessario': aporte_necessario,
+        'meses_ate_meta': meses_ate_meta,
+        'mes_esgotamento': mes_esgotamento
+    }
+
+# ==============================================================================
+# SENSIBILIDADE (GRADE PRAZO x APORTE)
+# ==============================================================================
+def grade_sensibilidade(pesos_dict, v_inicial, anos_grade, aportes_grade, renda_desejada=0,
+                        anos_inicio_retirada=99, usar_retirada=False, universo=None):
+    """
+    Avalia uma carteira em todos os pares (prazo, aporte mensal) de uma só vez:
+    `avaliar_carteiras` com prazos nas linhas e aportes nas colunas (broadcast).
+    
+    Retorna matrizes (len(anos_grade), len(aportes_grade)):
+    - final_real: saldo final real
+    - pct_cdi: lucro nominal como % do lucro do CDI (mesma regra do dashboard)
+    - cobertura_renda: renda passiva possível como % da desejada, entre 0 e 100
+      (NaN sem retirada ou sem renda desejada)
+    """
+    universo = universo or universo_padrao()
+    anos = np.asarray(anos_grade)[:, np.newaxis]
+    aportes = np.asarray(aportes_grade, dtype=float)[np.newaxis, :]
+    r = avaliar_carteiras(montar_matriz_pesos([pesos_dict], universo), v_inicial, aportes, anos,
+                          renda_desejada, anos_inicio_retirada, usar_retirada, universo=universo)
+    
+    # CDI com os mesmos fluxos da carteira
+    meses = anos * 12
+    mes_troca = np.minimum(anos_inicio_retirada * 12, meses) if usar_retirada else meses
+    renda = renda_desejada if usar_retirada else 0
+    fator_cdi = (1 + universo.cdi/100)**(1/12)
+    cdi_nom = saldo_no_mes(fator_cdi, v_inicial, aportes, renda, mes_troca, meses)
+    
+    lucro = r['final_nom'] - r['investido']
+    lucro_cdi = cdi_nom - r['investido']
+    pct_cdi = np.where((lucro > 0) & (lucro_cdi <= 0), lucro / 0.01,
+                       lucro / np.maximum(np.abs(lucro_cdi), 0.01)) * 100
+    
+    if usar_retirada and renda_desejada > 0:
+        cobertura = np.clip(r['renda_passiva_possivel'] / renda_desejada * 100, 0, 100)
+    else:
+        cobertura = np.full(lucro.shape, np.nan)
+    
+    return {
+        'anos': np.asarray(anos_grade),
+        'aportes': np.asarray(aportes_grade, dtype=float),
+        'final_real': r['final_real'],
+        'pct_cdi': pct_cdi,
+        'cobertura_renda': cobertura
+    }
+
+# ==============================================================================
+# PROJEÇÃO CACHEADA (COMPARTILHADA ENTRE SESSÕES)
+# ==============================================================================
+CACHE_CALCULOS = CacheLRU(tamanho_max=512)
+REGISTRO.registrar_cache('calculos', CACHE_CALCULOS)
+CASAS_PESO = 10  # Pesos viram frações arredondadas: 50/50 e 1/1 são a mesma carteira
+
+def normalizar_pesos(pesos_dict):
+    """Pesos positivos como frações arredondadas, em ordem de nome (tupla de pares)"""
+    total = sum(pesos_dict.values())
+    if total <= 0:
+        return ()
+    return tuple(sorted(
+        (nome, round(peso / total, CASAS_PESO)) for nome, peso in pesos_dict.items() if peso > 0
+    ))
+
+def normalizar_entrada(pesos_dict, v_inicial, v_mensal, anos, renda_desejada=0,
+                       anos_inicio_retirada=99, usar_retirada=False, rebalancear_meses=None):
+    """
+    Forma canônica dos argumentos de `calcular`: pesos normalizados
+    (`normalizar_pesos`), dinheiro em centavos e parâmetros de retirada
+    irrelevantes zerados, mais o modo de projeção (`rebalancear_meses`).
+    Entradas que dão a mesma projeção dão a mesma tupla.
+    """
+    pesos = normalizar_pesos(pesos_dict)
+    anos = int(anos)
+    if usar_retirada:
+        retirada = (round(float(renda_desejada), 2), min(int(anos_inicio_retirada), anos), True)
+    else:
+        retirada = (0.0, anos, False)
+    return (pesos, round(float(v_inicial), 2), round(float(v_mensal), 2), anos) + retirada + (rebalancear_meses,)
+
+def calcular_cacheado(pesos_dict, v_inicial, v_mensal, anos, renda_desejada=0,
+                      anos_inicio_retirada=99, usar_retirada=False, universo=None, versao_dados=None,
+                      rebalancear_meses=None):
+    """
+    `calcular` com memoização em CACHE_CALCULOS, chaveada pela entrada normalizada
+    e pela versão dos dados (`versao_dados`, por padrão `universo.versao`).
+    
+    O resultado é compartilhado entre sessões: os arrays voltam somente leitura.
+    Sem versão não há como identificar o cenário e o cálculo não é cacheado.
+    """
+    universo = universo or universo_padrao()
+    versao_dados = versao_dados or universo.versao
+    if not versao_dados:
+        return calcular(pesos_dict, v_inicial, v_mensal, anos, renda_desejada,
+                        anos_inicio_retirada, usar_retirada, universo=universo,
+                        rebalancear_meses=rebalancear_meses)
+    
+    entrada = normalizar_entrada(pesos_dict, v_inicial, v_mensal, anos, renda_desejada,
+                                 anos_inicio_retirada, usar_retirada, rebalancear_meses)
+    
+    def calcular_normalizado():
+        pesos, v_ini, v_mes, n_anos, renda, anos_ret, retirada, rebalancear = entrada
+        d = calcular(dict(pesos), v_ini, v_mes, n_anos, renda, anos_ret, retirada, universo=universo,
+                     rebalancear_meses=rebalancear)
+        for valor in d.values():
+            if isinstance(valor, np.ndarray):
+                valor.setflags(write=False)
+        return d
+    
+    return CACHE_CALCULOS.obter((versao_dados,) + entrada, calcular_normalizado)
+
+# ==============================================================================
+# MODO ESTOCÁSTICO (MONTE CARLO)
+# ==============================================================================
+# Volatilidade anual (%) associada a cada nota de risco de ATIVOS
+VOLATILIDADE_POR_RISCO = {
+    0: 0.0, 1: 0.5, 2: 2.0, 3: 4.0, 4: 8.0, 5: 11.0, 
+    6: 16.0, 7: 22.0, 8: 30.0, 9: 45.0, 10: 70.0
+}
+PERCENTIS_MC = (5, 25, 50, 75, 95)
+
+def volatilidade_por_risco(risco):
+    """Interpola a volatilidade anual (%) para uma nota de risco (inclusive fracionária, ou array)"""
+    notas = list(VOLATILIDADE_POR_RISCO.keys())
+    vol = np.interp(risco, notas, list(VOLATILIDADE_POR_RISCO.values()))
+    return float(vol) if np.ndim(vol) == 0 else vol
+
+def simular_monte_carlo(retorno_aa, risco, v_inicial, v_mensal, anos, renda_desejada=0,
+                        anos_inicio_retirada=99, usar_retirada=False, n_caminhos=10000,
+                        semente=None, tamanho_lote=2500, max_pontos=60, universo=None):
+    """
+    Projeção estocástica: simula `n_caminhos` trajetórias de retornos mensais log-normais
+    com média `retorno_aa` (líquido) e volatilidade derivada da nota de `risco`.
+    
+    Os caminhos são processados em lotes de `tamanho_lote`, e de cada um só se guardam
+    até `max_pontos` + 1 meses amostrados, então a memória não cresce com o prazo.
+    Retorna as faixas P5/P25/P50/P75/P95 do saldo nominal e a probabilidade de superar o CDI.
+    """
+    universo = universo or universo_padrao()
+    meses = anos * 12
+    rng = np.random.default_rng(semente)
+    
+    tx_cart = (1 + retorno_aa/100)**(1/12) - 1
+    sigma = volatilidade_por_risco(risco) / 100 / np.sqrt(12)
+    mu = np.log1p(tx_cart) - sigma**2 / 2
+    
+    mes_troca = min(anos_inicio_retirada * 12, meses) if usar_retirada else meses
+    renda = renda_desejada if usar_retirada else 0
+    fluxos = np.where(np.arange(meses) < mes_troca, v_mensal, v_mensal - renda)
+    
+    tx_cdi = (1 + universo.cdi/100)**(1/12) - 1
+    cdi_final = evoluir_saldos([1 + tx_cdi], v_inicial, v_mensal, renda, mes_troca, meses)[0, -1]
+    
+    pontos = np.unique(np.linspace(0, meses, min(meses, max_pontos) + 1).astype(int))
+    amostras = np.empty((n_caminhos, len(pontos)), dtype=np.float32)
+    supera_cdi = 0
+    
+    for inicio in range(0, n_caminhos, tamanho_lote):
+        n = min(tamanho_lote, n_caminhos - inicio)
+        # Fator acumulado P_k; saldo_k = P_k * (v_inicial + soma_{j<k} fluxo_j / P_{j+1})
+        acumulado = np.exp(np.cumsum(rng.normal(mu, sigma, size=(n, meses)), axis=1))
+        saldos = np.empty((n, meses + 1))
+        saldos[:, 0] = v_inicial
+        saldos[:, 1:] = acumulado * (v_inicial + np.cumsum(fluxos / acumulado, axis=1))
+        
+        amostras[inicio:inicio + n] = saldos[:, pontos]
+        supera_cdi += int(np.count_nonzero(saldos[:, -1] > cdi_final))
+    
+    faixas = np.percentile(amostras, PERCENTIS_MC, axis=0)
+    
+    return {
+        'x': pontos,
+        'percentis': dict(zip(PERCENTIS_MC, faixas)),
+        'prob_supera_cdi': supera_cdi / n_caminhos,
+        'cdi_final': cdi_final,
+        'volatilidade_aa': volatilidade_por_risco(risco),
+        'n_caminhos': n_caminhos
+    }
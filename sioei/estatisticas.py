@@ -0,0 +1,249 @@
+"""
+Estatísticas de risco e retorno dos ativos em janelas móveis de pregões.
+
+Por janela (JANELAS: 3 meses, 1, 3 e 5 anos) e ativo: retorno anualizado pela
+tendência log-linear dos preços (um fechamento fora da curva nas pontas não
+domina o número), volatilidade, desvio de perdas, drawdown máximo e correlações
+par a par. `EstatisticasRolantes` mantém as somas de cada janela e, a cada barra
+nova, soma o pregão que entra e subtrai o que sai, sem refazer a janela inteira.
+"""
+
+import numpy as np
+import pandas as pd
+
+DIAS_UTEIS_ANO = 252
+JANELAS = {'3m': 63, '1a': 252, '3a': 756, '5a': 1260}   # Em pregões (retornos diários)
+ROTULOS_JANELAS = {'3m': '3 meses', '1a': '1 ano', '3a': '3 anos', '5a': '5 anos'}
+METRICAS = ('retorno', 'volatilidade', 'desvio_perdas', 'drawdown_maximo')
+COBERTURA_MINIMA = 0.8          # Fração da janela com retornos para a estatística valer
+LIMITE_PREENCHIMENTO = 5        # Pregões seguidos sem fechamento repetindo o último (feriados)
+RECONSTRUIR_A_CADA = 252        # Pregões incrementais entre recálculos completos (erro de arredondamento)
+
+def preparar_precos(precos):
+    """Só dias úteis, em ordem; fechamentos não positivos viram ausentes"""
+    precos = precos[pd.DatetimeIndex(precos.index).dayofweek < 5].sort_index()
+    return precos.where(precos > 0)
+
+def _tendencia(n, sx, sxx, sy, sxy):
+    """Retorno anualizado (%) pela inclinação de log(preço) ~ pregão, a partir das somas"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inclinacao = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+    return np.expm1(inclinacao * DIAS_UTEIS_ANO) * 100
+
+def retorno_tendencia(precos, min_observacoes=30):
+    """Retorno anualizado (%) da tendência log-linear de cada coluna de `precos` (datas x ativos)"""
+    log = np.log(preparar_precos(precos).ffill(limit=LIMITE_PREENCHIMENTO).to_numpy(float))
+    valido = ~np.isnan(log)
+    x = np.where(valido, np.arange(len(log), dtype=float)[:, None], 0.0)
+    y = np.where(valido, log, 0.0)
+    n = valido.sum(axis=0)
+    retornos = _tendencia(n, x.sum(axis=0), (x * x).sum(axis=0), y.sum(axis=0), (x * y).sum(axis=0))
+    return {nome: float(r) for nome, r, k in zip(precos.columns, retornos, n)
+            if k > min_observacoes and np.isfinite(r)}
+
+class EstatisticasRolantes:
+    """
+    Estatísticas incrementais em janelas móveis sobre fechamentos diários.
+
+    Guarda os log-preços dos últimos max(janelas) + 1 pregões e, por janela, somas
+    de retornos (por ativo e por par de ativos com retorno no mesmo dia) e da
+    regressão do log-preço. `adicionar` aceita barras novas e reescreve o último
+    pregão se ele vier de novo (capturado no meio do pregão).
+    """
+
+    def __init__(self, nomes, janelas=JANELAS, reconstruir_a_cada=RECONSTRUIR_A_CADA):
+        self.nomes = list(nomes)
+        self.janelas = dict(janelas)
+        self.reconstruir_a_cada = reconstruir_a_cada
+        self.datas = []
+        n = len(self.nomes)
+        self._capacidade = max(self.janelas.values()) + 1
+        self._log = np.empty((0, n))
+        self._ret = np.empty((0, n))
+        self._total = 0                     # Pregões já vistos: índice global do próximo
+        self._incrementos = 0
+        self._ultimo = np.full(n, np.nan)   # Estado do preenchimento (último fechamento e idade)
+        self._idade = np.zeros(n)
+        self._antes_ultima = None
+        self._somas = {janela: self._somas_vazias() for janela in self.janelas}
+
+    @property
+    def ultima_data(self):
+        return self.datas[-1] if self.datas else None
+
+    def _somas_vazias(self):
+        n = len(self.nomes)
+        return {
+            'N': np.zeros((n, n)), 'S': np.zeros((n, n)), 'Q': np.zeros((n, n)), 'C': np.zeros((n, n)),
+            'perdas': np.zeros(n),
+            'n_log': np.zeros(n), 'x': np.zeros(n), 'xx': np.zeros(n), 'y': np.zeros(n), 'xy': np.zeros(n),
+        }
+
+    # --- SOMAS DAS JANELAS ---
+    def _linhas(self, de, ate):
+        """Log-preços, retornos e índices globais dos pregões [de, ate) guardados"""
+        de = max(de, 0)
+        ate = max(ate, de)
+        base = self._total - len(self._log)
+        return self._log[de - base:ate - base], self._ret[de - base:ate - base], np.arange(de, ate, dtype=float)
+
+    def _somar(self, janela, y, r, x, sinal):
+        """Acumula pregões (log-preços y, retornos r, índices x) com sinal +1 (entra) ou -1 (sai)"""
+        somas = self._somas[janela]
+        sinal = np.asarray(sinal, dtype=float)[:, None]
+
+        m = ~np.isnan(r)
+        M = m.astype(float)
+        R = np.where(m, r, 0.0)
+        Rs = R * sinal
+        somas['N'] += (M * sinal).T @ M
+        somas['S'] += Rs.T @ M    # S[i, j]: soma dos retornos de i nos dias em que j também tem
+        somas['Q'] += (Rs * R).T @ M
+        somas['C'] += Rs.T @ R
+        somas['perdas'] += (sinal * np.minimum(R, 0.0) ** 2).sum(axis=0)
+
+        valido = ~np.isnan(y)
+        xv = np.where(valido, x[:, None], 0.0)
+        Y = np.where(valido, y, 0.0)
+        somas['n_log'] += (sinal * valido).sum(axis=0)
+        somas['x'] += (sinal * xv).sum(axis=0)
+        somas['xx'] += (sinal * xv * xv).sum(axis=0)
+        somas['y'] += (sinal * Y).sum(axis=0)
+        somas['xy'] += (sinal * xv * Y).sum(axis=0)
+
+    def _reconstruir(self, janela):
+        self._somas[janela] = self._somas_vazias()
+        y, r, x = self._linhas(self._total - self.janelas[janela], self._total)
+        self._somar(janela, y, r, x, np.ones(len(x)))
+
+    # --- ENTRADA DE BARRAS ---
+    def _preencher(self, bruto):
+        """Repete o último fechamento por até LIMITE_PREENCHIMENTO pregões sem negociação"""
+        preenchido = np.empty_like(bruto)
+        for i, linha in enumerate(bruto):
+            self._antes_ultima = (self._ultimo, self._idade)
+            valido = ~np.isnan(linha)
+            self._idade = np.where(valido, 0, self._idade + 1)
+            self._ultimo = np.where(valido, linha, self._ultimo)
+            preenchido[i] = np.where(self._idade <= LIMITE_PREENCHIMENTO, self._ultimo, np.nan)
+        return preenchido
+
+    def _retirar_ultima(self):
+        """Tira o último pregão dos buffers (as somas ficam como estão) e o devolve"""
+        retirada = self._linhas(self._total - 1, self._total)
+        self._log, self._ret = self._log[:-1], self._ret[:-1]
+        self._total -= 1
+        self.datas.pop()
+        self._ultimo, self._idade = self._antes_ultima
+        return retirada
+
+    def adicionar(self, precos):
+        """
+        Inclui fechamentos (datas x ativos; colunas fora de `nomes` são ignoradas).
+        Datas anteriores à última vista são descartadas; a última, se vier de novo,
+        é substituída. Devolve quantos pregões entraram.
+        """
+        precos = preparar_precos(precos.reindex(columns=self.nomes))
+        fim_somas = self._total     # As somas cobrem as janelas que terminam aqui
+        retirada = None
+        if self.datas:
+            precos = precos[precos.index >= self.datas[-1]]
+            if len(precos) and precos.index[0] == self.datas[-1]:
+                retirada = self._retirar_ultima()
+        if precos.empty:
+            return 0
+
+        log = self._preencher(np.log(precos.to_numpy(float)))
+        anterior = self._log[-1:] if len(self._log) else np.full((1, len(self.nomes)), np.nan)
+        k = len(log)
+        self._log = np.vstack([self._log, log])
+        self._ret = np.vstack([self._ret, np.diff(np.vstack([anterior, log]), axis=0)])
+        self._total += k
+        self.datas.extend(precos.index)
+
+        self._incrementos += k
+        reconstruir_todas = self._incrementos >= self.reconstruir_a_cada
+        for janela, w in self.janelas.items():
+            if reconstruir_todas or 2 * k >= w:  # Refazer a janela sai mais barato que somar e subtrair
+                self._reconstruir(janela)
+                continue
+            # Uma atualização por janela: entram os pregões novos; saem os que ficaram
+            # para trás e a versão antiga do pregão reescrito
+            blocos = [(self._linhas(self._total - k, self._total), 1.0),
+                      (self._linhas(fim_somas - w, self._total - w), -1.0)]
+            if retirada is not None:
+                blocos.append((retirada, -1.0))
+            y, r, x = (np.concatenate(partes) for partes in zip(*(b for b, _ in blocos)))
+            self._somar(janela, y, r, x, np.concatenate([np.full(len(b[2]), s) for b, s in blocos]))
+        if reconstruir_todas:
+            self._incrementos = 0
+
+        self._log, self._ret = self._log[-self._capacidade:], self._ret[-self._capacidade:]
+        self.datas = self.datas[-self._capacidade:]
+        return k
+
+    # --- RESULTADOS ---
+    def _calcular(self, janela):
+        """METRICAS da janela como arrays por ativo (NaN sem cobertura) e o número de retornos"""
+        w = self.janelas[janela]
+        somas = self._somas[janela]
+        n = np.diag(somas['N']).copy()
+        s = np.diag(somas['S'])
+        q = np.diag(somas['Q'])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variancia = np.maximum(q - s * s / n, 0.0) / (n - 1)
+            volatilidade = np.sqrt(variancia * DIAS_UTEIS_ANO) * 100
+            desvio_perdas = np.sqrt(somas['perdas'] / n * DIAS_UTEIS_ANO) * 100
+        retorno = _tendencia(somas['n_log'], somas['x'], somas['xx'], somas['y'], somas['xy'])
+
+        # Drawdown: queda do pico dentro da janela (w + 1 preços), calculada na hora
+        log = self._log[-(w + 1):]
+        queda = log - np.fmax.accumulate(log, axis=0)
+        drawdown = np.expm1(np.where(np.isnan(queda), 0.0, queda).min(axis=0, initial=0.0)) * 100
+
+        coberto = n >= COBERTURA_MINIMA * w
+        valores = (retorno, volatilidade, desvio_perdas, drawdown)
+        return {m: np.where(coberto, v, np.nan) for m, v in zip(METRICAS, valores)}, n.astype(int)
+
+    def metricas(self, janela):
+        """DataFrame (ativos x METRICAS + observacoes), em % anual; NaN sem cobertura na janela"""
+        valores, n = self._calcular(janela)
+        return pd.DataFrame({**valores, 'observacoes': n}, index=self.nomes)
+
+    def _correlacoes(self, janela):
+        w = self.janelas[janela]
+        somas = self._somas[janela]
+        N, S, Q, C = somas['N'], somas['S'], somas['Q'], somas['C']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = (N * C - S * S.T) / np.sqrt((N * Q - S * S) * (N * Q.T - S.T * S.T))
+        corr[N < COBERTURA_MINIMA * w] = np.nan
+        corr = np.clip(corr, -1.0, 1.0)
+        np.fill_diagonal(corr, np.where(np.diag(N) >= COBERTURA_MINIMA * w, 1.0, np.nan))
+        return corr
+
+    def correlacoes(self, janela):
+        """Correlação dos retornos diários, par a par nos dias em que ambos negociaram"""
+        return pd.DataFrame(self._correlacoes(janela), index=self.nomes, columns=self.nomes)
+
+    def resumo(self):
+        """
+        {'data', 'janelas': {janela: {ativo: {metrica: valor}}}, 'correlacoes': {janela: DataFrame}},
+        só com os ativos cobertos em cada janela
+        """
+        janelas, correlacoes = {}, {}
+        for janela in self.janelas:
+            valores, n = self._calcular(janela)
+            cobertos = np.flatnonzero(np.all([np.isfinite(v) for v in valores.values()], axis=0))
+            nomes = [self.nomes[i] for i in cobertos]
+            janelas[janela] = {
+                nome: {**{m: float(valores[m][i]) for m in METRICAS}, 'observacoes': int(n[i])}
+                for nome, i in zip(nomes, cobertos)
+            }
+            if len(cobertos) > 1:
+                corr = self._correlacoes(janela)[np.ix_(cobertos, cobertos)]
+                correlacoes[janela] = pd.DataFrame(corr, index=nomes, columns=nomes)
+        return {
+            'data': self.ultima_data.strftime('%Y-%m-%d') if self.datas else None,
+            'janelas': janelas,
+            'correlacoes': correlacoes,
+        }
@@ -0,0 +1,266 @@
+"""
+Instrumentação do SIOEI: tempos por etapa, acertos de cache e exportação.
+
+Tudo vai para um registro do processo (REGISTRO), compartilhado por todas as
+sessões do dashboard, pela API e pelas threads de pré-carga:
+
+- `REGISTRO.etapa(nome)` cronometra um bloco; cada etapa guarda as últimas
+  AMOSTRAS_POR_ETAPA durações, de onde saem p50/p95/p99;
+- `instrumentar_cache` (st.cache_data e afins) e `REGISTRO.registrar_cache`
+  (CacheLRU) contam acertos e falhas;
+- `Execucao` mede os trechos de um rerun e, ao final, grava uma linha de log
+  estruturada (JSON com SIOEI_LOG_JSON=1, ver `configurar_logs`);
+- `texto_prometheus()` e `servir_metricas()` expõem tudo no formato texto do Prometheus
+  (no dashboard, só com SIOEI_METRICAS_PORTA definida).
+"""
+
+import functools
+import json
+import logging
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+AMOSTRAS_POR_ETAPA = 2048       # Janela de durações por etapa para os quantis
+QUANTIS = (0.5, 0.95, 0.99)
+# Endpoint do dashboard só quando pedido (sem autenticação): porta 0 = desligado,
+# e só na interface local, a menos que SIOEI_METRICAS_HOST diga outra
+PORTA_METRICAS = int(os.environ.get("SIOEI_METRICAS_PORTA") or 0)
+HOST_METRICAS = os.environ.get("SIOEI_METRICAS_HOST") or "127.0.0.1"
+
+# ==============================================================================
+# REGISTRO DO PROCESSO
+# ==============================================================================
+class RegistroMetricas:
+    """Durações por etapa e contadores de cache, seguros entre threads"""
+
+    def __init__(self, amostras=AMOSTRAS_POR_ETAPA):
+        self.amostras = amostras
+        self._lock = threading.Lock()
+        self._tempos = {}       # etapa -> deque das últimas durações (s)
+        self._totais = {}       # etapa -> [contagem, soma] desde o início
+        self._caches = {}       # cache -> [acertos, falhas] contados aqui
+        self._fontes = {}       # cache -> objeto com .estatisticas() (ex.: CacheLRU)
+
+    def registrar_tempo(self, etapa, segundos):
+        with self._lock:
+            if etapa not in self._tempos:
+                self._tempos[etapa] = deque(maxlen=self.amostras)
+                self._totais[etapa] = [0, 0.0]
+            self._tempos[etapa].append(segundos)
+            totais = self._totais[etapa]
+            totais[0] += 1
+            totais[1] += segundos
+
+    @contextmanager
+    def etapa(self, nome):
+        """Cronometra o bloco como uma amostra de `nome` (mesmo se levantar exceção)"""
+        inicio = perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar_tempo(nome, perf_counter() - inicio)
+
+    def contar_cache(self, nome, acertou):
+        with self._lock:
+            contagem = self._caches.setdefault(nome, [0, 0])
+            contagem[0 if acertou else 1] += 1
+
+    def registrar_cache(self, nome, cache):
+        """Inclui um cache que conta os próprios acertos (`estatisticas()` com acertos/falhas)"""
+        with self._lock:
+            self._fontes[nome] = cache
+
+    def limpar(self):
+        with self._lock:
+            self._tempos.clear()
+            self._totais.clear()
+            self._caches.clear()
+
+    def resumo(self):
+        """
+        {'etapas': {etapa: {n, soma_s, p50_ms, p95_ms, p99_ms}},
+         'caches': {cache: {acertos, falhas, taxa_acerto}}}, em ordem alfabética
+        """
+        with self._lock:
+            tempos = {etapa: np.array(amostras) for etapa, amostras in self._tempos.items()}
+            totais = {etapa: tuple(t) for etapa, t in self._totais.items()}
+            caches = {nome: tuple(c) for nome, c in self._caches.items()}
+            fontes = dict(self._fontes)
+        for nome, cache in fontes.items():
+            e = cache.estatisticas()
+            caches[nome] = (e['acertos'], e['falhas'])
+
+        etapas = {}
+        for etapa in sorted(tempos):
+            quantis = np.quantile(tempos[etapa], QUANTIS) * 1000
+            etapas[etapa] = {'n': totais[etapa][0], 'soma_s': totais[etapa][1],
+                             **{f"p{q * 100:g}_ms": float(v) for q, v in zip(QUANTIS, quantis)}}
+        return {
+            'etapas': etapas,
+            'caches': {nome: {'acertos': a, 'falhas': f, 'taxa_acerto': a / (a + f) if a + f else 0.0}
+                       for nome, (a, f) in sorted(caches.items())},
+        }
+
+    def texto_prometheus(self):
+        """Métricas no formato texto de exposição do Prometheus (0.0.4)"""
+        resumo = self.resumo()
+        linhas = [
+            "# HELP sioei_etapa_segundos Duração das etapas (quantis sobre as últimas amostras)",
+            "# TYPE sioei_etapa_segundos summary",
+        ]
+        for etapa, e in resumo['etapas'].items():
+            rotulo = f'etapa="{_escapar(etapa)}"'
+            for q in QUANTIS:
+                linhas.append(f'sioei_etapa_segundos{{{rotulo},quantile="{q:g}"}} {e[f"p{q * 100:g}_ms"] / 1000:.6g}')
+            linhas.append(f"sioei_etapa_segundos_sum{{{rotulo}}} {e['soma_s']:.6g}")
+            linhas.append(f"sioei_etapa_segundos_count{{{rotulo}}} {e['n']}")
+        for metrica, campo, ajuda in (('sioei_cache_acertos_total', 'acertos', 'Acertos de cache'),
+                                      ('sioei_cache_falhas_total', 'falhas', 'Falhas de cache (valor calculado)')):
+            linhas += [f"# HELP {metrica} {ajuda}", f"# TYPE {metrica} counter"]
+            linhas += [f'{metrica}{{cache="{_escapar(nome)}"}} {c[campo]}' for nome, c in resumo['caches'].items()]
+        return "\n".join(linhas) + "\n"
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+REGISTRO = RegistroMetricas()
+
+def instrumentar_cache(nome, decorador, registro=REGISTRO):
+    """
+    Aplica um decorador de cache (ex.: `st.cache_data(...)`) contando acertos e
+    falhas em `registro`: falha é a chamada em que a função original rodou.
+    Mantém `.clear()` do cache decorado.
+    """
+    def aplicar(funcao):
+        local = threading.local()
+
+        @functools.wraps(funcao)
+        def calcular(*args, **kwargs):
+            local.calculou = True
+            return funcao(*args, **kwargs)
+
+        cacheada = decorador(calcular)
+
+        @functools.wraps(funcao)
+        def chamar(*args, **kwargs):
+            local.calculou = False
+            try:
+                return cacheada(*args, **kwargs)
+            finally:
+                registro.contar_cache(nome, acertou=not local.calculou)
+
+        chamar.clear = cacheada.clear
+        return chamar
+    return aplicar
+
+# ==============================================================================
+# EXECUÇÕES (RERUNS) E LOGS ESTRUTURADOS
+# ==============================================================================
+class Execucao:
+    """
+    Tempos de um rerun do dashboard. `marcar(trecho)` fecha o trecho desde a marca
+    anterior (o script inteiro fica coberto, sem reindentar blocos); `etapa(nome)`
+    mede um bloco dentro de um trecho. Tudo vai também para o registro; `finalizar()`
+    registra o total e grava uma linha de log com os tempos desta execução.
+    """
+
+    def __init__(self, nome, registro=REGISTRO, **contexto):
+        self.nome = nome
+        self.registro = registro
+        self.contexto = contexto
+        self.etapas = {}
+        self._inicio = self._marca = perf_counter()
+
+    def _anotar(self, etapa, segundos):
+        self.etapas[etapa] = self.etapas.get(etapa, 0.0) + segundos
+        self.registro.registrar_tempo(etapa, segundos)
+
+    def marcar(self, trecho):
+        agora = perf_counter()
+        self._anotar(f"{self.nome}.{trecho}", agora - self._marca)
+        self._marca = agora
+
+    @contextmanager
+    def etapa(self, nome):
+        inicio = perf_counter()
+        try:
+            yield
+        finally:
+            self._anotar(nome, perf_counter() - inicio)
+
+    def finalizar(self):
+        """Registra `<nome>.total` e loga a execução; devolve o total em segundos"""
+        total = perf_counter() - self._inicio
+        self.registro.registrar_tempo(f"{self.nome}.total", total)
+        logger.info(f"{self.nome} em {total * 1000:.1f} ms", extra={
+            'evento': self.nome,
+            'total_ms': round(total * 1000, 2),
+            'etapas_ms': {etapa: round(s * 1000, 2) for etapa, s in self.etapas.items()},
+            **self.contexto,
+        })
+        return total
+
+_ATRIBUTOS_REGISTRO = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+class FormatadorJSON(logging.Formatter):
+    """Uma linha JSON por registro: ts, nivel, logger, msg e os campos passados em `extra`"""
+
+    def format(self, record):
+        dados = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        dados.update({k: v for k, v in vars(record).items() if k not in _ATRIBUTOS_REGISTRO})
+        if record.exc_info:
+            dados['exc'] = self.formatException(record.exc_info)
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+def configurar_logs(nivel=logging.INFO, formato=None, json_logs=None):
+    """`logging.basicConfig` do SIOEI: texto ou, com SIOEI_LOG_JSON=1 (ou json_logs=True), JSON"""
+    if json_logs is None:
+        json_logs = os.environ.get("SIOEI_LOG_JSON", "").lower() in ("1", "true", "sim")
+    if json_logs:
+        saida = logging.StreamHandler()
+        saida.setFormatter(FormatadorJSON())
+        logging.basicConfig(level=nivel, handlers=[saida])
+    elif formato:
+        logging.basicConfig(level=nivel, format=formato)
+    else:
+        logging.basicConfig(level=nivel)
+
+# ==============================================================================
+# ENDPOINT /metrics (PROMETHEUS)
+# ==============================================================================
+def servir_metricas(porta=PORTA_METRICAS, host=HOST_METRICAS, registro=REGISTRO):
+    """Sobe, numa thread daemon, um servidor HTTP com GET /metrics; devolve o servidor"""
+    class Manipulador(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            corpo = registro.texto_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+    servidor = ThreadingHTTPServer((host, porta), Manipulador)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, name="sioei-metricas", daemon=True).start()
+    logger.info(f"Métricas em http://{host}:{servidor.server_address[1]}/metrics")
+    return servidor
@@ -0,0 +1,187 @@
+"""
+Otimizador de carteiras do SIOEI: covariância dos ativos e fronteira eficiente
+de Markowitz (long-only) pelo Algoritmo da Linha Crítica.
+"""
+
+import numpy as np
+
+from sioei.engine import volatilidade_por_risco
+from sioei.universe import universo_padrao
+
+# Correlação assumida entre ativos sem histórico de preços, por par de classes
+CORRELACAO_BASE = {('RF', 'RF'): 0.3, ('RV', 'RV'): 0.5, ('RF', 'RV'): 0.0, ('RV', 'RF'): 0.0}
+
+def montar_covariancia(historico, nomes=None, min_observacoes=60, universo=None):
+    """
+    Matriz de covariância anual (em %²) sobre `nomes` (padrão: todos os ATIVOS).
+    
+    A base usa a volatilidade da nota de risco e CORRELACAO_BASE; onde há histórico
+    de preços suficiente, volatilidades e correlações são substituídas pelas amostrais.
+    """
+    tabela = (universo or universo_padrao()).tabela
+    nomes = list(tabela.nomes) if nomes is None else list(nomes)
+    posicoes = np.array([tabela.indice[k] for k in nomes], dtype=np.intp)
+    vols = volatilidade_por_risco(tabela.risco[posicoes])
+    # Correlação base por par de classes: tabela (tipos x tipos) indexada pelos códigos
+    corr_tipos = np.array([[CORRELACAO_BASE[(ti, tj)] for tj in tabela.tipos] for ti in tabela.tipos])
+    codigos = tabela.codigo_tipo[posicoes]
+    corr = corr_tipos[np.ix_(codigos, codigos)]
+    np.fill_diagonal(corr, 1.0)
+    
+    idx = [i for i, k in enumerate(nomes) if k in historico.columns]
+    if idx:
+        retornos = np.log(historico[[nomes[i] for i in idx]].dropna()).diff().dropna()
+        if len(retornos) >= min_observacoes:
+            vols[idx] = retornos.std().to_numpy() * np.sqrt(252) * 100
+            corr[np.ix_(idx, idx)] = np.nan_to_num(np.corrcoef(retornos.to_numpy(), rowvar=False), nan=0.0)
+            np.fill_diagonal(corr, 1.0)
+    
+    # A mistura de correlações amostrais e assumidas pode não ser semidefinida positiva
+    autovalores, autovetores = np.linalg.eigh(corr)
+    corr = (autovetores * np.maximum(autovalores, 1e-6)) @ autovetores.T
+    d = np.sqrt(np.diag(corr))
+    corr = corr / np.outer(d, d)
+    
+    vols = np.maximum(vols, 0.01)
+    return corr * np.outer(vols, vols)
+
+def _inversa_adicionar(inversa, cov, livres, k):
+    """Atualiza a inversa de cov[livres, livres] ao incluir o ativo k (complemento de Schur)"""
+    u = cov[livres, k]
+    su = inversa @ u
+    s = cov[k, k] - u @ su
+    n = len(livres)
+    nova = np.empty((n + 1, n + 1))
+    nova[:n, :n] = inversa + np.outer(su, su) / s
+    nova[:n, n] = nova[n, :n] = -su / s
+    nova[n, n] = 1 / s
+    return nova
+
+def _inversa_remover(inversa, p):
+    """Atualiza a inversa ao remover a p-ésima posição do conjunto livre"""
+    resto = np.delete(np.arange(len(inversa)), p)
+    col = inversa[resto, p]
+    return inversa[np.ix_(resto, resto)] - np.outer(col, col) / inversa[p, p]
+
+def linha_critica(mu, cov, tol=1e-12, recalcular_cada=100):
+    """
+    Algoritmo da Linha Crítica (Markowitz) para min ½w'Σw - t·μ'w, com Σw = 1 e w >= 0.
+    
+    Percorre t de +inf (máximo retorno) até 0 (mínima variância). Entre dois pontos de
+    virada os pesos livres são lineares em t: w = t·a + b. Retorna a lista de segmentos
+    (t_inicio, t_fim, livres, a, b) que descreve a fronteira inteira de forma exata.
+    A inversa de Σ dos ativos livres é atualizada por posto 1 a cada entrada/saída.
+    """
+    n = len(mu)
+    k0 = int(np.argmax(mu))
+    livres = [k0]
+    inversa = np.array([[1 / cov[k0, k0]]])
+    t_atual = np.inf
+    atualizacoes = 0
+    segmentos = []
+    
+    while True:
+        if atualizacoes >= recalcular_cada:
+            inversa = np.linalg.inv(cov[np.ix_(livres, livres)])
+            atualizacoes = 0
+        
+        # Solução KKT do conjunto livre: w = t·a + b, multiplicador γ = t·ga + gb
+        s_mu = inversa @ mu[livres]
+        s_1 = inversa.sum(axis=1)
+        a = s_mu - (s_mu.sum() / s_1.sum()) * s_1
+        b = s_1 / s_1.sum()
+        ga = -s_mu.sum() / s_1.sum()
+        gb = 1 / s_1.sum()
+        
+        limite = t_atual * (1 - 1e-12)
+        t_evento, acao, quem = -np.inf, None, None
+        
+        # Saída: peso livre que zera ao reduzir t
+        if len(livres) > 1:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ts = np.where(a > tol, -b / a, -np.inf)
+            ts[ts >= limite] = -np.inf
+            j = int(np.argmax(ts))
+            if ts[j] > t_evento:
+                t_evento, acao, quem = ts[j], 'sai', j
+        
+        # Entrada: ativo preso em zero cujo multiplicador de Lagrange zera
+        presos = np.ones(n, dtype=bool)
+        presos[livres] = False
+        if presos.any():
+            a_cheio = np.zeros(n)
+            a_cheio[livres] = a
+            b_cheio = np.zeros(n)
+            b_cheio[livres] = b
+            alfa = cov @ a_cheio - mu - ga
+            beta = cov @ b_cheio - gb
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ts = np.where(presos & (alfa > tol), -beta / alfa, -np.inf)
+            ts[ts >= limite] = -np.inf
+            i = int(np.argmax(ts))
+            if ts[i] > t_evento:
+                t_evento, acao, quem = ts[i], 'entra', i
+        
+        segmentos.append((t_atual, max(t_evento, 0.0), list(livres), a, b))
+        if acao is None or t_evento <= 0:
+            break
+        
+        if acao == 'sai':
+            inversa = _inversa_remover(inversa, quem)
+            livres.pop(quem)
+        else:
+            inversa = _inversa_adicionar(inversa, cov, livres, quem)
+            livres.append(quem)
+        atualizacoes += 1
+        t_atual = t_evento
+    
+    return segmentos
+
+def fronteira_eficiente(mu, cov, n_pontos=50):
+    """
+    Fronteira eficiente long-only com `n_pontos` carteiras igualmente espaçadas em retorno,
+    da mínima variância ao máximo retorno. `mu` em % a.a. (já líquido de taxas).
+    """
+    mu = np.asarray(mu, dtype=float)
+    cov = np.asarray(cov, dtype=float)
+    segmentos = linha_critica(mu, cov)
+    
+    # Retorno é linear em t dentro de cada segmento: r(t) = t·(μ·a) + μ·b
+    inclinacoes = np.array([mu[livres] @ a for _, _, livres, a, _ in segmentos])
+    interceptos = np.array([mu[livres] @ b for _, _, livres, _, b in segmentos])
+    t_fim = np.array([s[1] for s in segmentos])
+    r_inicio = np.array([mu.max()] + list(inclinacoes[1:] * t_fim[:-1] + interceptos[1:]))
+    r_min = inclinacoes[-1] * t_fim[-1] + interceptos[-1]
+    
+    alvos = np.linspace(r_min, mu.max(), n_pontos)
+    pesos = np.zeros((n_pontos, len(mu)))
+    for p, alvo in enumerate(alvos):
+        # Segmentos vão do maior para o menor retorno
+        s = min(int(np.searchsorted(-r_inicio, -alvo, side='right')) - 1, len(segmentos) - 1)
+        s = max(s, 0)
+        _, _, livres, a, b = segmentos[s]
+        t = (alvo - interceptos[s]) / inclinacoes[s] if inclinacoes[s] > 0 else t_fim[s]
+        pesos[p, livres] = np.maximum(t * a + b, 0)
+    pesos /= pesos.sum(axis=1, keepdims=True)
+    
+    return {
+        'pesos': pesos,
+        'retornos': pesos @ mu,
+        'volatilidades': np.sqrt(np.einsum('ij,jk,ik->i', pesos, cov, pesos))
+    }
+
+def arredondar_pesos_inteiros(pesos, total=100):
+    """Arredonda frações para inteiros que somam `total` (método dos maiores restos)"""
+    brutos = np.asarray(pesos, dtype=float) * total
+    inteiros = np.floor(brutos).astype(int)
+    faltam = total - inteiros.sum()
+    if faltam > 0:
+        inteiros[np.argsort(-(brutos - inteiros))[:faltam]] += 1
+    return inteiros
+
+def carteira_para_risco(fronteira, vol_alvo):
+    """Carteira de maior retorno na fronteira com volatilidade <= vol_alvo (% a.a.)"""
+    aceitaveis = np.flatnonzero(fronteira['volatilidades'] <= vol_alvo + 1e-9)
+    if len(aceitaveis) == 0:
+        return int(np.argmin(fronteira['volatilidades']))
+    return int(aceitaveis[np.argmax(fronteira['retornos'][aceitaveis])])
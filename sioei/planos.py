@@ -0,0 +1,229 @@
+"""
+Planos salvos dos clientes (SQLite): carteira, parâmetros do cenário e resumo da projeção.
+
+Cada plano é identificado por (usuario, nome) e guarda os pesos como vieram dos
+sliders. O resumo projetado (colunas de sioei.batch.COLUNAS_RESULTADO) fica em
+`projecoes`, uma linha por plano e versão dos dados de mercado. Reabrir os planos
+de um cliente ou listar milhares de cenários por saldo final é uma consulta
+indexada; só planos sem resumo na versão atual são projetados (`projetar_pendentes`).
+"""
+
+import json
+import logging
+import os
+import sqlite3
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from sioei.batch import COLUNAS_RESULTADO
+from sioei.data import DIRETORIO_DADOS
+from sioei.engine import avaliar_carteiras, normalizar_pesos
+from sioei.universe import PERFIS, TESES
+
+logger = logging.getLogger(__name__)
+
+ARQUIVO_PLANOS = os.path.join(DIRETORIO_DADOS, "planos.sqlite")
+PARAMETROS_PLANO = ('v_inicial', 'v_mensal', 'anos', 'renda_desejada', 'anos_inicio_retirada', 'usar_retirada')
+PADROES_PLANO = {'v_mensal': 0.0, 'renda_desejada': 0.0, 'anos_inicio_retirada': 99, 'usar_retirada': False}
+ORDENACOES = COLUNAS_RESULTADO  # Colunas aceitas em `listar_cenarios(ordem=...)`
+
+# ==============================================================================
+# CONEXÃO E ESQUEMA
+# ==============================================================================
+def conectar_planos(caminho=None):
+    """Abre (e cria, se preciso) o banco de planos salvos"""
+    caminho = caminho or ARQUIVO_PLANOS
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    conn = sqlite3.connect(caminho, timeout=30)
+    conn.execute("PRAGMA journal_mode = WAL")  # Leituras de outras sessões não esperam as gravações
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(f"""
+        CREATE TABLE IF NOT EXISTS planos (
+            id INTEGER PRIMARY KEY,
+            usuario TEXT NOT NULL,
+            nome TEXT NOT NULL,
+            estrategia TEXT,
+            pesos TEXT NOT NULL,
+            v_inicial REAL NOT NULL,
+            v_mensal REAL NOT NULL,
+            anos INTEGER NOT NULL,
+            renda_desejada REAL NOT NULL,
+            anos_inicio_retirada INTEGER NOT NULL,
+            usar_retirada INTEGER NOT NULL,
+            atualizado_em TEXT NOT NULL,
+            UNIQUE (usuario, nome)
+        );
+        CREATE INDEX IF NOT EXISTS planos_estrategia ON planos (estrategia);
+
+        CREATE TABLE IF NOT EXISTS projecoes (
+            plano_id INTEGER NOT NULL REFERENCES planos (id) ON DELETE CASCADE,
+            versao_dados TEXT NOT NULL,
+            {', '.join(f'{c} REAL NOT NULL' for c in COLUNAS_RESULTADO)},
+            PRIMARY KEY (plano_id, versao_dados)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS projecoes_versao_final_real ON projecoes (versao_dados, final_real);
+        CREATE INDEX IF NOT EXISTS projecoes_versao_final_nom ON projecoes (versao_dados, final_nom);
+
+        -- Plano alterado: os resumos antigos deixam de valer em qualquer versão
+        CREATE TRIGGER IF NOT EXISTS planos_alterados AFTER UPDATE ON planos
+        WHEN OLD.pesos IS NOT NEW.pesos
+          {' '.join(f'OR OLD.{p} IS NOT NEW.{p}' for p in PARAMETROS_PLANO)}
+        BEGIN
+            DELETE FROM projecoes WHERE plano_id = NEW.id;
+        END;
+    """)
+    return conn
+
+# ==============================================================================
+# GRAVAÇÃO (EM LOTE)
+# ==============================================================================
+@lru_cache(maxsize=1)
+def _estrategias_por_pesos():
+    estrategias = list(PERFIS.items()) + [(nome, tese['pesos']) for nome, tese in TESES.items()]
+    return {normalizar_pesos(pesos): nome for nome, pesos in reversed(estrategias) if pesos}
+
+def identificar_estrategia(pesos):
+    """Nome do perfil/tese com exatamente esses pesos (proporcionalmente); None se personalizada"""
+    return _estrategias_por_pesos().get(normalizar_pesos(pesos))
+
+def _linha_plano(plano, agora):
+    pesos = {nome: peso for nome, peso in plano['pesos'].items() if peso > 0}
+    parametros = {**PADROES_PLANO, **{p: plano[p] for p in PARAMETROS_PLANO if p in plano}}
+    return (
+        plano['usuario'], plano['nome'],
+        plano['estrategia'] if 'estrategia' in plano else identificar_estrategia(pesos),
+        json.dumps(pesos, sort_keys=True, ensure_ascii=False),
+        float(parametros['v_inicial']), float(parametros['v_mensal']), int(parametros['anos']),
+        float(parametros['renda_desejada']), int(parametros['anos_inicio_retirada']),
+        int(bool(parametros['usar_retirada'])), agora
+    )
+
+def salvar_planos(conn, planos):
+    """
+    Grava (upsert por usuario + nome) uma lista de planos: dicts com usuario, nome,
+    pesos e PARAMETROS_PLANO. Sem 'estrategia', ela é identificada pelos pesos.
+    """
+    agora = datetime.now().isoformat(timespec='seconds')
+    linhas = [_linha_plano(p, agora) for p in planos]
+    with conn:
+        conn.executemany("""
+            INSERT INTO planos (usuario, nome, estrategia, pesos, v_inicial, v_mensal, anos,
+                                renda_desejada, anos_inicio_retirada, usar_retirada, atualizado_em)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (usuario, nome) DO UPDATE SET
+                estrategia = excluded.estrategia, pesos = excluded.pesos,
+                v_inicial = excluded.v_inicial, v_mensal = excluded.v_mensal, anos = excluded.anos,
+                renda_desejada = excluded.renda_desejada,
+                anos_inicio_retirada = excluded.anos_inicio_retirada,
+                usar_retirada = excluded.usar_retirada, atualizado_em = excluded.atualizado_em
+        """, linhas)
+    return len(linhas)
+
+def gravar_projecoes(conn, resumos):
+    """
+    Grava (upsert por plano + versão) resumos de projeção: dicts com usuario, nome,
+    versao_dados e COLUNAS_RESULTADO (ex.: a saída de `calcular` ou `avaliar_carteiras`).
+    """
+    linhas = [{'usuario': r['usuario'], 'nome': r['nome'], 'versao_dados': r['versao_dados'],
+               **{c: float(r[c]) for c in COLUNAS_RESULTADO}} for r in resumos]
+    with conn:
+        conn.executemany(f"""
+            INSERT INTO projecoes (plano_id, versao_dados, {', '.join(COLUNAS_RESULTADO)})
+            SELECT id, :versao_dados, {', '.join(':' + c for c in COLUNAS_RESULTADO)}
+            FROM planos WHERE usuario = :usuario AND nome = :nome
+            ON CONFLICT (plano_id, versao_dados) DO UPDATE SET
+                {', '.join(f'{c} = excluded.{c}' for c in COLUNAS_RESULTADO)}
+        """, linhas)
+    return len(linhas)
+
+def excluir_plano(conn, usuario, nome):
+    """Remove um plano e seus resumos; True se existia"""
+    with conn:
+        return conn.execute("DELETE FROM planos WHERE usuario = ? AND nome = ?", (usuario, nome)).rowcount > 0
+
+def projetar_pendentes(conn, universo, usuario=None, tamanho_bloco=5000):
+    """
+    Projeta, em blocos vetorizados (`avaliar_carteiras`), só os planos sem resumo
+    na versão de `universo`, e grava os resumos. Devolve quantos foram projetados.
+    """
+    filtro, parametros = ("AND p.usuario = ?", [usuario]) if usuario is not None else ("", [])
+    cursor = conn.execute(f"""
+        SELECT p.usuario, p.nome, p.pesos, {', '.join('p.' + c for c in PARAMETROS_PLANO)}
+        FROM planos p
+        WHERE NOT EXISTS (SELECT 1 FROM projecoes r WHERE r.plano_id = p.id AND r.versao_dados = ?)
+        {filtro}
+    """, [universo.versao] + parametros)
+
+    indice = universo.tabela.indice
+    total = 0
+    while linhas := cursor.fetchmany(tamanho_bloco):
+        matriz = np.zeros((len(linhas), len(indice)))
+        for i, linha in enumerate(linhas):
+            for nome, peso in json.loads(linha[2]).items():
+                if nome in indice:  # Ativo que saiu da base não entra na projeção
+                    matriz[i, indice[nome]] = peso
+        v_ini, v_mes, anos, renda, anos_ret, retirada = (np.array(c) for c in list(zip(*linhas))[3:])
+        r = avaliar_carteiras(matriz, v_ini, v_mes, anos, renda, anos_ret, retirada.astype(bool),
+                              universo=universo)
+        colunas = {c: np.broadcast_to(r[c], len(linhas)) for c in COLUNAS_RESULTADO}
+        total += gravar_projecoes(conn, (
+            {'usuario': linha[0], 'nome': linha[1], 'versao_dados': universo.versao,
+             **{c: colunas[c][i] for c in COLUNAS_RESULTADO}}
+            for i, linha in enumerate(linhas)
+        ))
+    if total:
+        logger.info(f"{total} plano(s) projetado(s) na versão {universo.versao}")
+    return total
+
+# ==============================================================================
+# CONSULTAS (INDEXADAS)
+# ==============================================================================
+def carregar_planos(conn, usuario, versao_dados=None):
+    """
+    Planos de um usuário (mais recentes primeiro) como lista de dicts, com 'pesos'
+    já decodificado e o resumo da `versao_dados` (None nas colunas se ainda não projetado).
+    """
+    cursor = conn.execute(f"""
+        SELECT p.*, {', '.join('r.' + c for c in COLUNAS_RESULTADO)}
+        FROM planos p
+        LEFT JOIN projecoes r ON r.plano_id = p.id AND r.versao_dados = ?
+        WHERE p.usuario = ?
+        ORDER BY p.atualizado_em DESC, p.nome
+    """, (versao_dados, usuario))
+    colunas = [c[0] for c in cursor.description]
+    planos = []
+    for linha in cursor:
+        plano = dict(zip(colunas, linha))
+        plano['pesos'] = json.loads(plano['pesos'])
+        plano['usar_retirada'] = bool(plano['usar_retirada'])
+        planos.append(plano)
+    return planos
+
+def listar_cenarios(conn, versao_dados, estrategia=None, usuario=None, ordem='final_real',
+                    decrescente=True, limite=100, deslocamento=0):
+    """
+    Cenários salvos com resumo na `versao_dados`, ordenados por `ordem` (uma de
+    ORDENACOES) e paginados, como DataFrame. Sem filtros, a ordenação por saldo final
+    percorre o índice (versao_dados, final_*) e só lê as linhas da página.
+    """
+    if ordem not in ORDENACOES:
+        raise ValueError(f"Ordenação inválida: {ordem} (use uma de {', '.join(ORDENACOES)})")
+    filtros, parametros = ["r.versao_dados = ?"], [versao_dados]
+    if estrategia is not None:
+        filtros.append("p.estrategia = ?")
+        parametros.append(estrategia)
+    if usuario is not None:
+        filtros.append("p.usuario = ?")
+        parametros.append(usuario)
+    return pd.read_sql_query(f"""
+        SELECT p.usuario, p.nome, p.estrategia, {', '.join('p.' + c for c in PARAMETROS_PLANO)},
+               {', '.join('r.' + c for c in COLUNAS_RESULTADO)}
+        FROM projecoes r
+        JOIN planos p ON p.id = r.plano_id
+        WHERE {' AND '.join(filtros)}
+        ORDER BY r.{ordem} {'DESC' if decrescente else 'ASC'}
+        LIMIT ? OFFSET ?
+    """, conn, params=parametros + [int(limite), int(deslocamento)])
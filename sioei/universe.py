@@ -0,0 +1,326 @@
+"""
+Universo de ativos do SIOEI: base de ATIVOS, perfis (PERFIS) e teses (TESES).
+
+A base de ativos depende do cenário macro (Selic/IPCA) e dos retornos live,
+então é construída a partir de um snapshot de mercado, sob demanda. O Universo
+resultante é imutável e carrega a versão do snapshot, para que caches a jusante
+possam usá-la como chave, e traz os ATIVOS também em colunas NumPy alinhadas
+(`Universo.tabela`), para que retorno, custo e risco de carteiras sejam produtos escalares.
+"""
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+import numpy as np
+
+# ==============================================================================
+# TICKERS COM COTAÇÃO LIVE (YAHOO FINANCE)
+# ==============================================================================
+TICKERS_MAP = {
+    'ETF Ibovespa (BOVA11)': 'BOVA11.SA', 
+    'Ações EUA (S&P500)': 'IVVB11.SA', 
+    'Tech Stocks (Nasdaq)': 'NASD11.SA', 
+    'Bitcoin (BTC)': 'BTC-USD',
+    'Ethereum/Altcoins': 'ETH-USD', 
+    'Ouro / Dólar': 'GOLD11.SA',
+    'FIIs (Tijolo)': 'IFIX', 
+    'Ações (Dividendos)': 'IDIV' 
+}
+
+# ==============================================================================
+# TAXAS DE REFERÊNCIA E BASE DE ATIVOS
+# ==============================================================================
+def calcular_cdi(selic):
+    """CDI estimado a partir da Selic Meta"""
+    return max(selic - 0.10, 0)
+
+def calcular_poupanca(selic):
+    """Rendimento anual da poupança (regra nova: 0,5% a.m. + TR acima de 8,5% de Selic)"""
+    if selic > 8.5:
+        return ((1 + 0.005 + 0.0015)**12 - 1) * 100 
+    return selic * 0.70
+
+def suavizar_retorno(nome_ativo, base_historica, live):
+    """Mistura 50/50 o retorno live (se houver) com a premissa histórica"""
+    if nome_ativo in live:
+        return (live[nome_ativo] * 0.5) + (base_historica * 0.5)
+    return base_historica
+
+def construir_ativos(selic, ipca, live):
+    """Base de ATIVOS para um cenário de Selic, IPCA e retornos live"""
+    cdi = calcular_cdi(selic)
+    return {
+        'Tesouro Selic': {'retorno': selic, 'risco': 1, 'taxa': 1.65, 'tipo': 'RF', 'mercado': '🏦 Soberano', 'cor': '#4CAF50', 'desc': f'Porto seguro do brasileiro.'},
+        'CDB Liquidez Diária': {'retorno': cdi * 0.99, 'risco': 1, 'taxa': 1.60, 'tipo': 'RF', 'mercado': '🏦 Bancário', 'cor': '#03A9F4', 'desc': 'Reserva de emergência padrão.'},
+        'Tesouro Prefixado': {'retorno': selic + 2.0, 'risco': 4, 'taxa': 1.70, 'tipo': 'RF', 'mercado': '🏛️ Títulos Públicos', 'cor': '#CDDC39', 'desc': 'Aposta na queda dos juros.'},
+        'Tesouro IPCA+ (Curto)': {'retorno': ipca + 6.0, 'risco': 2, 'taxa': 1.60, 'tipo': 'RF', 'mercado': '🏛️ Títulos Públicos', 'cor': '#FFEB3B', 'desc': 'Proteção inflacionária CP.'},
+        'Tesouro IPCA+ (Longo)': {'retorno': ipca + 6.4, 'risco': 5, 'taxa': 1.65, 'tipo': 'RF', 'mercado': '🏛️ Títulos Públicos', 'cor': '#FF9800', 'desc': 'Aposentadoria clássica.'},
+        'Tesouro Renda+': {'retorno': ipca + 6.5, 'risco': 3, 'taxa': 0.50, 'tipo': 'RF', 'mercado': '🏛️ Títulos Públicos', 'cor': '#FF5722', 'desc': 'Foco previdenciário.'},
+        'LCI/LCA (Isento)': {'retorno': cdi * 0.94, 'risco': 2, 'taxa': 0.00, 'tipo': 'RF', 'mercado': '💳 Crédito Isento', 'cor': '#0288D1', 'desc': 'Queridinho da Classe Média.'},
+        'CDB Banco Médio': {'retorno': cdi * 1.20, 'risco': 3, 'taxa': 1.90, 'tipo': 'RF', 'mercado': '💳 Crédito Privado', 'cor': '#01579B', 'desc': 'Caça ao rendimento (120% CDI).'},
+        'Debêntures Incent.': {'retorno': ipca + 7.5, 'risco': 5, 'taxa': 0.30, 'tipo': 'RF', 'mercado': '🏗️ Infraestrutura', 'cor': '#E91E63', 'desc': 'Crédito Isento (Risco Corp).'},
+        'CRI/CRA (High Yield)': {'retorno': ipca + 9.5, 'risco': 8, 'taxa': 2.00, 'tipo': 'RF', 'mercado': '🏗️ High Yield', 'cor': '#C2185B', 'desc': 'Risco alto, retorno alto.'},
+        'Fundo Multimercado': {'retorno': cdi * 1.15, 'risco': 5, 'taxa': 3.50, 'tipo': 'RF', 'mercado': '📊 Hedge Funds', 'cor': '#9C27B0', 'desc': 'Gestores macro.'},
+        
+        'Ações (Dividendos)': {'retorno': suavizar_retorno('Ações (Dividendos)', 14.50, live), 'risco': 6, 'taxa': 0.10, 'tipo': 'RV', 'mercado': '🏢 Bolsa BR', 'cor': '#00BCD4', 'desc': 'Vacas Leiteiras (BB, Taesa).'},
+        'Ações (Small Caps)': {'retorno': 18.00, 'risco': 9, 'taxa': 2.50, 'tipo': 'RV', 'mercado': '🏢 Bolsa BR', 'cor': '#0097A7', 'desc': 'Pimentinhas com potencial.'},
+        'ETF Ibovespa (BOVA11)': {'retorno': suavizar_retorno('ETF Ibovespa (BOVA11)', 14.00, live), 'risco': 7, 'taxa': 2.10, 'tipo': 'RV', 'mercado': '🏢 Bolsa BR', 'cor': '#006064', 'desc': 'Média do mercado.'},
+        'FIIs (Tijolo)': {'retorno': 12.50, 'risco': 4, 'taxa': 0.00, 'tipo': 'RV', 'mercado': '🧱 Imobiliário', 'cor': '#BA68C8', 'desc': 'Aluguel mensal isento.'},
+        'FIIs (Papel)': {'retorno': cdi * 1.05, 'risco': 5, 'taxa': 0.20, 'tipo': 'RV', 'mercado': '📜 Imobiliário', 'cor': '#8E24AA', 'desc': 'Juros compostos mensais.'},
+        'Fiagro (Agronegócio)': {'retorno': cdi * 1.10, 'risco': 6, 'taxa': 0.50, 'tipo': 'RV', 'mercado': '🚜 Agro', 'cor': '#4A148C', 'desc': 'Crédito Agro na Bolsa.'},
+        'Ações EUA (S&P500)': {'retorno': suavizar_retorno('Ações EUA (S&P500)', 16.00, live), 'risco': 6, 'taxa': 2.75, 'tipo': 'RV', 'mercado': '🌎 Exterior', 'cor': '#3F51B5', 'desc': 'Dolarização via B3.'},
+        'Tech Stocks (Nasdaq)': {'retorno': suavizar_retorno('Tech Stocks (Nasdaq)', 18.00, live), 'risco': 8, 'taxa': 2.80, 'tipo': 'RV', 'mercado': '🌎 Exterior', 'cor': '#304FFE', 'desc': 'Tecnologia Global.'},
+        'REITs (Imóveis EUA)': {'retorno': 15.00, 'risco': 6, 'taxa': 3.30, 'tipo': 'RV', 'mercado': '🌎 Exterior', 'cor': '#1A237E', 'desc': 'Imóveis em Dólar.'},
+        'Ouro / Dólar': {'retorno': suavizar_retorno('Ouro / Dólar', 8.50, live), 'risco': 4, 'taxa': 1.00, 'tipo': 'RV', 'mercado': '🛡️ Proteção', 'cor': '#FFD700', 'desc': 'Hedge cambial.'},
+        'Bitcoin (BTC)': {'retorno': suavizar_retorno('Bitcoin (BTC)', 30.00, live), 'risco': 9, 'taxa': 4.50, 'tipo': 'RV', 'mercado': '⚡ Cripto', 'cor': '#F44336', 'desc': 'Ouro Digital.'},
+        'Ethereum/Altcoins': {'retorno': suavizar_retorno('Ethereum/Altcoins', 35.00, live), 'risco': 10, 'taxa': 5.00, 'tipo': 'RV', 'mercado': '⚡ Cripto', 'cor': '#B71C1C', 'desc': 'Alto risco/recompensa.'}
+    }
+
+class MapaCongelado(dict):
+    """dict somente leitura: mutações levantam TypeError. Continua serializável (pickle)."""
+    
+    def _imutavel(self, *args, **kwargs):
+        raise TypeError("Universo é imutável; monte outro com construir_universo")
+    
+    __setitem__ = __delitem__ = __ior__ = _imutavel
+    clear = pop = popitem = setdefault = update = _imutavel
+    
+    def __reduce__(self):
+        return (type(self), (dict(self),))
+
+def congelar(valor):
+    """Cópia somente leitura de dicts (recursiva); os demais valores passam direto"""
+    if isinstance(valor, dict):
+        return MapaCongelado({k: congelar(v) for k, v in valor.items()})
+    return valor
+
+def _somente_leitura(array):
+    array.setflags(write=False)
+    return array
+
+@dataclass(frozen=True, eq=False)
+class TabelaAtivos:
+    """
+    ATIVOS em colunas alinhadas (na ordem do dict): `pesos @ tabela.retorno` é o retorno
+    ponderado de uma carteira. `metricas` empilha retorno, taxa e risco (3 x ativos),
+    para os três numa só multiplicação. Tipo e mercado viram códigos que indexam
+    `tipos` e `mercados`; os grupos (índices por tipo/mercado) já vêm prontos.
+    """
+    nomes: tuple
+    metricas: np.ndarray
+    retorno: np.ndarray
+    taxa: np.ndarray
+    risco: np.ndarray
+    codigo_tipo: np.ndarray
+    codigo_mercado: np.ndarray
+    tipos: tuple
+    mercados: tuple
+    indice: dict             # nome -> posição
+    por_tipo: dict           # tipo -> posições
+    por_mercado: dict        # mercado -> posições
+    mercados_por_tipo: dict  # tipo -> mercados (ordem alfabética)
+    
+    @property
+    def retorno_liquido(self):
+        """Retorno descontada a taxa, por ativo (% a.a.)"""
+        return self.retorno - self.taxa
+    
+    def vetor_pesos(self, pesos_dict):
+        """pesos_dict como vetor alinhado às colunas (KeyError para ativo desconhecido)"""
+        vetor = np.zeros(len(self.nomes))
+        for nome, peso in pesos_dict.items():
+            vetor[self.indice[nome]] = peso
+        return vetor
+    
+    def matriz_pesos(self, lista_pesos):
+        """Lista de pesos_dict como matriz (carteiras x ativos)"""
+        matriz = np.zeros((len(lista_pesos), len(self.nomes)))
+        for i, pesos in enumerate(lista_pesos):
+            for nome, peso in pesos.items():
+                matriz[i, self.indice[nome]] = peso
+        return matriz
+
+def tabelar_ativos(ativos):
+    """TabelaAtivos (colunas somente leitura) de um dict de ATIVOS"""
+    nomes = tuple(ativos)
+    info = list(ativos.values())
+    codigos_tipo = {t: c for c, t in enumerate(dict.fromkeys(a['tipo'] for a in info))}
+    codigos_mercado = {m: c for c, m in enumerate(dict.fromkeys(a['mercado'] for a in info))}
+    tipos, mercados = tuple(codigos_tipo), tuple(codigos_mercado)
+    codigo_tipo = np.array([codigos_tipo[a['tipo']] for a in info], dtype=np.intp)
+    codigo_mercado = np.array([codigos_mercado[a['mercado']] for a in info], dtype=np.intp)
+    por_mercado = {m: _somente_leitura(np.flatnonzero(codigo_mercado == c)) for c, m in enumerate(mercados)}
+    metricas = _somente_leitura(np.array([[a[k] for a in info] for k in ('retorno', 'taxa', 'risco')],
+                                         dtype=float).reshape(3, len(info)))
+    return TabelaAtivos(
+        nomes=nomes,
+        metricas=metricas,
+        retorno=metricas[0],
+        taxa=metricas[1],
+        risco=metricas[2],
+        codigo_tipo=_somente_leitura(codigo_tipo),
+        codigo_mercado=_somente_leitura(codigo_mercado),
+        tipos=tipos,
+        mercados=mercados,
+        indice=MapaCongelado({nome: i for i, nome in enumerate(nomes)}),
+        por_tipo=MapaCongelado({t: _somente_leitura(np.flatnonzero(codigo_tipo == c)) for c, t in enumerate(tipos)}),
+        por_mercado=MapaCongelado(por_mercado),
+        mercados_por_tipo=MapaCongelado({
+            t: tuple(sorted({mercados[c] for c in codigo_mercado[codigo_tipo == ct]}))
+            for ct, t in enumerate(tipos)
+        })
+    )
+
+@dataclass(frozen=True, eq=False)
+class Universo:
+    """
+    Cenário de mercado completo usado pelo motor: taxas de referência + ATIVOS.
+    
+    Imutável (inclusive `ativos` e `live`) e identificado por `versao`, a versão do
+    snapshot de mercado que o gerou: mesma versão, mesmos números. `tabela` traz os
+    mesmos ATIVOS em colunas (ver TabelaAtivos). `estatisticas` traz, por janela de
+    sioei.estatisticas, as métricas dos ativos com histórico ({janela: {ativo: {...}}}).
+    """
+    selic: float
+    ipca: float
+    ativos: dict
+    live: dict = field(default_factory=dict)
+    estatisticas: dict = field(default_factory=dict)
+    status_bcb: bool = False
+    versao: str = ''
+    tabela: TabelaAtivos = field(init=False, repr=False)
+    
+    def __post_init__(self):
+        object.__setattr__(self, 'ativos', congelar(self.ativos))
+        object.__setattr__(self, 'live', congelar(self.live))
+        object.__setattr__(self, 'estatisticas', congelar(self.estatisticas))
+        object.__setattr__(self, 'tabela', tabelar_ativos(self.ativos))
+    
+    @property
+    def cdi(self):
+        return calcular_cdi(self.selic)
+    
+    @property
+    def poupanca(self):
+        return calcular_poupanca(self.selic)
+
+def construir_universo(snapshot):
+    """Universo a partir de um snapshot de mercado (ver sioei.data.montar_snapshot)"""
+    macro = snapshot['macro']
+    live = snapshot['live']
+    return Universo(
+        selic=macro['selic'],
+        ipca=macro['ipca'],
+        ativos=construir_ativos(macro['selic'], macro['ipca'], live),
+        live=live,
+        estatisticas=snapshot.get('estatisticas', {}).get('janelas', {}),
+        status_bcb=macro['status'],
+        versao=snapshot.get('versao', '')
+    )
+
+@lru_cache(maxsize=1)
+def universo_padrao():
+    """
+    Universo usado quando nenhum é informado: carregado na primeira chamada,
+    apenas do armazém local (sem rede).
+    """
+    from sioei.data import montar_snapshot
+    return construir_universo(montar_snapshot(atualizar=False))
+
+# ==============================================================================
+# PERFIS E ESTRATÉGIAS (EXPANDIDO - HEAVY METAL EDITION 🎸)
+# ==============================================================================
+PERFIS = {
+    'Conservador (Rentista) 🛡️': {'LCI/LCA (Isento)': 35, 'Tesouro Selic': 30, 'CDB Banco Médio': 20, 'Debêntures Incent.': 15},
+    'Moderado (Dividendeiro) ⚖️': {'FIIs (Tijolo)': 20, 'FIIs (Papel)': 15, 'Debêntures Incent.': 20, 'Tesouro IPCA+ (Longo)': 15, 'Ações (Dividendos)': 15, 'Fundo Multimercado': 15},
+    'Agressivo (Arrojado BR) 🚀': {'Ações (Small Caps)': 20, 'Bitcoin (BTC)': 20, 'FIIs (Tijolo)': 15, 'CRI/CRA (High Yield)': 20, 'ETF Ibovespa (BOVA11)': 15, 'Ações EUA (S&P500)': 10}
+}
+
+DESCRICOES_PERFIS = {
+    'Conservador (Rentista) 🛡️': 'Foco total em GANHO REAL acima da inflação com zero sustos. Muita LCI/LCA e Tesouro.',
+    'Moderado (Dividendeiro) ⚖️': 'Perfil "Viver de Renda". Forte exposição a Fundos Imobiliários e Ações de Dividendos.',
+    'Agressivo (Arrojado BR) 🚀': 'Apetite ao risco. Mistura Small Caps, High Yield e Cripto.'
+}
+
+# --- LISTA COMPLETA DE ESTRATÉGIAS (18 TESES) ---
+TESES = {
+    # CLÁSSICOS & ORIGINAIS
+    '👑 Rei dos Dividendos (Barsi)': {
+        'desc': 'Foco em renda passiva recorrente e isenta. (Luiz Barsi)', 
+        'pesos': {'Ações (Dividendos)': 40, 'FIIs (Tijolo)': 25, 'FIIs (Papel)': 15, 'Debêntures Incent.': 20}
+    },
+    '🌍 All Weather (Ray Dalio)': {
+        'desc': 'Blindada para qualquer cenário (Inflação, Deflação, Crescimento).', 
+        'pesos': {'Ações EUA (S&P500)': 30, 'Tesouro IPCA+ (Longo)': 40, 'Tesouro Selic': 15, 'Ouro / Dólar': 7.5, 'CDB Liquidez Diária': 7.5}
+    },
+    '🏰 Portfólio Permanente (Harry Browne)': {
+        'desc': 'Segurança simétrica: 25% Ações, 25% Ouro, 25% Renda Fixa Longa, 25% Caixa.',
+        'pesos': {'Ações (Dividendos)': 25, 'Tesouro IPCA+ (Longo)': 25, 'Ouro / Dólar': 25, 'Tesouro Selic': 25}
+    },
+    '⚖️ Barbell (Nassim Taleb)': {
+        'desc': 'Antifrágil: 90% em Segurança Extrema (Selic) + 10% em Risco Explosivo.',
+        'pesos': {'Tesouro Selic': 90, 'Bitcoin (BTC)': 5, 'Ações (Small Caps)': 5}
+    },
+    '🏙️ Império de Tijolo (Renda Passiva)': {
+        'desc': 'Foco 100% Imobiliário. Para quem ama imóveis e odeia IR.',
+        'pesos': {'FIIs (Tijolo)': 60, 'FIIs (Papel)': 20, 'LCI/LCA (Isento)': 20}
+    },
+    
+    # NOVAS POPULARES (Adicionadas a Pedido)
+    '🦋 Golden Butterfly': {
+        'desc': 'Variação do Portfólio Permanente com viés de crescimento (+Ações).',
+        'pesos': {'Ações (Dividendos)': 20, 'Ações (Small Caps)': 20, 'Tesouro IPCA+ (Longo)': 20, 'Tesouro Selic': 20, 'Ouro / Dólar': 20}
+    },
+    '👴 Warren Buffett (90/10)': {
+        'desc': 'A aposta do Oráculo: 90% S&P500 e 10% Títulos Curtos. Simples e vencedor.',
+        'pesos': {'Ações EUA (S&P500)': 90, 'Tesouro Selic': 10}
+    },
+    '🧘 Bogleheads (Lazy Portfolio)': {
+        'desc': 'Filosofia passiva: Compre o mercado inteiro e vá dormir. Baixo custo.',
+        'pesos': {'ETF Ibovespa (BOVA11)': 40, 'Ações EUA (S&P500)': 30, 'Tesouro IPCA+ (Longo)': 30}
+    },
+    '⚖️ Benjamin Graham (50/50)': {
+        'desc': 'O Pai do Value Investing. Equilíbrio perfeito entre Defensivo e Empreendedor.',
+        'pesos': {'Ações (Dividendos)': 50, 'Tesouro IPCA+ (Curto)': 50}
+    },
+    '☕ Coffee Can (Buy & Hold)': {
+        'desc': 'Comprar empresas de altíssima qualidade e esquecer por 10 anos. Sem girar carteira.',
+        'pesos': {'Ações (Dividendos)': 40, 'Ações (Small Caps)': 30, 'Ações EUA (S&P500)': 30}
+    },
+    '🪄 Magic Formula (Greenblatt)': {
+        'desc': 'Foco estatístico em empresas "boas e baratas" (ROIC alto + EV/EBIT baixo).',
+        'pesos': {'Ações (Small Caps)': 40, 'Ações (Dividendos)': 40, 'CDB Liquidez Diária': 20}
+    },
+
+    # SETORIAIS / TEMÁTICAS
+    '🤖 Futuro Tech (AI & Growth)': {
+        'desc': 'Aposta máxima em tecnologia global (Nasdaq) e inovação.',
+        'pesos': {'Tech Stocks (Nasdaq)': 50, 'Ações EUA (S&P500)': 30, 'Bitcoin (BTC)': 20}
+    },
+    '🚜 Agro é Pop (Fiagro)': {
+        'desc': 'Foco no motor do PIB brasileiro.', 
+        'pesos': {'Fiagro (Agronegócio)': 40, 'LCI/LCA (Isento)': 30, 'CRI/CRA (High Yield)': 30}
+    },
+    '🎓 Yale Model (David Swensen)': {
+        'desc': 'Diversificação global institucional.', 
+        'pesos': {'Ações EUA (S&P500)': 30, 'Ações (Dividendos)': 15, 'FIIs (Tijolo)': 20, 'Tesouro IPCA+ (Curto)': 15, 'Tesouro IPCA+ (Longo)': 20}
+    },
+    '💰 Aposentadoria Renda+': {
+        'desc': 'Acumulação longo prazo via Tesouro Direto.', 
+        'pesos': {'Tesouro Renda+': 40, 'FIIs (Tijolo)': 20, 'Ações (Dividendos)': 20, 'Tesouro IPCA+ (Longo)': 20}
+    },
+    '🔥 Pimenta Crypto': {
+        'desc': 'Alto risco em ativos digitais.', 
+        'pesos': {'Bitcoin (BTC)': 40, 'Ethereum/Altcoins': 20, 'Tech Stocks (Nasdaq)': 20, 'CDB Banco Médio': 20}
+    },
+
+    # AS DUAS MATADORAS 🔥
+    '🐉 Dragon Portfolio': {
+        'desc': 'KILLER 1: Feito para crescer e sobreviver a cisnes negros (100 anos de backtest).',
+        'pesos': {'Ações EUA (S&P500)': 24, 'Tesouro IPCA+ (Longo)': 19, 'Ouro / Dólar': 19, 'Bitcoin (BTC)': 19, 'CRI/CRA (High Yield)': 19}
+    },
+    '🚀 Momentum Quant (Trend Following)': {
+        'desc': 'KILLER 2: A estratégia dos fundos quantitativos. Segue a tendência explosiva.',
+        'pesos': {'Tech Stocks (Nasdaq)': 40, 'Bitcoin (BTC)': 30, 'Ações (Small Caps)': 30}
+    }
+}
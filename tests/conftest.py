@@ -0,0 +1,17 @@
+"""Fixtures compartilhadas: cenário de mercado fixo, sem ler o armazém local"""
+
+import pytest
+
+from sioei.universe import construir_universo
+
+@pytest.fixture(scope='session')
+def snapshot():
+    return {
+        'macro': {'selic': 10.5, 'ipca': 4.5, 'status': True},
+        'live': {'Ações EUA (S&P500)': 14.0, 'ETF Ibovespa (BOVA11)': 9.0},
+        'versao': 'teste',
+    }
+
+@pytest.fixture(scope='session')
+def universo(snapshot):
+    return construir_universo(snapshot)
@@ -0,0 +1,82 @@
+"""Serviço da API: micro-lotes, cache de respostas e validação das entradas"""
+
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from sioei.api import EntradaProjecao, ServicoProjecoes
+from sioei.engine import calcular
+from sioei.universe import PERFIS
+
+PERFIL = next(iter(PERFIS))
+
+class MonitorFixo:
+    """Faz o papel do MonitorMercado com um snapshot em memória"""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def snapshot_atual(self):
+        return self.snapshot
+
+def _servico(snapshot, **opcoes):
+    return ServicoProjecoes(monitor=MonitorFixo(dict(snapshot)), **opcoes)
+
+def _projetar(servico, entradas):
+    async def todas():
+        return await asyncio.gather(*(servico.projetar(EntradaProjecao(**e)) for e in entradas))
+    return [json.loads(corpo) for corpo in asyncio.run(todas())]
+
+def test_projecoes_simultaneas_viram_um_lote(snapshot, universo):
+    servico = _servico(snapshot, janela=0.05)
+    entradas = [{'carteira': PERFIL, 'v_inicial': 1000 * i, 'v_mensal': 100, 'anos': 10} for i in range(10)]
+
+    respostas = _projetar(servico, entradas)
+
+    assert servico.agrupador.lotes == 1 and servico.agrupador.projecoes == 10
+    for e, r in zip(entradas, respostas):
+        d = calcular(PERFIS[PERFIL], e['v_inicial'], e['v_mensal'], e['anos'], universo=universo)
+        assert r['final_nom'] == pytest.approx(d['final_nom']) and r['versao_dados'] == 'teste'
+
+def test_lote_cheio_nao_espera_a_janela(snapshot):
+    servico = _servico(snapshot, janela=60, max_lote=4)
+    _projetar(servico, [{'carteira': PERFIL, 'v_inicial': i, 'anos': 5} for i in range(8)])
+    assert servico.agrupador.lotes == 2
+
+def test_entradas_equivalentes_saem_do_cache(snapshot):
+    servico = _servico(snapshot, janela=0)
+    pesos = {'Tesouro Selic': 40, 'Ações EUA (S&P500)': 60}
+    primeira, = _projetar(servico, [{'pesos': pesos, 'v_mensal': 500, 'anos': 20}])
+    # Mesma carteira em outra escala e renda irrelevante sem retirada: mesma chave
+    segunda, = _projetar(servico, [{'pesos': {k: v / 10 for k, v in pesos.items()}, 'v_mensal': 500,
+                                    'anos': 20, 'renda_desejada': 9000}])
+
+    assert segunda == primeira
+    assert servico.agrupador.projecoes == 1 and servico.cache.estatisticas()['acertos'] == 1
+
+def test_pedidos_identicos_em_andamento_compartilham_o_calculo(snapshot):
+    servico = _servico(snapshot, janela=0.05)
+    respostas = _projetar(servico, [{'carteira': PERFIL, 'v_inicial': 5000, 'anos': 15}] * 6)
+    assert servico.agrupador.projecoes == 1 and all(r == respostas[0] for r in respostas)
+
+def test_nova_versao_dos_dados_recalcula(snapshot):
+    servico = _servico(snapshot, janela=0)
+    entrada = {'carteira': PERFIL, 'v_inicial': 5000, 'anos': 15}
+    _projetar(servico, [entrada])
+    servico.monitor.snapshot = {**snapshot, 'versao': 'teste-2'}
+    resposta, = _projetar(servico, [entrada])
+    assert resposta['versao_dados'] == 'teste-2' and servico.agrupador.projecoes == 2
+
+@pytest.mark.parametrize('entrada, status', [
+    ({'carteira': 'inexistente', 'anos': 10}, 404),
+    ({'anos': 10}, 422),
+    ({'carteira': PERFIL, 'pesos': {'Tesouro Selic': 1}, 'anos': 10}, 422),
+    ({'pesos': {'Ativo inventado': 1}, 'anos': 10}, 422),
+    ({'pesos': {'Tesouro Selic': -1}, 'anos': 10}, 422),
+])
+def test_entradas_invalidas(snapshot, entrada, status):
+    with pytest.raises(HTTPException) as erro:
+        _projetar(_servico(snapshot), [entrada])
+    assert erro.value.status_code == status
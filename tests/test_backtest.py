@@ -0,0 +1,38 @@
+"""Anualização do backtest: CAGR de séries com crescimento conhecido"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sioei.backtest import backtest_carteiras
+from sioei.universe import construir_ativos
+
+SP500 = 'Ações EUA (S&P500)'
+SELIC, IPCA = 10.0, 4.0
+
+@pytest.fixture
+def datas():
+    return pd.bdate_range('2010-01-04', '2020-01-04')
+
+@pytest.fixture
+def historico_bcb(datas):
+    return {'selic': pd.Series(SELIC, index=datas[:1]), 'ipca': pd.Series(IPCA, index=datas[:1])}
+
+def test_cagr_de_mercado_segue_o_tempo_corrido(datas, historico_bcb):
+    # 10% a.a. exatos em tempo corrido, menos a taxa de administração do ativo
+    anos = (datas - datas[0]).days / 365.25
+    precos = pd.DataFrame({SP500: 100 * 1.10 ** np.asarray(anos)}, index=datas)
+    taxa = construir_ativos(SELIC, IPCA, {})[SP500]['taxa']
+
+    r = backtest_carteiras([{SP500: 100}], precos, historico_bcb, 'nenhum', inicio=datas[0], fim=datas[-1])
+
+    assert r['cagr'][0] == pytest.approx((1.10 * (1 - taxa / 100) - 1) * 100, abs=0.02)
+
+def test_cagr_da_curva_do_modelo(datas, historico_bcb):
+    ativos = construir_ativos(SELIC, IPCA, {})
+    nome = 'Tesouro Selic'
+    esperado = ativos[nome]['retorno'] - ativos[nome]['taxa']
+
+    r = backtest_carteiras([{nome: 100}], pd.DataFrame(), historico_bcb, 'nenhum', inicio=datas[0], fim=datas[-1])
+
+    assert r['cagr'][0] == pytest.approx(esperado, abs=1e-6)
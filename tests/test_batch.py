@@ -0,0 +1,64 @@
+"""Execução em lote: blocos, paralelismo, formatos e linhas inválidas"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sioei.batch import executar_lote
+from sioei.engine import calcular
+from sioei.universe import PERFIS
+
+PERFIL = next(iter(PERFIS))
+
+@pytest.fixture
+def cenarios():
+    rng = np.random.default_rng(0)
+    n = 23
+    return pd.DataFrame({
+        'cliente': [f'c{i}' for i in range(n)],
+        'v_inicial': rng.integers(0, 100_000, n).astype(float),
+        'v_mensal': rng.integers(0, 5_000, n).astype(float),
+        'anos': rng.integers(1, 40, n),
+        'carteira': [PERFIL.upper()] * n,  # Caixa, acentos e emojis não importam
+    })
+
+@pytest.mark.parametrize('workers, extensao', [(1, 'csv'), (2, 'csv'), (2, 'parquet')])
+def test_blocos_preservam_ordem_e_resultado(tmp_path, cenarios, snapshot, universo, workers, extensao):
+    entrada, saida = tmp_path / f'entrada.{extensao}', tmp_path / f'saida.{extensao}'
+    if extensao == 'csv':
+        cenarios.to_csv(entrada, index=False)
+    else:
+        cenarios.to_parquet(entrada, index=False)
+
+    linhas = executar_lote(str(entrada), str(saida), workers=workers, tamanho_bloco=5,
+                           snapshot=snapshot)
+    r = pd.read_csv(saida) if extensao == 'csv' else pd.read_parquet(saida)
+
+    assert linhas == len(cenarios) and list(r['cliente']) == list(cenarios['cliente'])
+    assert (r['erro'].fillna('') == '').all() and (r['versao_dados'] == 'teste').all()
+    for _, linha in r.sample(5, random_state=0).iterrows():
+        d = calcular(PERFIS[PERFIL], linha['v_inicial'], linha['v_mensal'], int(linha['anos']),
+                     universo=universo)
+        assert linha['final_nom'] == pytest.approx(d['final_nom'])
+
+def test_linhas_invalidas_saem_com_erro(tmp_path, snapshot):
+    entrada, saida = tmp_path / 'entrada.csv', tmp_path / 'saida.csv'
+    pd.DataFrame({
+        'v_inicial': ['1000', 'abc', '-5', '1000', '', '1000'],
+        'v_mensal': [100, 100, 100, 100, 100, 100],
+        'anos': [10, 10, 10, 10.5, 10, 10],
+        'carteira': [PERFIL, PERFIL, PERFIL, PERFIL, PERFIL, 'inexistente'],
+    }).to_csv(entrada, index=False)
+
+    executar_lote(str(entrada), str(saida), workers=1, snapshot=snapshot)
+    r = pd.read_csv(saida, keep_default_na=False)
+
+    assert list(r['erro']) == ['', 'valor inválido: v_inicial', 'valor inválido: v_inicial',
+                               'prazo inválido', 'valor inválido: v_inicial', 'carteira desconhecida']
+    assert r['final_nom'][0] != '' and (r['final_nom'][1:] == '').all()
+
+def test_coluna_obrigatoria_ausente(tmp_path, snapshot):
+    entrada = tmp_path / 'entrada.csv'
+    pd.DataFrame({'v_inicial': [1], 'anos': [1], 'carteira': [PERFIL]}).to_csv(entrada, index=False)
+    with pytest.raises(ValueError, match='v_mensal'):
+        executar_lote(str(entrada), str(tmp_path / 'saida.csv'), workers=1, snapshot=snapshot)
@@ -0,0 +1,60 @@
+"""Memoização de `calcular`: chaves normalizadas e descarte LRU"""
+
+import numpy as np
+import pytest
+
+from sioei.cache import CacheLRU, chave_conteudo
+from sioei.engine import CACHE_CALCULOS, calcular, calcular_cacheado, normalizar_entrada
+
+@pytest.fixture(autouse=True)
+def cache_vazio():
+    CACHE_CALCULOS.limpar()
+    yield
+    CACHE_CALCULOS.limpar()
+
+def test_entradas_equivalentes_tem_a_mesma_chave():
+    base = normalizar_entrada({'A': 50, 'B': 50}, 1000, 100.001, 10)
+    assert normalizar_entrada({'B': 1, 'A': 1, 'C': 0}, 1000.0, 100.0, 10.0) == base
+    # Sem retirada, renda e início da retirada não importam
+    assert normalizar_entrada({'A': 50, 'B': 50}, 1000, 100, 10, 5000, 3, False) == base
+    # Com retirada, o início é limitado ao prazo
+    assert (normalizar_entrada({'A': 1}, 0, 0, 10, 3000, 99, True)
+            == normalizar_entrada({'A': 1}, 0, 0, 10, 3000, 10, True))
+
+def test_entradas_diferentes_tem_chaves_diferentes():
+    base = normalizar_entrada({'A': 50, 'B': 50}, 1000, 100, 10)
+    assert normalizar_entrada({'A': 60, 'B': 40}, 1000, 100, 10) != base
+    assert normalizar_entrada({'A': 50, 'B': 50}, 1000, 100.01, 10) != base
+    assert normalizar_entrada({'A': 50, 'B': 50}, 1000, 100, 10, rebalancear_meses=0) != base
+
+def test_acerto_reaproveita_o_resultado_somente_leitura(universo):
+    pesos = {'Tesouro Selic': 30, 'Ações EUA (S&P500)': 70}
+    d = calcular_cacheado(pesos, 10000, 500, 20, universo=universo)
+    de_novo = calcular_cacheado({k: v * 2 for k, v in pesos.items()}, 10000, 500, 20, universo=universo)
+
+    assert de_novo is d
+    assert CACHE_CALCULOS.estatisticas()['acertos'] == 1
+    assert not d['y_cart_nom'].flags.writeable
+    assert d['final_nom'] == pytest.approx(calcular(pesos, 10000, 500, 20, universo=universo)['final_nom'])
+
+def test_versao_dos_dados_separa_as_entradas(universo):
+    pesos = {'Tesouro Selic': 100}
+    a = calcular_cacheado(pesos, 10000, 500, 20, universo=universo, versao_dados='v1')
+    b = calcular_cacheado(pesos, 10000, 500, 20, universo=universo, versao_dados='v2')
+    assert a is not b and CACHE_CALCULOS.estatisticas()['falhas'] == 2
+
+def test_lru_descarta_o_menos_usado():
+    cache = CacheLRU(tamanho_max=2)
+    cache.obter('a', lambda: 1)
+    cache.obter('b', lambda: 2)
+    cache.obter('a', lambda: None)  # 'a' passa a ser o mais recente
+    cache.obter('c', lambda: 3)
+    assert cache.obter('b', lambda: 'recalculado') == 'recalculado'
+    assert cache.obter('a', lambda: None) is None  # 'a' saiu quando 'b' voltou
+    assert cache.estatisticas()['itens'] == 2
+
+def test_chave_de_conteudo_distingue_dtype_e_forma():
+    x = np.arange(6)
+    assert chave_conteudo(x) == chave_conteudo(np.arange(6))
+    assert chave_conteudo(x) != chave_conteudo(x.astype(float))
+    assert chave_conteudo(x) != chave_conteudo(x.reshape(2, 3))
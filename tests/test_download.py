@@ -0,0 +1,83 @@
+"""Download em lotes: divisão só em falhas de símbolo, disjuntor e espera com jitter"""
+
+import pandas as pd
+import pytest
+import requests
+
+from sioei import data
+from sioei.data import (LOTES_FALHOS_DISJUNTOR, STATUS_ERRO, STATUS_OK, STATUS_SEM_DADOS,
+                        SemFechamentos, baixar_em_lotes)
+
+TICKERS = [f'T{i:03d}' for i in range(40)]
+INICIO = pd.Timestamp('2024-01-01')
+
+def _http(status):
+    resposta = requests.Response()
+    resposta.status_code = status
+    return requests.HTTPError(f'{status} Client Error', response=resposta)
+
+class FonteFalsa:
+    """Faz o papel de `baixar`: registra os lotes pedidos e falha conforme `falha(lote)`"""
+
+    def __init__(self, falha=lambda lote: None, vazios=()):
+        self.falha = falha
+        self.vazios = set(vazios)
+        self.chamadas = []
+
+    def __call__(self, lote, inicio):
+        self.chamadas.append(list(lote))
+        erro = self.falha(lote)
+        if erro is not None:
+            raise erro
+        datas = pd.bdate_range(inicio, periods=5)
+        return pd.DataFrame({t: float('nan') if t in self.vazios else 1.0 for t in lote}, index=datas)
+
+def _baixar(fonte, **opcoes):
+    opcoes = {'tamanho_lote': 10, 'max_workers': 1, 'por_segundo': 0, 'espera': 0, **opcoes}
+    return baixar_em_lotes(TICKERS, INICIO, baixar=fonte, **opcoes)
+
+def test_sucesso_e_tickers_sem_dados():
+    fonte = FonteFalsa(vazios={'T005'})
+    fechamentos, status = _baixar(fonte)
+    assert len(fonte.chamadas) == 4
+    assert status['T005'] == STATUS_SEM_DADOS and list(fechamentos.columns) == [t for t in TICKERS if t != 'T005']
+
+@pytest.mark.parametrize('erro', [ValueError('símbolo inválido'), _http(404)])
+def test_falha_de_simbolo_isola_o_ticker(erro):
+    fonte = FonteFalsa(lambda lote: erro if 'T013' in lote else None)
+    fechamentos, status = _baixar(fonte)
+    assert [t for t, s in status.items() if s != STATUS_OK] == ['T013']
+    assert 'T013' not in fechamentos.columns and fechamentos.shape[1] == len(TICKERS) - 1
+    assert ['T013'] in fonte.chamadas
+
+def test_4xx_divide_mesmo_sem_outro_lote_bom():
+    fonte = FonteFalsa(lambda lote: _http(404) if 'T001' in lote else None)
+    _, status = baixar_em_lotes(TICKERS[:10], INICIO, baixar=fonte, por_segundo=0, espera=0)
+    assert [t for t, s in status.items() if s == STATUS_ERRO] == ['T001']
+
+@pytest.mark.parametrize('erro', [_http(429), _http(503), requests.ConnectionError('reset'),
+                                  SemFechamentos('nada')])
+def test_falha_transitoria_nao_divide(erro):
+    fonte = FonteFalsa(lambda lote: erro if 'T013' in lote else None)
+    _, status = _baixar(fonte, tentativas=3)
+    lote_falho = TICKERS[10:20]
+    assert fonte.chamadas.count(lote_falho) == 3 and len(fonte.chamadas) == 3 + 3
+    assert all(status[t] == STATUS_ERRO for t in lote_falho)
+
+def test_queda_total_abre_o_disjuntor():
+    grande = [f'X{i:03d}' for i in range(500)]
+    fonte = FonteFalsa(lambda lote: requests.ConnectionError('sem rede'))
+    fechamentos, status = baixar_em_lotes(grande, INICIO, baixar=fonte, tamanho_lote=10, max_workers=1,
+                                          por_segundo=0, espera=0, tentativas=3)
+    assert fechamentos.empty and set(status.values()) == {STATUS_ERRO}
+    assert len(fonte.chamadas) == LOTES_FALHOS_DISJUNTOR * 3
+    assert all(len(lote) == 10 for lote in fonte.chamadas)
+
+def test_tentativas_da_divisao_esperam_com_jitter(monkeypatch):
+    esperas = []
+    monkeypatch.setattr(data.time, 'sleep', esperas.append)
+    fonte = FonteFalsa(lambda lote: ValueError('símbolo inválido') if 'T013' in lote else None)
+    _baixar(fonte, espera=1.0, tentativas=2)
+    # 1 espera no lote original + 1 por metade/quarto que ainda contém T013 (4 níveis até isolá-lo)
+    assert len(esperas) == 1 + 4
+    assert all(0.5 <= e <= 1.5 for e in esperas) and len(set(esperas)) > 1
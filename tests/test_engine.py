@@ -0,0 +1,36 @@
+"""Plano FIRE no modo por ativo: resolvido sobre a mesma evolução que o painel desenha"""
+
+import pytest
+
+from sioei.engine import calcular, resolver_fire
+
+CENARIO = (10000, 1000, 30, 5000, 25)  # inicial, aporte, anos, renda, anos até a retirada
+
+def _calcular(pesos, universo, rebalancear_meses, aporte=None):
+    v_inicial, v_mensal, anos, renda, anos_retirada = CENARIO
+    return calcular(pesos, v_inicial, v_mensal if aporte is None else aporte, anos, renda,
+                    anos_retirada, True, universo=universo, rebalancear_meses=rebalancear_meses)
+
+@pytest.mark.parametrize('rebalancear_meses', [0, 6, 12])
+def test_aporte_necessario_atinge_a_meta_no_modo_por_ativo(universo, rebalancear_meses):
+    pesos = {'Tesouro Selic': 50, 'Tesouro IPCA+ (Curto)': 30, 'Ações EUA (S&P500)': 20}
+    plano = resolver_fire(_calcular(pesos, universo, rebalancear_meses), *CENARIO)
+
+    d = _calcular(pesos, universo, rebalancear_meses, aporte=plano['aporte_necessario'])
+    assert d['final_real'] == pytest.approx(plano['patrimonio_necessario'], rel=1e-9)
+
+def test_um_ativo_coincide_com_a_taxa_media(universo):
+    pesos = {'Tesouro Selic': 100}
+    esperado = resolver_fire(_calcular(pesos, universo, None), *CENARIO)
+    for rebalancear_meses in (0, 12):
+        plano = resolver_fire(_calcular(pesos, universo, rebalancear_meses), *CENARIO)
+        assert plano['meses_ate_meta'] == esperado['meses_ate_meta']
+        assert plano['mes_esgotamento'] == esperado['mes_esgotamento']
+        assert plano['aporte_necessario'] == pytest.approx(esperado['aporte_necessario'])
+
+@pytest.mark.parametrize('rebalancear_meses', [None, 0, 12])
+def test_saldo_zerado_na_troca_esgota_na_primeira_retirada(universo, rebalancear_meses):
+    # Sem patrimônio nem aportes, o saldo fica negativo no mês seguinte ao início da retirada
+    d = calcular({'Tesouro Selic': 60, 'Ações EUA (S&P500)': 40}, 0, 0, 20, 3000, 10, True,
+                 universo=universo, rebalancear_meses=rebalancear_meses)
+    assert resolver_fire(d, 0, 0, 20, 3000, 10)['mes_esgotamento'] == 10 * 12 + 1
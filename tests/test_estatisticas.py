@@ -0,0 +1,83 @@
+"""Estatísticas rolantes: atualização incremental contra o recálculo completo"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sioei.estatisticas import DIAS_UTEIS_ANO, EstatisticasRolantes, retorno_tendencia
+
+JANELAS_TESTE = {'curta': 20, 'longa': 60}
+SEM_RECONSTRUCAO = 10 ** 9
+
+@pytest.fixture(scope='module')
+def precos():
+    rng = np.random.default_rng(7)
+    datas = pd.bdate_range('2023-01-02', periods=300)
+    log = np.cumsum(rng.normal(0.0004, 0.012, (len(datas), 4)), axis=0)
+    tabela = pd.DataFrame(100 * np.exp(log), index=datas, columns=['A', 'B', 'C', 'D'])
+    tabela.iloc[:150, 2] = np.nan              # C começa no meio da série
+    tabela.iloc[200:210, 3] = np.nan           # D fica 10 pregões sem fechar (além do preenchimento)
+    tabela.iloc[rng.choice(300, 15, replace=False), 1] = np.nan   # B com falhas isoladas
+    return tabela
+
+def _comparar(a, b):
+    for janela in JANELAS_TESTE:
+        pd.testing.assert_frame_equal(a.metricas(janela), b.metricas(janela), rtol=1e-9)
+        pd.testing.assert_frame_equal(a.correlacoes(janela), b.correlacoes(janela), rtol=1e-9)
+
+def _completo(precos):
+    motor = EstatisticasRolantes(precos.columns, JANELAS_TESTE)
+    motor.adicionar(precos)
+    return motor
+
+def test_barra_a_barra_igual_ao_recalculo(precos):
+    motor = EstatisticasRolantes(precos.columns, JANELAS_TESTE, reconstruir_a_cada=SEM_RECONSTRUCAO)
+    for i in range(len(precos)):
+        assert motor.adicionar(precos.iloc[i:i + 1]) == 1
+    _comparar(motor, _completo(precos))
+    assert motor.ultima_data == precos.index[-1]
+
+def test_blocos_e_datas_repetidas(precos):
+    motor = EstatisticasRolantes(precos.columns, JANELAS_TESTE, reconstruir_a_cada=SEM_RECONSTRUCAO)
+    for de in range(0, len(precos), 7):
+        motor.adicionar(precos.iloc[max(de - 3, 0):de + 7])     # Reenvia pregões já vistos
+    _comparar(motor, _completo(precos))
+
+def test_ultimo_pregao_reescrito(precos):
+    motor = EstatisticasRolantes(precos.columns, JANELAS_TESTE, reconstruir_a_cada=SEM_RECONSTRUCAO)
+    motor.adicionar(precos.iloc[:-1])
+    parcial = precos.iloc[-1:] * 0.97                              # Capturado no meio do pregão
+    motor.adicionar(pd.concat([precos.iloc[-2:-1], parcial]))
+    motor.adicionar(precos.iloc[-1:])                              # Fechamento definitivo
+    _comparar(motor, _completo(precos))
+
+def test_reconstrucao_periodica(precos):
+    motor = EstatisticasRolantes(precos.columns, JANELAS_TESTE, reconstruir_a_cada=25)
+    for i in range(len(precos)):
+        motor.adicionar(precos.iloc[i:i + 1])
+    _comparar(motor, _completo(precos))
+
+def test_valores_contra_pandas(precos):
+    motor = _completo(precos)
+    w = JANELAS_TESTE['longa']
+    recorte = precos[['A', 'B']]
+    retornos = np.log(recorte.ffill(limit=5)).diff().iloc[-w:]
+    metricas = motor.metricas('longa')
+
+    vol = retornos.std() * np.sqrt(DIAS_UTEIS_ANO) * 100
+    np.testing.assert_allclose(metricas.loc[['A', 'B'], 'volatilidade'], vol, rtol=1e-9)
+    assert motor.correlacoes('longa').loc['A', 'B'] == pytest.approx(retornos.corr().loc['A', 'B'], rel=1e-9)
+
+    tendencia = retorno_tendencia(precos.iloc[-w:], min_observacoes=0)
+    assert metricas.loc['A', 'retorno'] == pytest.approx(tendencia['A'], rel=1e-9)
+    queda = np.log(precos['A'].iloc[-(w + 1):])
+    assert metricas.loc['A', 'drawdown_maximo'] == pytest.approx(np.expm1((queda - queda.cummax()).min()) * 100)
+
+def test_cobertura_e_resumo(precos):
+    motor = EstatisticasRolantes(precos.columns, JANELAS_TESTE)
+    motor.adicionar(precos.iloc[:160])
+    assert np.isnan(motor.metricas('curta').loc['C', 'volatilidade'])   # 9 retornos de 20
+    resumo = motor.resumo()
+    assert 'C' not in resumo['janelas']['curta'] and 'A' in resumo['janelas']['curta']
+    assert resumo['data'] == precos.index[159].strftime('%Y-%m-%d')
+    assert list(resumo['correlacoes']['curta'].columns) == list(resumo['janelas']['curta'])
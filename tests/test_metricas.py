@@ -0,0 +1,131 @@
+"""Registro de métricas: etapas, caches, exportação Prometheus e logs JSON"""
+
+import json
+import logging
+import re
+import urllib.error
+import urllib.request
+
+import pytest
+
+from sioei.metricas import (Execucao, FormatadorJSON, RegistroMetricas, instrumentar_cache,
+                            servir_metricas)
+
+LINHA_AMOSTRA = re.compile(r'^([a-z_]+)(\{.*\})? (\S+)$')
+
+def _amostras(texto):
+    """{(metrica, rótulos): valor} das linhas que não são comentário"""
+    amostras = {}
+    for linha in texto.splitlines():
+        if linha.startswith('#'):
+            continue
+        nome, rotulos, valor = LINHA_AMOSTRA.match(linha).groups()
+        amostras[nome, rotulos or ''] = float(valor)
+    return amostras
+
+def _cache_dict(funcao):
+    """Decorador de cache mínimo, com `.clear()` como st.cache_data"""
+    guardados = {}
+
+    def cacheada(*args):
+        if args not in guardados:
+            guardados[args] = funcao(*args)
+        return guardados[args]
+
+    cacheada.clear = guardados.clear
+    return cacheada
+
+class CacheContado:
+    def estatisticas(self):
+        return {'acertos': 7, 'falhas': 3}
+
+def test_etapa_conta_mesmo_com_excecao():
+    registro = RegistroMetricas()
+
+    @registro.etapa('decorada')
+    def funcao():
+        pass
+
+    for _ in range(6):
+        funcao()
+    with pytest.raises(ValueError), registro.etapa('falha'):
+        raise ValueError
+    etapas = registro.resumo()['etapas']
+    assert list(etapas) == ['decorada', 'falha']
+    assert etapas['decorada']['n'] == 6
+    assert etapas['falha']['n'] == 1
+
+def test_quantis_sobre_as_ultimas_amostras():
+    registro = RegistroMetricas(amostras=100)
+    for ms in range(1, 201):
+        registro.registrar_tempo('x', ms / 1000)
+    e = registro.resumo()['etapas']['x']
+    assert e['p50_ms'] == pytest.approx(150.5) and e['p99_ms'] == pytest.approx(199.01)
+    assert e['soma_s'] == pytest.approx(sum(range(1, 201)) / 1000)
+
+def test_instrumentar_cache_conta_acertos_e_falhas():
+    registro = RegistroMetricas()
+    chamadas = []
+    dobro = instrumentar_cache('dobro', _cache_dict, registro)(lambda x: chamadas.append(x) or 2 * x)
+    assert [dobro(1), dobro(1), dobro(2), dobro(1)] == [2, 2, 4, 2]
+    dobro.clear()
+    dobro(1)
+    registro.registrar_cache('lru', CacheContado())
+    caches = registro.resumo()['caches']
+    assert chamadas == [1, 2, 1]
+    assert caches['dobro'] == {'acertos': 2, 'falhas': 3, 'taxa_acerto': 0.4}
+    assert caches['lru']['taxa_acerto'] == 0.7
+
+def test_texto_prometheus():
+    registro = RegistroMetricas()
+    for s in (0.1, 0.2, 0.3):
+        registro.registrar_tempo('api.lote', s)
+    registro.registrar_tempo('graf"ico\\x', 1.0)
+    registro.contar_cache('respostas', acertou=True)
+    registro.contar_cache('respostas', acertou=False)
+    texto = registro.texto_prometheus()
+
+    assert texto.endswith('\n')
+    assert '# TYPE sioei_etapa_segundos summary' in texto and '# TYPE sioei_cache_acertos_total counter' in texto
+    amostras = _amostras(texto)
+    assert amostras['sioei_etapa_segundos', '{etapa="api.lote",quantile="0.5"}'] == pytest.approx(0.2)
+    assert amostras['sioei_etapa_segundos_sum', '{etapa="api.lote"}'] == pytest.approx(0.6)
+    assert amostras['sioei_etapa_segundos_count', '{etapa="api.lote"}'] == 3
+    assert amostras['sioei_etapa_segundos_count', '{etapa="graf\\"ico\\\\x"}'] == 1
+    assert amostras['sioei_cache_acertos_total', '{cache="respostas"}'] == 1
+    assert amostras['sioei_cache_falhas_total', '{cache="respostas"}'] == 1
+
+def test_registro_vazio_so_tem_cabecalhos():
+    texto = RegistroMetricas().texto_prometheus()
+    assert _amostras(texto) == {} and texto.count('# TYPE') == 3
+
+def test_execucao_registra_trechos_e_loga(caplog):
+    registro = RegistroMetricas()
+    execucao = Execucao('rerun', registro, sessao='abc')
+    execucao.marcar('topo')
+    with execucao.etapa('motor'):
+        pass
+    with caplog.at_level(logging.INFO, logger='sioei.metricas'):
+        total = execucao.finalizar()
+    assert set(registro.resumo()['etapas']) == {'rerun.topo', 'motor', 'rerun.total'}
+    registro_log = caplog.records[-1]
+    assert registro_log.evento == 'rerun' and registro_log.sessao == 'abc'
+    assert set(registro_log.etapas_ms) == {'rerun.topo', 'motor'} and total >= 0
+
+    dados = json.loads(FormatadorJSON().format(registro_log))
+    assert dados['nivel'] == 'INFO' and dados['sessao'] == 'abc' and 'etapas_ms' in dados
+
+def test_servir_metricas():
+    registro = RegistroMetricas()
+    registro.registrar_tempo('x', 0.5)
+    servidor = servir_metricas(porta=0, host='127.0.0.1', registro=registro)
+    try:
+        base = f"http://127.0.0.1:{servidor.server_address[1]}"
+        with urllib.request.urlopen(f"{base}/metrics") as resposta:
+            assert resposta.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+            assert resposta.read().decode() == registro.texto_prometheus()
+        with pytest.raises(urllib.error.HTTPError) as erro:
+            urllib.request.urlopen(f"{base}/outra")
+        assert erro.value.code == 404
+    finally:
+        servidor.shutdown()
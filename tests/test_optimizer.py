@@ -0,0 +1,50 @@
+"""Fronteira eficiente pela Linha Crítica contra um QP resolvido por força bruta"""
+
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+from sioei.optimizer import arredondar_pesos_inteiros, fronteira_eficiente
+
+def _variancia_minima(mu, cov, alvo):
+    """
+    min w'Σw com Σw = 1, μ'w = alvo e w >= 0, testando todos os suportes: em cada um,
+    as restrições de igualdade dão um sistema KKT linear; vale o menor viável.
+    """
+    melhor, pesos = np.inf, None
+    for tamanho in range(1, len(mu) + 1):
+        for suporte in map(list, combinations(range(len(mu)), tamanho)):
+            s = len(suporte)
+            kkt = np.zeros((s + 2, s + 2))
+            kkt[:s, :s] = 2 * cov[np.ix_(suporte, suporte)]
+            kkt[:s, s] = kkt[s, :s] = 1
+            kkt[:s, s + 1] = kkt[s + 1, :s] = mu[suporte]
+            solucao, *_ = np.linalg.lstsq(kkt, np.concatenate([np.zeros(s), [1, alvo]]), rcond=None)
+            w = np.zeros(len(mu))
+            w[suporte] = solucao[:s]
+            viavel = w.min() >= -1e-9 and abs(w.sum() - 1) < 1e-7 and abs(mu @ w - alvo) < 1e-7
+            if viavel and w @ cov @ w < melhor:
+                melhor, pesos = w @ cov @ w, w
+    return pesos
+
+@pytest.mark.parametrize('semente', [0, 1, 2])
+def test_fronteira_coincide_com_qp_por_forca_bruta(semente):
+    rng = np.random.default_rng(semente)
+    n = 6
+    mu = rng.uniform(2, 15, n)
+    fatores = rng.normal(size=(n, n))
+    cov = fatores @ fatores.T + np.diag(rng.uniform(1, 5, n))
+
+    fronteira = fronteira_eficiente(mu, cov, n_pontos=15)
+
+    for w, r in zip(fronteira['pesos'], fronteira['retornos']):
+        esperado = _variancia_minima(mu, cov, r)
+        assert w.min() >= 0 and w.sum() == pytest.approx(1)
+        assert w == pytest.approx(esperado, abs=1e-6)
+    assert fronteira['retornos'][-1] == pytest.approx(mu.max())
+    assert np.all(np.diff(fronteira['volatilidades']) >= -1e-9)
+
+def test_arredondamento_soma_o_total():
+    inteiros = arredondar_pesos_inteiros([0.333, 0.333, 0.334])
+    assert inteiros.sum() == 100 and set(inteiros) <= {33, 34}
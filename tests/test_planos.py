@@ -0,0 +1,78 @@
+"""Planos salvos: upsert, invalidação pelo gatilho e projeção só dos pendentes"""
+
+import pytest
+
+from sioei.engine import calcular
+from sioei.planos import (carregar_planos, conectar_planos, excluir_plano, listar_cenarios,
+                          projetar_pendentes, salvar_planos)
+from sioei.universe import PERFIS, construir_universo
+
+PERFIL = next(iter(PERFIS))
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = conectar_planos(str(tmp_path / 'planos.sqlite'))
+    yield conn
+    conn.close()
+
+def _plano(nome, v_mensal=500, **extra):
+    return {'usuario': 'cli', 'nome': nome, 'pesos': {'Tesouro Selic': 50, 'Ações EUA (S&P500)': 50},
+            'v_inicial': 10000, 'v_mensal': v_mensal, 'anos': 20, **extra}
+
+def _contar_projecoes(conn):
+    return conn.execute("SELECT COUNT(*) FROM projecoes").fetchone()[0]
+
+def test_upsert_por_usuario_e_nome(conn):
+    salvar_planos(conn, [_plano('a'), _plano('b')])
+    salvar_planos(conn, [_plano('a', v_mensal=900)])
+
+    planos = {p['nome']: p for p in carregar_planos(conn, 'cli')}
+    assert set(planos) == {'a', 'b'} and planos['a']['v_mensal'] == 900
+
+def test_estrategia_identificada_pelos_pesos(conn):
+    pesos = {nome: peso * 3 for nome, peso in PERFIS[PERFIL].items()}
+    salvar_planos(conn, [{'usuario': 'cli', 'nome': 'perfil', 'pesos': pesos, 'v_inicial': 0, 'anos': 5},
+                         _plano('personalizado')])
+    estrategias = {p['nome']: p['estrategia'] for p in carregar_planos(conn, 'cli')}
+    assert estrategias == {'perfil': PERFIL, 'personalizado': None}
+
+def test_projetar_pendentes_so_reprojeta_o_que_mudou(conn, universo):
+    salvar_planos(conn, [_plano('a'), _plano('b')])
+    assert projetar_pendentes(conn, universo) == 2
+    assert projetar_pendentes(conn, universo) == 0
+
+    # Regravar sem mudar nada não dispara o gatilho; mudar um parâmetro dispara
+    salvar_planos(conn, [_plano('b')])
+    assert projetar_pendentes(conn, universo) == 0
+    salvar_planos(conn, [_plano('a', v_mensal=2000)])
+    assert _contar_projecoes(conn) == 1
+    assert projetar_pendentes(conn, universo) == 1
+
+    plano = next(p for p in carregar_planos(conn, 'cli', universo.versao) if p['nome'] == 'a')
+    d = calcular(plano['pesos'], 10000, 2000, 20, universo=universo)
+    assert plano['final_nom'] == pytest.approx(d['final_nom'])
+
+def test_nova_versao_projeta_de_novo_e_preserva_a_anterior(conn, snapshot, universo):
+    salvar_planos(conn, [_plano('a'), _plano('b')])
+    projetar_pendentes(conn, universo)
+    outro = construir_universo({**snapshot, 'versao': 'teste-2'})
+    assert projetar_pendentes(conn, outro, usuario='cli') == 2
+    assert _contar_projecoes(conn) == 4
+
+def test_listar_cenarios_ordena_pelo_indice(conn, universo):
+    salvar_planos(conn, [_plano(f'p{i}', v_mensal=100 * i) for i in range(10)])
+    projetar_pendentes(conn, universo)
+
+    pagina = listar_cenarios(conn, universo.versao, limite=3, deslocamento=1)
+    assert list(pagina['nome']) == ['p8', 'p7', 'p6']
+    plano = conn.execute("EXPLAIN QUERY PLAN SELECT plano_id FROM projecoes "
+                         "WHERE versao_dados = ? ORDER BY final_real DESC", ('teste',)).fetchall()
+    assert 'projecoes_versao_final_real' in str(plano)
+    with pytest.raises(ValueError):
+        listar_cenarios(conn, universo.versao, ordem='pesos; DROP TABLE planos')
+
+def test_excluir_remove_os_resumos(conn, universo):
+    salvar_planos(conn, [_plano('a')])
+    projetar_pendentes(conn, universo)
+    assert excluir_plano(conn, 'cli', 'a') and not excluir_plano(conn, 'cli', 'a')
+    assert _contar_projecoes(conn) == 0
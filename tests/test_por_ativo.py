@@ -0,0 +1,51 @@
+"""Projeção ativo a ativo (deriva e rebalanceamento) contra uma simulação mês a mês"""
+
+import numpy as np
+import pytest
+
+from sioei.engine import calcular, evoluir_por_ativo
+
+def _mes_a_mes(g, w, v_inicial, aporte, renda, mes_troca, meses, rebalancear_meses):
+    saldos = [w * v_inicial]
+    for m in range(meses):
+        s = saldos[-1]
+        if rebalancear_meses and m % rebalancear_meses == 0:
+            s = w * s.sum()
+        fluxo = aporte if m < mes_troca else aporte - renda
+        saldos.append(s * g + w * fluxo)
+    return np.array(saldos)
+
+@pytest.mark.parametrize('rebalancear_meses', [0, 1, 6, 12, 50])
+@pytest.mark.parametrize('mes_troca', [0, 37, 120])
+def test_forma_fechada_coincide_com_o_laco(rebalancear_meses, mes_troca):
+    rng = np.random.default_rng(rebalancear_meses + mes_troca)
+    g = 1 + rng.uniform(-0.005, 0.02, 5)
+    g[2] = 1.0  # Fator unitário usa o ramo linear da anuidade
+    w = rng.dirichlet(np.ones(5))
+
+    obtido = evoluir_por_ativo(g, w, 10000, 800, 2500, mes_troca, 120, rebalancear_meses)
+    esperado = _mes_a_mes(g, w, 10000, 800, 2500, mes_troca, 120, rebalancear_meses)
+    assert obtido == pytest.approx(esperado, rel=1e-9, abs=1e-6)
+
+def test_varios_cenarios_de_uma_vez():
+    g = np.array([[1.01, 1.002], [1.004, 1.006]])
+    w = np.array([0.3, 0.7])
+    lote = evoluir_por_ativo(g, w, 5000, 100, 0, 60, 60, 12)
+    for i in range(2):
+        assert lote[i] == pytest.approx(evoluir_por_ativo(g[i], w, 5000, 100, 0, 60, 60, 12))
+
+def test_rebalanceamento_mensal_segue_a_taxa_media(universo):
+    # Com as fatias refeitas todo mês, a carteira rende a média ponderada dos fatores mensais
+    pesos = {'Tesouro Selic': 50, 'Ações EUA (S&P500)': 50}
+    d = calcular(pesos, 10000, 500, 10, universo=universo, rebalancear_meses=1)
+    assert d['y_ativos_nom'].sum(axis=1) == pytest.approx(d['y_cart_nom'])
+    assert d['y_ativos_nom'].shape == (121, 2)
+    media = calcular(pesos, 10000, 500, 10, universo=universo)
+    assert d['final_nom'] == pytest.approx(media['final_nom'], rel=1e-3)
+
+def test_deriva_aumenta_o_peso_do_ativo_que_rende_mais(universo):
+    pesos = {'Tesouro Selic': 50, 'Ações EUA (S&P500)': 50}
+    d = calcular(pesos, 10000, 0, 30, universo=universo, rebalancear_meses=0)
+    fatias = d['y_ativos_nom'][-1] / d['y_ativos_nom'][-1].sum()
+    mais_rentavel = int(np.argmax([a['retorno_real'] for a in d['ativos']]))
+    assert fatias[mais_rentavel] > 0.5
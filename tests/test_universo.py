@@ -0,0 +1,52 @@
+"""Universo em colunas: alinhamento com ATIVOS, grupos prontos e imutabilidade"""
+
+import pickle
+
+import numpy as np
+import pytest
+
+from sioei.engine import avaliar_carteiras, calcular, montar_matriz_pesos
+from sioei.universe import PERFIS, TESES
+
+def test_colunas_alinhadas_com_os_ativos(universo):
+    tabela = universo.tabela
+    assert tabela.nomes == tuple(universo.ativos)
+    for nome, info in universo.ativos.items():
+        i = tabela.indice[nome]
+        assert (tabela.retorno[i], tabela.taxa[i], tabela.risco[i]) == (info['retorno'], info['taxa'], info['risco'])
+        assert tabela.tipos[tabela.codigo_tipo[i]] == info['tipo']
+        assert tabela.mercados[tabela.codigo_mercado[i]] == info['mercado']
+    assert tabela.retorno_liquido == pytest.approx(tabela.retorno - tabela.taxa)
+
+def test_grupos_por_tipo_e_mercado(universo):
+    tabela = universo.tabela
+    for tipo, posicoes in tabela.por_tipo.items():
+        assert {tabela.nomes[i] for i in posicoes} == {n for n, a in universo.ativos.items() if a['tipo'] == tipo}
+        assert tabela.mercados_por_tipo[tipo] == tuple(sorted(
+            {a['mercado'] for a in universo.ativos.values() if a['tipo'] == tipo}))
+    assert sum(len(p) for p in tabela.por_mercado.values()) == len(tabela.nomes)
+
+def test_produto_escalar_igual_a_soma_por_ativo(universo):
+    carteiras = list(PERFIS.values()) + [t['pesos'] for t in TESES.values()]
+    r = avaliar_carteiras(montar_matriz_pesos(carteiras, universo), 10000, 500, 15, universo=universo)
+    for i, pesos in enumerate(carteiras):
+        total = sum(pesos.values())
+        esperado = sum(p / total * (universo.ativos[n]['retorno'] - universo.ativos[n]['taxa'])
+                       for n, p in pesos.items())
+        assert r['retorno_aa'][i] == pytest.approx(esperado)
+        assert r['final_nom'][i] == pytest.approx(calcular(pesos, 10000, 500, 15, universo=universo)['final_nom'])
+
+def test_ativo_desconhecido_levanta_keyerror(universo):
+    with pytest.raises(KeyError):
+        universo.tabela.vetor_pesos({'Ativo inventado': 10})
+
+def test_universo_imutavel_e_serializavel(universo):
+    with pytest.raises(TypeError):
+        universo.ativos['Tesouro Selic'] = {}
+    with pytest.raises(TypeError):
+        universo.ativos['Tesouro Selic']['retorno'] = 0
+    with pytest.raises(ValueError):
+        universo.tabela.retorno[0] = 0
+    copia = pickle.loads(pickle.dumps(universo))
+    assert copia.versao == universo.versao
+    assert np.array_equal(copia.tabela.retorno, universo.tabela.retorno)